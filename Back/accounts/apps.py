@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from smartcampus.images import register_image_field
+        from .models import Student
+
+        register_image_field(Student, 'profile_picture', small=256, thumb=64)
@@ -0,0 +1,111 @@
+"""
+Fixed-width bitmask encoding of weekly availability.
+
+``Student.availability`` is free-form JSON mapping a day name to a list of
+slots (``{'monday': ['14:00-18:00'], ...}``). For matching it is normalized
+into one integer per day where bit ``h`` is set when the student is free
+during hour ``h`` (00h-24h), so overlap scoring becomes bit arithmetic.
+"""
+
+import math
+import re
+
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+SLOTS_PER_DAY = 24
+
+# Named periods accepted in place of explicit time ranges
+PERIODS = {
+    'morning': (8, 12),
+    'matin': (8, 12),
+    'afternoon': (12, 18),
+    'apres-midi': (12, 18),
+    'après-midi': (12, 18),
+    'evening': (18, 22),
+    'soir': (18, 22),
+    'night': (22, 24),
+    'nuit': (22, 24),
+}
+
+TIME_PATTERN = r'(\d{1,2})(?:[:hH](\d{2}))?'
+RANGE_RE = re.compile(rf'^\s*{TIME_PATTERN}\s*(?:-|–|à|to)\s*{TIME_PATTERN}\s*$')
+SINGLE_RE = re.compile(rf'^\s*{TIME_PATTERN}\s*$')
+
+
+def _hours(hour, minute):
+    return int(hour) + int(minute or 0) / 60
+
+
+def _slot_range(slot):
+    """Return the (start, end) hours covered by one availability slot, or None"""
+    if not isinstance(slot, str):
+        return None
+    text = slot.strip().lower()
+    if text in PERIODS:
+        return PERIODS[text]
+
+    match = RANGE_RE.match(text)
+    if match:
+        start = _hours(match.group(1), match.group(2))
+        end = _hours(match.group(3), match.group(4))
+        if end == 0:
+            end = SLOTS_PER_DAY
+        return (start, end) if start < end <= SLOTS_PER_DAY else None
+
+    match = SINGLE_RE.match(text)
+    if match:
+        start = _hours(match.group(1), match.group(2))
+        return (start, start + 1) if start < SLOTS_PER_DAY else None
+    return None
+
+
+def encode_day(slots):
+    """Encode a list of slots into a 24-bit hourly mask"""
+    mask = 0
+    for slot in slots or []:
+        hours = _slot_range(slot)
+        if hours is None:
+            continue
+        start, end = hours
+        first = int(start)
+        last = min(SLOTS_PER_DAY, math.ceil(end))
+        for hour in range(first, last):
+            mask |= 1 << hour
+    return mask
+
+
+def encode_availability(availability):
+    """Encode availability JSON into a list of one mask per day of the week"""
+    if not isinstance(availability, dict):
+        return [0] * len(DAYS)
+    return [encode_day(availability.get(day)) for day in DAYS]
+
+
+def popcount(value):
+    return bin(value).count('1')
+
+
+def schedule_overlap(mask1, mask2):
+    """Mean per-day Jaccard overlap of two weekly masks
+
+    Days where either student is unavailable are ignored; 0.0 when no day is
+    shared. Students without any availability data are scored 0.5 by the
+    caller (see ``has_availability``), not here.
+    """
+    overlap_score = 0
+    total_days = 0
+    for day1, day2 in zip(mask1, mask2):
+        if day1 and day2:
+            overlap_score += popcount(day1 & day2) / popcount(day1 | day2)
+            total_days += 1
+    return overlap_score / max(total_days, 1)
+
+
+def availability_mask(student):
+    """Stored weekly mask of a student, encoding the JSON if it was never saved"""
+    return student.availability_mask or encode_availability(student.availability)
+
+
+def has_availability(student):
+    """Whether the student filled in any availability, even one encoding no hour"""
+    return bool(student.availability)
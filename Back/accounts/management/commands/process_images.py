@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from smartcampus.images import pending, process_image, registered_fields
+
+
+class Command(BaseCommand):
+    help = 'Write the missing renditions of uploaded images (profile pictures, receipts)'
+
+    def handle(self, *args, **options):
+        for model, field_name in registered_fields():
+            done = failed = 0
+            for pk in pending(model, field_name).values_list('pk', flat=True).iterator():
+                try:
+                    done += process_image(model, pk, field_name)
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {pk}: {exc}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}.{field_name}: {done} images traitées, {failed} en erreur'
+            ))
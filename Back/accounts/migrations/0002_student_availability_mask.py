@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:14
+
+from django.db import migrations, models
+
+from accounts.availability import encode_availability
+
+
+def encode_existing_availability(apps, schema_editor):
+    Student = apps.get_model('accounts', 'Student')
+    students = list(Student.objects.only('id', 'availability'))
+    for student in students:
+        student.availability_mask = encode_availability(student.availability)
+    Student.objects.bulk_update(students, ['availability_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='availability_mask',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(encode_existing_availability, migrations.RunPython.noop),
+    ]
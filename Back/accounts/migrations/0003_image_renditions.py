@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_student_availability_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='profile_picture_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='profile_picture_small',
+            field=models.ImageField(blank=True, editable=False, upload_to='profiles/small/'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='profile_picture_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='profiles/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='profile_picture_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from .availability import encode_availability
+
 
 class Student(AbstractUser):
     """Extended user model for students"""
@@ -28,17 +30,30 @@ class Student(AbstractUser):
     birth_date = models.DateField(null=True, blank=True)
     address = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True)
+    # Renditions and dimensions written by smartcampus.images
+    profile_picture_small = models.ImageField(upload_to='profiles/small/', blank=True, editable=False)
+    profile_picture_thumb = models.ImageField(upload_to='profiles/thumbs/', blank=True, editable=False)
+    profile_picture_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     # Preferences for AI matching
     study_preferences = models.JSONField(default=dict, blank=True)  # Study habits, preferred times, etc.
     interests = models.JSONField(default=list, blank=True)  # Academic interests
     availability = models.JSONField(default=dict, blank=True)  # Weekly availability
+    availability_mask = models.JSONField(default=list, blank=True, editable=False)  # Hourly bitmask per day, synced on save
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.username} - {self.get_level_display()}"
+    
+    def save(self, *args, **kwargs):
+        self.availability_mask = encode_availability(self.availability)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'availability' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'availability_mask'}
+        super().save(*args, **kwargs)
 
 
 class StudentProfile(models.Model):
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from smartcampus.images import image_urls
 from .models import Student, StudentProfile
 
 
@@ -16,6 +17,14 @@ class StudentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Serve the small rendition; the original and thumbnail are listed alongside
+        images = image_urls(instance, 'profile_picture', self.context.get('request'))
+        data['profile_picture'] = images['url']
+        data['profile_picture_sizes'] = images
+        return data
+    
     def get_profile(self, obj):
         try:
             profile = obj.profile
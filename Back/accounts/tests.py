@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from .availability import DAYS, encode_availability, encode_day, schedule_overlap
+
+
+def hours(*values):
+    mask = 0
+    for hour in values:
+        mask |= 1 << hour
+    return mask
+
+
+class EncodeAvailabilityTests(SimpleTestCase):
+    def test_time_ranges(self):
+        self.assertEqual(encode_day(['14:00-18:00']), hours(14, 15, 16, 17))
+        self.assertEqual(encode_day(['8:00-10:00', '9h30 à 11h00']), hours(8, 9, 10))
+        self.assertEqual(encode_day(['22:00-00:00']), hours(22, 23))
+
+    def test_partial_hours_cover_the_whole_hour(self):
+        self.assertEqual(encode_day(['10:30-11:15']), hours(10, 11))
+
+    def test_single_times_and_periods(self):
+        self.assertEqual(encode_day(['9']), hours(9))
+        self.assertEqual(encode_day(['Matin']), hours(8, 9, 10, 11))
+        self.assertEqual(encode_day(['soir', 'nuit']), hours(18, 19, 20, 21, 22, 23))
+
+    def test_unparsable_slots_are_ignored(self):
+        self.assertEqual(encode_day(['bientôt', '18:00-14:00', '25:00', None, 7]), 0)
+        self.assertEqual(encode_day(None), 0)
+
+    def test_week(self):
+        mask = encode_availability({'monday': ['matin'], 'sunday': ['20h00-21h00'], 'holiday': ['matin']})
+        self.assertEqual(len(mask), len(DAYS))
+        self.assertEqual(mask[0], hours(8, 9, 10, 11))
+        self.assertEqual(mask[-1], hours(20))
+        self.assertFalse(any(mask[1:-1]))
+        self.assertEqual(encode_availability(['monday']), [0] * len(DAYS))
+
+
+class ScheduleOverlapTests(SimpleTestCase):
+    def test_jaccard_per_shared_day(self):
+        monday = [hours(8, 9, 10, 11)] + [0] * 6
+        other = [hours(10, 11, 12, 13), hours(9)] + [0] * 5
+        self.assertAlmostEqual(schedule_overlap(monday, other), 2 / 6)
+        self.assertEqual(schedule_overlap(monday, monday), 1.0)
+
+    def test_no_shared_day(self):
+        self.assertEqual(schedule_overlap([hours(9)] + [0] * 6, [0, hours(9)] + [0] * 5), 0.0)
+        self.assertEqual(schedule_overlap([0] * 7, [hours(9)] * 7), 0.0)
@@ -0,0 +1,19 @@
+from dashboard.feed import ActivitySource, register
+
+from .models import Expense
+
+
+@register
+class ExpenseActivity(ActivitySource):
+    name = 'expense'
+    select_related = ('category',)
+    icon = '💳'
+
+    def queryset(self, user):
+        return Expense.objects.filter(budget__student=user)
+
+    def serialize(self, expense):
+        return {
+            'title': f'Dépense: {expense.description}',
+            'description': f'{expense.amount}€ - {expense.category.name}',
+        }
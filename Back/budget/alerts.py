@@ -0,0 +1,107 @@
+"""
+Budget alerts raised as expenses are written.
+
+Budget and CategoryBudget keep in ``alert_level`` the highest threshold their
+``spent_total`` has reached. After every expense write the level is recomputed
+from the stored totals and moved with a conditional UPDATE; only the writer
+whose UPDATE moved it up emits the BudgetAlert, so each crossing is alerted
+exactly once (a jump over several thresholds is alerted at the highest), and
+dropping back below a threshold re-arms it. Savings goals close to their
+deadline get a single reminder, guarded the same way by
+``SavingsGoal.reminder_sent``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Budget, BudgetAlert, CategoryBudget, SavingsGoal
+
+
+# Percent of the budget spent -> alert type
+THRESHOLDS = getattr(settings, 'BUDGET_ALERT_THRESHOLDS', {80: 'LOW_FUNDS', 100: 'OVERSPEND'})
+GOAL_REMINDER_DAYS = getattr(settings, 'SAVINGS_GOAL_REMINDER_DAYS', 14)
+
+
+def threshold_level(spent, limit):
+    """Highest threshold reached by ``spent`` out of ``limit`` (0 when none)"""
+    if limit <= 0:
+        return 0
+    percent = spent * 100 / limit
+    return max((threshold for threshold in THRESHOLDS if percent >= threshold), default=0)
+
+
+def _alert_text(level, spent, limit, label):
+    if THRESHOLDS[level] == 'OVERSPEND':
+        return f'{label} dépassé', f'Vous avez dépassé de {spent - limit}€ ({spent}€ dépensés sur {limit}€)'
+    return f'{label} bientôt épuisé', f'Vous avez utilisé {level}% ({spent}€ sur {limit}€)'
+
+
+def _raised(queryset, old, new):
+    """Move alert_level from old to new; True when this call moved it up"""
+    return queryset.filter(alert_level=old).update(alert_level=new) == 1 and new > old
+
+
+def evaluate_budgets(budget_ids, goals=True):
+    """Emit the alerts of the budgets (and their categories) whose totals crossed a threshold
+
+    With ``goals`` the savings goals of the budgets' students are checked too.
+    """
+    alerts = []
+    budgets = Budget.objects.filter(pk__in=budget_ids).values_list(
+        'pk', 'student_id', 'month', 'total_budget', 'spent_total', 'alert_level'
+    )
+    months = {}
+    for pk, student_id, month, limit, spent, old in budgets:
+        months[pk] = (student_id, month)
+        new = threshold_level(spent, limit)
+        if new != old and _raised(Budget.objects.filter(pk=pk), old, new):
+            title, message = _alert_text(new, spent, limit, f'Budget {month.strftime("%m/%Y")}')
+            alerts.append(BudgetAlert(
+                student_id=student_id, budget_id=pk, alert_type=THRESHOLDS[new], title=title, message=message,
+            ))
+
+    categories = CategoryBudget.objects.filter(budget__in=months).values_list(
+        'pk', 'budget_id', 'category_id', 'category__name', 'allocated_amount', 'spent_total', 'alert_level'
+    )
+    for pk, budget_id, category_id, name, limit, spent, old in categories:
+        new = threshold_level(spent, limit)
+        if new != old and _raised(CategoryBudget.objects.filter(pk=pk), old, new):
+            title, message = _alert_text(new, spent, limit, f'Budget {name}')
+            alerts.append(BudgetAlert(
+                student_id=months[budget_id][0], budget_id=budget_id, category_id=category_id,
+                alert_type=THRESHOLDS[new], title=title, message=message,
+            ))
+
+    if goals and months:
+        alerts += _goal_reminders({student_id for student_id, _ in months.values()})
+    return BudgetAlert.objects.bulk_create(alerts)
+
+
+def _goal_reminders(student_ids, today=None):
+    today = today or timezone.localdate()
+    goals = SavingsGoal.objects.filter(
+        student__in=student_ids,
+        is_achieved=False,
+        reminder_sent=False,
+        target_date__lte=today + timedelta(days=GOAL_REMINDER_DAYS),
+    )
+    alerts = []
+    for goal in goals:
+        if not SavingsGoal.objects.filter(pk=goal.pk, reminder_sent=False).update(reminder_sent=True):
+            continue
+        remaining = goal.target_amount - goal.current_amount
+        alerts.append(BudgetAlert(
+            student_id=goal.student_id,
+            savings_goal=goal,
+            alert_type='GOAL_REMINDER',
+            title=f'Objectif "{goal.name}" bientôt à échéance',
+            message=f'Il reste {remaining}€ à épargner avant le {goal.target_date.strftime("%d/%m/%Y")}',
+        ))
+    return alerts
+
+
+def evaluate_goals(student_ids, today=None):
+    """Remind once about every open savings goal whose deadline is near"""
+    return BudgetAlert.objects.bulk_create(_goal_reminders(student_ids, today))
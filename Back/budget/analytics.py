@@ -0,0 +1,195 @@
+"""
+Vectorized budget analytics for a student or a cohort of students.
+
+Expenses, budgets and savings goals are read with ``values_list`` straight into
+NumPy columns; every figure is then a ``bincount`` or an array expression over
+those columns, so thousands of students are aggregated without creating a
+single model instance. Cohort figures are per-student averages, which makes a
+student's own numbers directly comparable with their cohort's.
+
+NumPy is imported here only; the analytics view loads this module on first use.
+"""
+
+from calendar import monthrange
+
+import numpy as np
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Budget, Expense, ExpenseCategory, SavingsGoal
+
+
+ROLLING_WINDOW = 3
+MIN_COHORT_SIZE = 5
+
+
+def _float(expression):
+    return Cast(expression, FloatField())
+
+
+def _columns(rows, count):
+    """Columns of a values_list result (empty columns when there are no rows)"""
+    columns = list(zip(*rows))
+    return columns if columns else [()] * count
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` values (fewer at the start of the series)"""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+class ExpenseFrame:
+    """Expenses of a set of students over the last ``months`` months, as NumPy columns"""
+
+    def __init__(self, student_ids, months=12, today=None):
+        self.today = today or timezone.localdate()
+        self.student_ids = np.array(sorted(student_ids), dtype=np.int64)
+        self.months = months
+        self.last_month = np.datetime64(self.today, 'M')
+        self.first_month = self.last_month - (months - 1)
+
+        student, day, category, amount = _columns(
+            Expense.objects.filter(
+                budget__student__in=student_ids,
+                date__gte=self.first_month.astype('datetime64[D]').item(),
+                date__lte=self.today,
+            ).values_list('budget__student_id', 'date', 'category_id', _float('amount')),
+            4,
+        )
+        days = np.array(day, dtype='datetime64[D]')
+        self.student = np.searchsorted(self.student_ids, np.array(student, dtype=np.int64))
+        self.month = (days.astype('datetime64[M]') - self.first_month).astype(np.int64)
+        self.category_ids, self.category = np.unique(np.array(category, dtype=np.int64), return_inverse=True)
+        self.amount = np.array(amount, dtype=np.float64)
+
+    @property
+    def size(self):
+        return len(self.student_ids)
+
+    def month_labels(self):
+        return [str(self.first_month + offset) for offset in range(self.months)]
+
+    def category_breakdown(self):
+        """(months, categories) matrix of per-student spend"""
+        shape = (self.months, len(self.category_ids))
+        flat = np.bincount(
+            self.month * shape[1] + self.category, weights=self.amount, minlength=shape[0] * shape[1]
+        )
+        return flat.reshape(shape) / self.size
+
+    def student_months(self):
+        """(students, months) matrix of each student's monthly spend"""
+        flat = np.bincount(
+            self.student * self.months + self.month, weights=self.amount, minlength=self.size * self.months
+        )
+        return flat.reshape(self.size, self.months)
+
+    def projection(self, spend):
+        """Spend so far and projected month-end spend of every student
+
+        The projection adds to the current month's spend the remaining share
+        of an average previous month (or of the current run rate when there
+        is no history).
+        """
+        days_in_month = monthrange(self.today.year, self.today.month)[1]
+        elapsed = self.today.day / days_in_month
+        spent = spend[:, -1]
+        history = spend[:, :-1].mean(axis=1) if self.months > 1 else spent / elapsed
+        return spent, spent + (1 - elapsed) * history
+
+
+def _current_budgets(frame):
+    """Total budget and income of every student for the current month (0 without a budget)"""
+    student, total_budget, income = _columns(
+        Budget.objects.filter(
+            student__in=frame.student_ids.tolist(), month=frame.today.replace(day=1)
+        ).values_list(
+            'student_id',
+            _float('total_budget'),
+            _float(F('scholarship') + F('family_support') + F('part_time_job') + F('other_income')),
+        ),
+        3,
+    )
+    index = np.searchsorted(frame.student_ids, np.array(student, dtype=np.int64))
+    budgets = np.zeros(frame.size)
+    incomes = np.zeros(frame.size)
+    budgets[index] = total_budget
+    incomes[index] = income
+    return budgets, incomes
+
+
+def savings_needed(target_amount, current_amount, target_dates, today):
+    """Vectorized SavingsGoal.monthly_savings_needed"""
+    remaining = target_amount - current_amount
+    months_left = (
+        np.array(target_dates, dtype='datetime64[M]') - np.datetime64(today, 'M')
+    ).astype(np.int64)
+    overdue = (np.array(target_dates, dtype='datetime64[D]') <= np.datetime64(today)) | (months_left <= 0)
+    return np.where(overdue, remaining, remaining / np.maximum(months_left, 1))
+
+
+def budget_analytics(student_ids, months=12, window=ROLLING_WINDOW, today=None):
+    """Breakdown, rolling averages, projection and savings goal outlook of a set of students"""
+    frame = ExpenseFrame(student_ids, months, today)
+    breakdown = frame.category_breakdown()
+    totals = breakdown.sum(axis=1)
+    spend = frame.student_months()
+    spent, projected = frame.projection(spend)
+    budgets, incomes = _current_budgets(frame)
+    has_budget = budgets > 0
+
+    goal_ids, goal_students, names, target, current, target_dates = _columns(
+        SavingsGoal.objects.filter(student__in=frame.student_ids.tolist(), is_achieved=False).values_list(
+            'pk', 'student_id', 'name', _float('target_amount'), _float('current_amount'), 'target_date'
+        ),
+        6,
+    )
+    needed = savings_needed(
+        np.array(target, dtype=np.float64), np.array(current, dtype=np.float64), target_dates, frame.today
+    )
+    owner = np.searchsorted(frame.student_ids, np.array(goal_students, dtype=np.int64))
+    # What a student can set aside each month: income left after their projected spend
+    capacity = (incomes - projected)[owner]
+    on_track = capacity >= needed
+
+    names_by_id = dict(
+        ExpenseCategory.objects.filter(pk__in=frame.category_ids.tolist()).values_list('pk', 'name')
+    )
+    result = {
+        'students': frame.size,
+        'months': frame.month_labels(),
+        'categories': [
+            {'id': int(pk), 'name': names_by_id.get(int(pk), '')} for pk in frame.category_ids
+        ],
+        'breakdown': np.round(breakdown, 2).tolist(),
+        'monthly_totals': np.round(totals, 2).tolist(),
+        'rolling_average': np.round(rolling_mean(totals, window), 2).tolist(),
+        'projection': {
+            'month': frame.month_labels()[-1],
+            'spent': round(float(spent.mean()), 2),
+            'projected': round(float(projected.mean()), 2),
+            'budget': round(float(budgets[has_budget].mean()), 2) if has_budget.any() else 0,
+            'over_budget_students': int((has_budget & (projected > budgets)).sum()),
+        },
+        'savings_goals': {
+            'count': len(goal_ids),
+            'monthly_savings_needed': round(float(needed.sum()) / frame.size, 2),
+            'on_track': int(on_track.sum()),
+        },
+    }
+    if frame.size == 1:
+        result['savings_goals']['goals'] = [
+            {
+                'id': goal_ids[i],
+                'name': names[i],
+                'monthly_savings_needed': round(float(needed[i]), 2),
+                'capacity': round(float(capacity[i]), 2),
+                'on_track': bool(on_track[i]),
+            }
+            for i in range(len(goal_ids))
+        ]
+    return result
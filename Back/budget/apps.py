@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class BudgetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'budget'
+
+    def ready(self):
+        from smartcampus.images import register_image_field
+        from . import signals  # noqa: F401
+        from .models import Expense
+
+        # Receipts stay legible at the small size
+        register_image_field(Expense, 'receipt_image', small=1024, thumb=200)
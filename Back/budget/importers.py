@@ -0,0 +1,309 @@
+"""
+Streaming expense import and export.
+
+Bank statements (CSV or OFX) are read row by row and written in chunks: each
+chunk resolves its categories, students and monthly budgets from caches,
+drops rows already recorded (same student, date, amount and description),
+inserts the rest with one ``bulk_create`` and recomputes the totals of the
+budgets it touched once. Exports stream ``.iterator()`` rows straight into the
+response, so neither direction holds a whole file in memory.
+"""
+
+import csv
+import hashlib
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import Student
+from .models import Expense
+from .resolvers import BudgetResolver, CategoryResolver
+from .signals import expenses_bulk_created
+from .totals import recalculate_totals
+
+
+CHUNK_SIZE = getattr(settings, 'EXPENSE_IMPORT_CHUNK_SIZE', 1000)
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 50
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y', '%Y%m%d')
+CENT = Decimal('0.01')
+
+# Accepted CSV headers, mapped to Expense fields
+CSV_HEADERS = {
+    'date': 'date',
+    'description': 'description',
+    'libellé': 'description',
+    'libelle': 'description',
+    'amount': 'amount',
+    'montant': 'amount',
+    'category': 'category',
+    'catégorie': 'category',
+    'categorie': 'category',
+    'payment_method': 'payment_method',
+    'location': 'location',
+    'lieu': 'location',
+    'notes': 'notes',
+    'student': 'student',
+    'étudiant': 'student',
+    'etudiant': 'student',
+    'username': 'student',
+}
+EXPORT_COLUMNS = ('date', 'description', 'amount', 'category', 'payment_method', 'location', 'notes')
+
+OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)')
+OFX_PAYMENT_METHODS = {
+    'ATM': 'CASH',
+    'CASH': 'CASH',
+    'CHECK': 'CHECK',
+    'XFER': 'TRANSFER',
+    'DIRECTDEBIT': 'TRANSFER',
+    'REPEATPMT': 'TRANSFER',
+    'PAYMENT': 'TRANSFER',
+}
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Date invalide: {value!r}')
+
+
+def parse_amount(value):
+    """Decimal amount from '12.50', '12,50', '-1 234,56 €' or '1.234,56'"""
+    text = (value or '').strip().replace('\xa0', '').replace(' ', '').replace('€', '')
+    if ',' in text and '.' in text:
+        text = text.replace('.', '').replace(',', '.')
+    else:
+        text = text.replace(',', '.')
+    try:
+        return Decimal(text).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f'Montant invalide: {value!r}') from None
+
+
+def _normalize(description):
+    return ' '.join(description.split()).lower()
+
+
+def expense_hash(student_id, day, amount, description):
+    """Identity of an expense for deduplication"""
+    key = f'{student_id}|{day.isoformat()}|{amount:.2f}|{_normalize(description)}'
+    return hashlib.sha1(key.encode()).digest()
+
+
+def iter_csv(stream):
+    """(line number, record) pairs of a CSV file separated by ',' or ';'"""
+    header = next(stream, '')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.reader(chain([header], stream), delimiter=delimiter)
+    columns = [CSV_HEADERS.get(name.strip().lower()) for name in next(reader, [])]
+    if 'date' not in columns or 'amount' not in columns:
+        raise ValueError('Les colonnes "date" et "amount" sont obligatoires')
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, {
+            column: cell.strip() for column, cell in zip(columns, row) if column is not None
+        }
+
+
+def iter_ofx(stream):
+    """(line number, record) pairs of the STMTTRN blocks of an OFX 1 (SGML) or 2 (XML) file"""
+    transaction_tags = None
+    start = 0
+    for line_number, line in enumerate(stream, 1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            if tag == 'STMTTRN':
+                if closing and transaction_tags is not None:
+                    yield start, {
+                        'date': transaction_tags.get('DTPOSTED', '')[:8],
+                        'amount': transaction_tags.get('TRNAMT', ''),
+                        'description': transaction_tags.get('NAME') or transaction_tags.get('MEMO', ''),
+                        'notes': transaction_tags.get('MEMO', '') if transaction_tags.get('NAME') else '',
+                        'payment_method': OFX_PAYMENT_METHODS.get(transaction_tags.get('TRNTYPE'), 'CARD'),
+                    }
+                    transaction_tags = None
+                elif not closing:
+                    transaction_tags, start = {}, line_number
+            elif transaction_tags is not None and not closing:
+                transaction_tags[tag] = value.strip()
+
+
+def _clean(record, signed):
+    """Validated expense values of a record, or None for rows that are not expenses"""
+    amount = parse_amount(record.get('amount'))
+    if signed:
+        # Bank statements: debits are negative, credits are income
+        if amount >= 0:
+            return None
+        amount = -amount
+    else:
+        amount = abs(amount)
+    if not amount:
+        return None
+
+    description = ' '.join(record.get('description', '').split())[:200]
+    if not description:
+        raise ValueError('Description manquante')
+    payment_method = record.get('payment_method', '').upper()
+    return {
+        'date': parse_date(record.get('date')),
+        'amount': amount,
+        'description': description,
+        'category': record.get('category', ''),
+        'payment_method': payment_method if payment_method in dict(Expense.PAYMENT_METHODS) else 'CARD',
+        'location': record.get('location', '')[:100],
+        'notes': record.get('notes', ''),
+        'student': record.get('student', ''),
+    }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class ExpenseImporter:
+    """Import expense records in chunks for one student or the students named in the file"""
+
+    def __init__(self, student=None, signed=False, chunk_size=CHUNK_SIZE, default_category='Autre'):
+        self.student = student
+        self.signed = signed
+        self.chunk_size = chunk_size
+        self.categories = CategoryResolver(default_category)
+        self.budgets = BudgetResolver()
+        self.student_ids = {}
+        self.seen = set()
+        self.report = {'created': 0, 'duplicates': 0, 'skipped': 0, 'error_count': 0, 'errors': []}
+
+    def error(self, line, message):
+        self.report['error_count'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line, 'error': message})
+
+    def resolve_students(self, rows):
+        if self.student is not None:
+            for _, row in rows:
+                row['student_id'] = self.student.pk
+            return rows
+
+        usernames = {row['student'] for _, row in rows} - set(self.student_ids)
+        if usernames:
+            self.student_ids.update(
+                Student.objects.filter(username__in=usernames).values_list('username', 'pk')
+            )
+        resolved = []
+        for line, row in rows:
+            row['student_id'] = self.student_ids.get(row['student'])
+            if row['student_id'] is None:
+                self.error(line, f'Étudiant inconnu: {row["student"]!r}')
+            else:
+                resolved.append((line, row))
+        return resolved
+
+    def existing_hashes(self, rows):
+        """Hashes of the already recorded expenses a chunk could duplicate"""
+        dates = [row['date'] for _, row in rows]
+        expenses = Expense.objects.filter(
+            budget__student__in={row['student_id'] for _, row in rows},
+            date__range=(min(dates), max(dates)),
+        ).values_list('budget__student_id', 'date', 'amount', 'description')
+        return {expense_hash(*values) for values in expenses.iterator(chunk_size=EXPORT_CHUNK_SIZE)}
+
+    def import_chunk(self, records):
+        rows = []
+        for line, record in records:
+            try:
+                row = _clean(record, self.signed)
+            except ValueError as exc:
+                self.error(line, str(exc))
+                continue
+            if row is None:
+                self.report['skipped'] += 1
+            else:
+                rows.append((line, row))
+
+        rows = self.resolve_students(rows)
+        if not rows:
+            return
+
+        existing = self.existing_hashes(rows)
+        self.budgets.prefetch(((row['student_id'], row['date']) for _, row in rows), create=True)
+        expenses = []
+        for _, row in rows:
+            key = expense_hash(row['student_id'], row['date'], row['amount'], row['description'])
+            if key in existing or key in self.seen:
+                self.report['duplicates'] += 1
+                continue
+            self.seen.add(key)
+            expenses.append(Expense(
+                budget_id=self.budgets.resolve(row['student_id'], row['date']),
+                category_id=self.categories.resolve(row['category']),
+                description=row['description'],
+                amount=row['amount'],
+                date=row['date'],
+                payment_method=row['payment_method'],
+                location=row['location'],
+                notes=row['notes'],
+            ))
+        if not expenses:
+            return
+
+        budget_ids = {expense.budget_id for expense in expenses}
+        with transaction.atomic():
+            # bulk_create skips the per-row signals, so totals are rebuilt once here
+            Expense.objects.bulk_create(expenses, batch_size=self.chunk_size)
+            recalculate_totals(budget_ids)
+        self.report['created'] += len(expenses)
+        expenses_bulk_created.send(
+            sender=Expense,
+            student_ids={row['student_id'] for _, row in rows},
+            budget_ids=budget_ids,
+        )
+
+    def run(self, records):
+        for chunk in _chunks(records, self.chunk_size):
+            self.import_chunk(chunk)
+        return self.report
+
+
+def import_expenses(stream, file_format='csv', student=None, signed=False, **options):
+    """Import a CSV or OFX text stream; OFX amounts are always signed"""
+    if file_format == 'ofx':
+        records, signed = iter_ofx(stream), True
+    else:
+        records = iter_csv(stream)
+    return ExpenseImporter(student, signed, **options).run(records)
+
+
+class _Echo:
+    """File-like object handing csv.writer rows back instead of buffering them"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(expenses, include_student=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV lines (header first) of an Expense queryset, fetched ``chunk_size`` rows at a time"""
+    writer = csv.writer(_Echo())
+    fields = ['date', 'description', 'amount', 'category__name', 'payment_method', 'location', 'notes']
+    columns = list(EXPORT_COLUMNS)
+    if include_student:
+        fields.append('budget__student__username')
+        columns.append('student')
+
+    yield writer.writerow(columns)
+    rows = expenses.order_by('date', 'pk').values_list(*fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield writer.writerow(row)
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budget.alerts import GOAL_REMINDER_DAYS, evaluate_budgets, evaluate_goals
+from budget.models import Budget, SavingsGoal
+
+
+class Command(BaseCommand):
+    help = 'Send due savings goal reminders and re-check the alerts of the current month budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budgets', action='store_true', help='Also re-evaluate every current month budget')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        # Deadlines come closer without any write, so goals need a daily pass
+        student_ids = set(SavingsGoal.objects.filter(
+            is_achieved=False, reminder_sent=False, target_date__lte=today + timedelta(days=GOAL_REMINDER_DAYS)
+        ).values_list('student_id', flat=True))
+        alerts = len(evaluate_goals(student_ids, today))
+
+        if options['budgets']:
+            budget_ids = list(Budget.objects.filter(month=today.replace(day=1)).values_list('pk', flat=True))
+            alerts += len(evaluate_budgets(budget_ids, goals=False))
+
+        self.stdout.write(self.style.SUCCESS(f'{alerts} alertes créées'))
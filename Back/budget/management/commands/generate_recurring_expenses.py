@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.importers import parse_date
+from budget.recurring import CHUNK_SIZE, generate_due_expenses
+
+
+class Command(BaseCommand):
+    help = 'Create the expenses of due recurring expenses, catching up missed occurrences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Generate occurrences due up to this date (default: today)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            today = parse_date(options['date']) if options['date'] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        start = time.perf_counter()
+        report = generate_due_expenses(today, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['entries']} échéances traitées en {time.perf_counter() - start:.2f}s: "
+            f"{report['expenses']} dépenses créées, {report['alerts']} alertes, "
+            f"{report['duplicates']} déjà générées, {report['deactivated']} terminées"
+        ))
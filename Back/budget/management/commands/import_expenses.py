@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Student
+from budget.importers import CHUNK_SIZE, import_expenses
+
+
+class Command(BaseCommand):
+    help = 'Import expenses from a CSV or OFX bank statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or OFX file')
+        parser.add_argument('--student', help='Username owning every row (otherwise read from a "student" column)')
+        parser.add_argument('--format', choices=['csv', 'ofx'], help='Defaults to the file extension')
+        parser.add_argument('--signed', action='store_true', help='Negative amounts are expenses, positive ones are skipped')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--category', default='Autre', help='Category of rows without a known category')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        student = None
+        if options['student']:
+            try:
+                student = Student.objects.get(username=options['student'])
+            except Student.DoesNotExist:
+                raise CommandError(f"Étudiant inconnu: {options['student']}")
+
+        path = options['path']
+        file_format = options['format'] or ('ofx' if path.lower().endswith('.ofx') else 'csv')
+        try:
+            with open(path, encoding=options['encoding'], errors='replace', newline='') as stream:
+                report = import_expenses(
+                    stream,
+                    file_format,
+                    student=student,
+                    signed=options['signed'],
+                    chunk_size=options['chunk_size'],
+                    default_category=options['category'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"Ligne {error['line']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} dépenses importées, {report['duplicates']} doublons, "
+            f"{report['skipped']} lignes ignorées, {report['error_count']} erreurs"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from budget.totals import drifted, recalculate_totals
+
+
+class Command(BaseCommand):
+    help = 'Detect and repair drift between stored budget totals and their expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted totals')
+
+    def handle(self, *args, **options):
+        budgets, categories = drifted()
+        budget_ids = list(budgets.values_list('pk', flat=True))
+        category_budget_ids = list(categories.values_list('budget_id', flat=True))
+
+        for budget in budgets:
+            self.stdout.write(f'Budget {budget.pk}: {budget.spent_total} enregistré, {budget.actual} réel')
+        for category in categories:
+            self.stdout.write(
+                f'CategoryBudget {category.pk}: {category.spent_total} enregistré, {category.actual} réel'
+            )
+
+        if not budget_ids and not category_budget_ids:
+            self.stdout.write(self.style.SUCCESS('Aucun écart détecté'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(budget_ids)} budgets et {len(category_budget_ids)} catégories en écart'
+            ))
+            return
+
+        recalculate_totals(set(budget_ids) | set(category_budget_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(budget_ids)} budgets et {len(category_budget_ids)} catégories corrigés'
+        ))
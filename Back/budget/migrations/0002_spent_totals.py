@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:24
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_spent_totals(apps, schema_editor):
+    Budget = apps.get_model('budget', 'Budget')
+    CategoryBudget = apps.get_model('budget', 'CategoryBudget')
+    Expense = apps.get_model('budget', 'Expense')
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def expense_sum(**filters):
+        return Coalesce(
+            Subquery(
+                Expense.objects.filter(**filters).order_by().values('budget')
+                .annotate(total=Sum('amount')).values('total')[:1],
+                output_field=money,
+            ),
+            Value(0),
+            output_field=money,
+        )
+
+    Budget.objects.update(spent_total=expense_sum(budget=OuterRef('pk')))
+    CategoryBudget.objects.update(
+        spent_total=expense_sum(budget=OuterRef('budget'), category=OuterRef('category'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='categorybudget',
+            name='spent_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_spent_totals, migrations.RunPython.noop),
+    ]
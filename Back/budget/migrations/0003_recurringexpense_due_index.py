@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0002_spent_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recurringexpense',
+            index=models.Index(fields=['is_active', 'next_due_date'], name='budget_recu_is_acti_6c4504_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+def fill_alert_levels(apps, schema_editor):
+    # Start from the thresholds already reached so existing budgets are not alerted retroactively
+    Budget = apps.get_model('budget', 'Budget')
+    CategoryBudget = apps.get_model('budget', 'CategoryBudget')
+    for model, limit_field in ((Budget, 'total_budget'), (CategoryBudget, 'allocated_amount')):
+        for threshold in (80, 100):
+            model.objects.filter(**{
+                f'{limit_field}__gt': 0,
+                'spent_total__gte': models.F(limit_field) * threshold / 100,
+            }).update(alert_level=threshold)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0003_recurringexpense_due_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='alert_level',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorybudget',
+            name='alert_level',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='savingsgoal',
+            name='reminder_sent',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fill_alert_levels, migrations.RunPython.noop),
+    ]
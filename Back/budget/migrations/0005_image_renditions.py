@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0004_alert_levels'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_image_small',
+            field=models.ImageField(blank=True, editable=False, upload_to='receipts/small/'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_image_thumb',
+            field=models.ImageField(blank=True, editable=False, upload_to='receipts/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='receipt_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,6 +2,12 @@ from django.db import models
 from django.conf import settings
 from decimal import Decimal
 
+from smartcampus.counters import fields_without_counters
+
+
+# Kept by budget.signals
+TOTALS = ('spent_total', 'alert_level')
+
 
 class ExpenseCategory(models.Model):
     """Expense categories for budget tracking"""
@@ -30,6 +36,11 @@ class Budget(models.Model):
     part_time_job = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     other_income = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
+    # Running sum of the expenses, maintained by budget.signals
+    spent_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    # Highest alert threshold (percent) reached by spent_total, see budget.alerts
+    alert_level = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -39,13 +50,18 @@ class Budget(models.Model):
     def __str__(self):
         return f"Budget {self.student.username} - {self.month.strftime('%B %Y')}"
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = fields_without_counters(self, TOTALS)
+        super().save(*args, **kwargs)
+    
     @property
     def total_income(self):
         return self.scholarship + self.family_support + self.part_time_job + self.other_income
     
     @property
     def total_expenses(self):
-        return sum(expense.amount for expense in self.expenses.all())
+        return self.spent_total
     
     @property
     def remaining_budget(self):
@@ -62,18 +78,24 @@ class CategoryBudget(models.Model):
     category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE)
     allocated_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
+    # Running sum of the budget's expenses in this category, maintained by budget.signals
+    spent_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    alert_level = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     class Meta:
         unique_together = ('budget', 'category')
     
     def __str__(self):
         return f"{self.budget} - {self.category.name}: {self.allocated_amount}€"
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = fields_without_counters(self, TOTALS)
+        super().save(*args, **kwargs)
+    
     @property
     def spent_amount(self):
-        return sum(
-            expense.amount for expense in 
-            self.budget.expenses.filter(category=self.category)
-        )
+        return self.spent_total
     
     @property
     def remaining_amount(self):
@@ -105,6 +127,11 @@ class Expense(models.Model):
     location = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
     receipt_image = models.ImageField(upload_to='receipts/', blank=True)
+    # Renditions and dimensions written by smartcampus.images
+    receipt_image_small = models.ImageField(upload_to='receipts/small/', blank=True, editable=False)
+    receipt_image_thumb = models.ImageField(upload_to='receipts/thumbs/', blank=True, editable=False)
+    receipt_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    receipt_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     is_recurring = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -137,6 +164,11 @@ class RecurringExpense(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.amount}€ ({self.get_frequency_display()})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'next_due_date']),
+        ]
 
 
 class SavingsGoal(models.Model):
@@ -148,6 +180,7 @@ class SavingsGoal(models.Model):
     target_date = models.DateField()
     description = models.TextField(blank=True)
     is_achieved = models.BooleanField(default=False)
+    reminder_sent = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -0,0 +1,144 @@
+"""
+Turn due RecurringExpense entries into Expense rows.
+
+Due entries are read through the ``(is_active, next_due_date)`` index in
+chunks of plain tuples. For each chunk every missed occurrence is generated
+(catch-up after downtime), the monthly budgets they fall into are fetched or
+created in bulk, the expenses go in with one ``bulk_create`` and the entries'
+``next_due_date`` move forward with one UPDATE per distinct new date, all in
+the same transaction. Generated expenses that already exist (same student, date, amount
+and name, flagged ``is_recurring``) are skipped, so a rerun creates nothing.
+Entries without ``auto_create_expense`` get a RECURRING_DUE alert instead.
+"""
+
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import BudgetAlert, Expense, RecurringExpense
+from .resolvers import BudgetResolver
+from .signals import expenses_bulk_created
+from .totals import recalculate_totals
+
+
+CHUNK_SIZE = getattr(settings, 'RECURRING_EXPENSE_CHUNK_SIZE', 2000)
+# Bounds the catch-up of an entry per run (ten years of weekly occurrences)
+MAX_OCCURRENCES = 520
+
+FREQUENCY_MONTHS = {'MONTHLY': 1, 'QUARTERLY': 3, 'YEARLY': 12}
+FIELDS = (
+    'pk', 'student_id', 'category_id', 'name', 'amount', 'frequency',
+    'start_date', 'end_date', 'next_due_date', 'auto_create_expense',
+)
+
+
+def advance(day, frequency, anchor_day):
+    """Due date following ``day``; monthly steps keep the start day when the month allows"""
+    if frequency == 'WEEKLY':
+        return day + timedelta(weeks=1)
+    year, month = divmod(day.month - 1 + FREQUENCY_MONTHS[frequency], 12)
+    year, month = day.year + year, month + 1
+    return date(year, month, min(anchor_day, monthrange(year, month)[1]))
+
+
+def occurrences(next_due_date, frequency, anchor_day, until, end_date=None):
+    """Due dates up to ``until`` (and ``end_date``), and the due date after them"""
+    dates = []
+    day = next_due_date
+    while day <= until and (end_date is None or day <= end_date) and len(dates) < MAX_OCCURRENCES:
+        dates.append(day)
+        day = advance(day, frequency, anchor_day)
+    return dates, day
+
+
+def _existing(rows, dates):
+    """Already generated (student, date, amount, description) keys of a chunk"""
+    return set(Expense.objects.filter(
+        is_recurring=True,
+        budget__student__in={row[1] for row in rows},
+        date__range=(min(dates), max(dates)),
+    ).values_list('budget__student_id', 'date', 'amount', 'description'))
+
+
+def _process(rows, today, budgets, report):
+    """Generate the occurrences of one chunk; returns the (student ids, budget ids) written to"""
+    schedule = []
+    for pk, student_id, category_id, name, amount, frequency, start_date, end_date, next_due, auto in rows:
+        dates, following = occurrences(next_due, frequency, start_date.day, today, end_date)
+        schedule.append((pk, student_id, category_id, name[:200], amount, auto, dates, following, end_date))
+
+    occurred = [day for *_, dates, _, _ in schedule for day in dates]
+    existing = _existing(rows, occurred) if occurred else set()
+    budgets.prefetch(
+        ((student_id, day) for _, student_id, _, _, _, auto, dates, _, _ in schedule if auto for day in dates),
+        create=True,
+    )
+
+    expenses, alerts, student_ids = [], [], set()
+    advanced = {}
+    for pk, student_id, category_id, name, amount, auto, dates, following, end_date in schedule:
+        for day in dates:
+            if not auto:
+                alerts.append(BudgetAlert(
+                    student_id=student_id,
+                    alert_type='RECURRING_DUE',
+                    category_id=category_id,
+                    title=f'Échéance: {name}',
+                    message=f'{amount}€ à payer le {day.strftime("%d/%m/%Y")}',
+                ))
+            elif (student_id, day, amount, name) in existing:
+                report['duplicates'] += 1
+            else:
+                expenses.append(Expense(
+                    budget_id=budgets.resolve(student_id, day),
+                    category_id=category_id,
+                    description=name,
+                    amount=amount,
+                    date=day,
+                    is_recurring=True,
+                ))
+                student_ids.add(student_id)
+        still_active = end_date is None or following <= end_date
+        advanced.setdefault((following, still_active), []).append(pk)
+
+    Expense.objects.bulk_create(expenses, batch_size=CHUNK_SIZE)
+    BudgetAlert.objects.bulk_create(alerts, batch_size=CHUNK_SIZE)
+    # Entries of a chunk mostly share their next due date: one UPDATE per distinct date
+    for (following, still_active), pks in advanced.items():
+        RecurringExpense.objects.filter(pk__in=pks).update(next_due_date=following, is_active=still_active)
+    budget_ids = {expense.budget_id for expense in expenses}
+    if budget_ids:
+        recalculate_totals(budget_ids)
+
+    report['entries'] += len(rows)
+    report['expenses'] += len(expenses)
+    report['alerts'] += len(alerts)
+    report['deactivated'] += sum(len(pks) for (_, still_active), pks in advanced.items() if not still_active)
+    return student_ids, budget_ids
+
+
+def generate_due_expenses(today=None, chunk_size=CHUNK_SIZE):
+    """Create the expenses and alerts of every recurring entry due on or before ``today``"""
+    today = today or timezone.localdate()
+    budgets = BudgetResolver()
+    report = {'entries': 0, 'expenses': 0, 'alerts': 0, 'duplicates': 0, 'deactivated': 0}
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            due = RecurringExpense.objects.filter(
+                is_active=True, next_due_date__lte=today, pk__gt=last_pk
+            ).order_by('pk')
+            if connection.features.has_select_for_update_skip_locked:
+                # A concurrent run skips the entries this one is advancing
+                due = due.select_for_update(skip_locked=True)
+            rows = list(due.values_list(*FIELDS)[:chunk_size])
+            if not rows:
+                return report
+            last_pk = rows[-1][0]
+            student_ids, budget_ids = _process(rows, today, budgets, report)
+
+        if budget_ids:
+            expenses_bulk_created.send(sender=Expense, student_ids=student_ids, budget_ids=budget_ids)
@@ -0,0 +1,75 @@
+"""
+Cached lookups used by bulk expense writes.
+"""
+
+from .models import Budget, ExpenseCategory
+
+
+class CategoryResolver:
+    """Resolve expense category names with one query for the whole run"""
+
+    def __init__(self, default_name='Autre'):
+        self.by_name = {
+            name.strip().lower(): pk
+            for pk, name in ExpenseCategory.objects.filter(is_active=True).values_list('pk', 'name')
+        }
+        self.default_name = default_name
+        self._default_id = None
+
+    @property
+    def default_id(self):
+        if self._default_id is None:
+            self._default_id = self.by_name.get(self.default_name.lower())
+        if self._default_id is None:
+            category, _ = ExpenseCategory.objects.get_or_create(name=self.default_name)
+            self._default_id = self.by_name[self.default_name.lower()] = category.pk
+        return self._default_id
+
+    def resolve(self, name):
+        """Category id for a name, falling back to the default category"""
+        if name:
+            category_id = self.by_name.get(name.strip().lower())
+            if category_id is not None:
+                return category_id
+        return self.default_id
+
+
+class BudgetResolver:
+    """Monthly Budget ids of students, created empty when missing"""
+
+    def __init__(self):
+        self.cache = {}
+
+    def prefetch(self, pairs, create=False):
+        """Load the budgets of (student id, day) pairs in one query
+
+        With ``create`` the missing ones are inserted with a single bulk_create.
+        """
+        wanted = {(student_id, day.replace(day=1)) for student_id, day in pairs} - set(self.cache)
+        if not wanted:
+            return
+        budgets = Budget.objects.filter(
+            student__in={student_id for student_id, _ in wanted},
+            month__in={month for _, month in wanted},
+        )
+        for pk, student_id, month in budgets.values_list('pk', 'student_id', 'month'):
+            self.cache[student_id, month] = pk
+
+        missing = wanted - set(self.cache)
+        if create and missing:
+            Budget.objects.bulk_create(
+                [Budget(student_id=student_id, month=month, total_budget=0) for student_id, month in missing],
+                ignore_conflicts=True,
+            )
+            self.prefetch(missing)
+
+    def resolve(self, student_id, day):
+        """Id of the student's budget for the month containing ``day``"""
+        month = day.replace(day=1)
+        key = (student_id, month)
+        if key not in self.cache:
+            budget, _ = Budget.objects.get_or_create(
+                student_id=student_id, month=month, defaults={'total_budget': 0}
+            )
+            self.cache[key] = budget.pk
+        return self.cache[key]
@@ -0,0 +1,97 @@
+"""
+Keep Budget and CategoryBudget running totals in step with expenses, then
+raise the budget alerts the new totals call for.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .alerts import evaluate_budgets, evaluate_goals
+from .models import Budget, CategoryBudget, Expense, SavingsGoal
+from .totals import apply_expense_delta, category_expense_sum
+
+
+# Sent after a bulk expense insert with ``student_ids`` and ``budget_ids``; bulk_create
+# bypasses the per-expense signals below
+expenses_bulk_created = Signal()
+
+
+@receiver(pre_save, sender=Expense)
+def remember_previous_expense(sender, instance, **kwargs):
+    instance._previous_totals_key = None
+    if not instance._state.adding:
+        instance._previous_totals_key = Expense.objects.filter(pk=instance.pk).values_list(
+            'budget_id', 'category_id', 'amount'
+        ).first()
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_totals_key', None)
+    if previous is not None:
+        budget_id, category_id, amount = previous
+        if (budget_id, category_id) == (instance.budget_id, instance.category_id):
+            apply_expense_delta(budget_id, category_id, instance.amount - amount)
+            return
+        apply_expense_delta(budget_id, category_id, -amount)
+    apply_expense_delta(instance.budget_id, instance.category_id, instance.amount)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, **kwargs):
+    apply_expense_delta(instance.budget_id, instance.category_id, -instance.amount)
+
+
+@receiver(post_save, sender=CategoryBudget)
+def category_budget_created(sender, instance, created, **kwargs):
+    # A new allocation starts from the expenses already recorded in its category
+    if created:
+        CategoryBudget.objects.filter(pk=instance.pk).update(spent_total=category_expense_sum())
+        instance.refresh_from_db(fields=['spent_total'])
+
+
+# Alert receivers are connected after the totals ones, so they see updated totals
+
+@receiver(post_save, sender=Expense)
+def expense_saved_alerts(sender, instance, **kwargs):
+    budget_ids = {instance.budget_id}
+    previous = getattr(instance, '_previous_totals_key', None)
+    if previous is not None:
+        budget_ids.add(previous[0])
+    evaluate_budgets(budget_ids)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted_alerts(sender, instance, **kwargs):
+    evaluate_budgets([instance.budget_id], goals=False)
+
+
+@receiver(expenses_bulk_created)
+def expenses_bulk_created_alerts(sender, budget_ids, **kwargs):
+    evaluate_budgets(budget_ids)
+
+
+@receiver(post_save, sender=Budget)
+def budget_saved_alerts(sender, instance, created, **kwargs):
+    # A new limit can cross (or re-arm) a threshold without any expense written
+    if not created:
+        evaluate_budgets([instance.pk], goals=False)
+
+
+@receiver(post_save, sender=CategoryBudget)
+def category_budget_saved_alerts(sender, instance, **kwargs):
+    evaluate_budgets([instance.budget_id], goals=False)
+
+
+@receiver(pre_save, sender=SavingsGoal)
+def rearm_goal_reminder(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    previous = SavingsGoal.objects.filter(pk=instance.pk).values_list('target_date', flat=True).first()
+    if previous is not None and previous != instance.target_date:
+        instance.reminder_sent = False
+
+
+@receiver(post_save, sender=SavingsGoal)
+def savings_goal_saved_alerts(sender, instance, **kwargs):
+    evaluate_goals([instance.student_id])
@@ -0,0 +1,71 @@
+"""
+Denormalized expense totals on Budget and CategoryBudget.
+
+``spent_total`` columns are moved by F() expressions as expenses are written
+(see ``budget.signals``), so reading a budget never sums its expenses.
+``recalculate_totals`` rebuilds them from the expenses in one UPDATE per
+table, for bulk writes and for the ``reconcile_budget_totals`` command.
+"""
+
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Budget, CategoryBudget, Expense
+
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def apply_expense_delta(budget_id, category_id, amount):
+    """Add ``amount`` (possibly negative) to the totals an expense counts towards"""
+    if not amount:
+        return
+    Budget.objects.filter(pk=budget_id).update(spent_total=F('spent_total') + amount)
+    CategoryBudget.objects.filter(budget_id=budget_id, category_id=category_id).update(
+        spent_total=F('spent_total') + amount
+    )
+
+
+def _expense_sum(**filters):
+    return Coalesce(
+        Subquery(
+            Expense.objects.filter(**filters).order_by().values('budget')
+            .annotate(total=Sum('amount')).values('total')[:1],
+            output_field=MONEY,
+        ),
+        Value(0),
+        output_field=MONEY,
+    )
+
+
+def budget_expense_sum():
+    return _expense_sum(budget=OuterRef('pk'))
+
+
+def category_expense_sum():
+    return _expense_sum(budget=OuterRef('budget'), category=OuterRef('category'))
+
+
+def drifted(budget_ids=None):
+    """Budgets and category budgets whose stored total differs from their expenses"""
+    budgets = Budget.objects.all()
+    categories = CategoryBudget.objects.all()
+    if budget_ids is not None:
+        budgets = budgets.filter(pk__in=budget_ids)
+        categories = categories.filter(budget__in=budget_ids)
+    budgets = budgets.annotate(actual=budget_expense_sum()).filter(~Q(spent_total=F('actual')))
+    categories = categories.annotate(actual=category_expense_sum()).filter(~Q(spent_total=F('actual')))
+    return budgets, categories
+
+
+def recalculate_totals(budget_ids=None):
+    """Rebuild spent_total from the expenses, for all budgets or only the given ones"""
+    budgets = Budget.objects.all()
+    categories = CategoryBudget.objects.all()
+    if budget_ids is not None:
+        budgets = budgets.filter(pk__in=budget_ids)
+        categories = categories.filter(budget__in=budget_ids)
+    return (
+        budgets.update(spent_total=budget_expense_sum()),
+        categories.update(spent_total=category_expense_sum()),
+    )
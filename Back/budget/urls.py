@@ -1,5 +1,10 @@
 from django.urls import path
 
+from . import views
+
 urlpatterns = [
-    # URLs will be added as we implement views
+    path('expenses/import/', views.expense_import, name='expense_import'),
+    path('expenses/export/', views.expense_export, name='expense_export'),
+    path('expenses/<int:expense_id>/receipt/', views.expense_receipt, name='expense_receipt'),
+    path('analytics/', views.analytics, name='budget_analytics'),
 ]
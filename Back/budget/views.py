@@ -1,3 +1,118 @@
-from django.shortcuts import render
+import io
 
-# Create your views here.
+from django import forms
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from accounts.models import Student
+from smartcampus.images import image_urls
+from .importers import export_rows, import_expenses, parse_date
+from .models import Expense
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def expense_import(request):
+    """Import the current user's expenses from a bank statement (CSV or OFX)"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Fichier manquant'}, status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = request.data.get('format') or ('ofx' if upload.name.lower().endswith('.ofx') else 'csv')
+    stream = io.TextIOWrapper(
+        upload.file, encoding=request.data.get('encoding', 'utf-8-sig'), errors='replace', newline=''
+    )
+    try:
+        report = import_expenses(
+            stream,
+            file_format,
+            student=request.user,
+            signed=request.data.get('signed', 'false').lower() == 'true',
+            default_category=request.data.get('default_category', 'Autre'),
+        )
+    except (ValueError, LookupError) as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def expense_export(request):
+    """Stream the current user's expenses as CSV (all students with ?scope=all for staff)"""
+    expenses = Expense.objects.all()
+    include_student = request.user.is_staff and request.GET.get('scope') == 'all'
+    if not include_student:
+        expenses = expenses.filter(budget__student=request.user)
+    try:
+        if request.GET.get('from'):
+            expenses = expenses.filter(date__gte=parse_date(request.GET['from']))
+        if request.GET.get('to'):
+            expenses = expenses.filter(date__lte=parse_date(request.GET['to']))
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(export_rows(expenses, include_student), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="depenses.csv"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def expense_receipt(request, expense_id):
+    """Attach a receipt photo; renditions are written in the background"""
+    expense = get_object_or_404(Expense, pk=expense_id, budget__student=request.user)
+    upload = request.FILES.get('receipt_image')
+    if upload is None:
+        return Response({'error': 'Fichier manquant'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        forms.ImageField().clean(upload)
+    except ValidationError as exc:
+        return Response({'error': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+    expense.receipt_image = upload
+    expense.save(update_fields=['receipt_image'])
+    return Response(image_urls(expense, 'receipt_image', request), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics(request):
+    """Spending analytics of the current user, or of a cohort with ?filiere=INFO&level=L2"""
+    # Loaded on first use so URL loading does not import NumPy
+    from .analytics import MIN_COHORT_SIZE, ROLLING_WINDOW, budget_analytics
+
+    try:
+        months = min(max(int(request.GET.get('months', 12)), 1), 60)
+        window = min(max(int(request.GET.get('window', ROLLING_WINDOW)), 1), 12)
+    except ValueError:
+        return Response({'error': 'Paramètres invalides'}, status=status.HTTP_400_BAD_REQUEST)
+
+    filiere = request.GET.get('filiere')
+    level = request.GET.get('level')
+    if not filiere and not level:
+        return Response(budget_analytics([request.user.pk], months, window))
+
+    if filiere and filiere not in dict(Student.FILIERE_CHOICES) or level and level not in dict(Student.LEVEL_CHOICES):
+        return Response({'error': 'Cohorte invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    students = Student.objects.filter(is_active=True)
+    if filiere:
+        students = students.filter(filiere=filiere)
+    if level:
+        students = students.filter(level=level)
+    student_ids = list(students.values_list('pk', flat=True))
+    # Cohort figures are averages; small cohorts would expose individual budgets
+    minimum = 1 if request.user.is_staff else MIN_COHORT_SIZE
+    if len(student_ids) < minimum:
+        return Response({'error': 'Cohorte trop petite'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = budget_analytics(student_ids, months, window)
+    result['cohort'] = {'filiere': filiere, 'level': level}
+    return Response(result)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Startup import-time check.
+
+Runs ``django.setup()`` and loads the URLconf in a fresh interpreter under
+``python -X importtime`` and fails when a heavy scientific package is
+imported. Those are only needed by the matching engine and must stay behind
+lazy imports so migrate, the test runner and every gunicorn worker start fast.
+
+Usage: python check_startup.py [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_PACKAGES = ('numpy', 'pandas', 'sklearn', 'scipy', 'matplotlib')
+
+STARTUP_CODE = (
+    "import os, django;"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartcampus.settings');"
+    "django.setup();"
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def measure_imports():
+    """Return (module, self_us, cumulative_us) for every import of a Django startup"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=Path(__file__).resolve().parent,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(result.returncode)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    total_ms = sum(self_us for _, self_us, _ in imports) / 1000
+    print(f"⏱️  Démarrage Django: {len(imports)} modules importés en {total_ms:.0f} ms")
+
+    top_level = [(name, cumulative) for name, _, cumulative in imports if '.' not in name]
+    for name, cumulative in sorted(top_level, key=lambda item: -item[1])[:args.top]:
+        print(f"   {cumulative / 1000:8.1f} ms  {name}")
+
+    heavy = sorted({name.split('.')[0] for name, _, _ in imports} & set(HEAVY_PACKAGES))
+    if heavy:
+        print(f"❌ Paquets lourds importés au démarrage: {', '.join(heavy)}")
+        sys.exit(1)
+    print("✅ Aucun paquet scientifique importé au démarrage")
+
+
+if __name__ == '__main__':
+    main()
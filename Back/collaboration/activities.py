@@ -0,0 +1,36 @@
+from dashboard.feed import ActivitySource, register
+
+from .models import EventAttendance, ForumPost
+
+
+@register
+class ForumPostActivity(ActivitySource):
+    name = 'forum_post'
+    select_related = ('topic',)
+    icon = '💬'
+
+    def queryset(self, user):
+        return ForumPost.objects.filter(author=user)
+
+    def serialize(self, post):
+        return {
+            'title': f'Message: {post.topic.title}',
+            'description': post.content[:100],
+        }
+
+
+@register
+class EventActivity(ActivitySource):
+    name = 'event'
+    date_field = 'registered_at'
+    select_related = ('event',)
+    icon = '🎉'
+
+    def queryset(self, user):
+        return EventAttendance.objects.filter(attendee=user)
+
+    def serialize(self, attendance):
+        return {
+            'title': f'Événement: {attendance.event.title}',
+            'description': f'{attendance.event.location} - {attendance.get_status_display()}',
+        }
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Each app registers its activity feed sources in activities.py
+        # and its reminder sources in reminders.py
+        autodiscover_modules('activities', 'reminders')
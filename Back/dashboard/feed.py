@@ -0,0 +1,124 @@
+"""
+Merged activity feed.
+
+Apps describe their activities with an ``ActivitySource`` registered from
+their ``activities.py`` module (discovered when the dashboard app loads).
+A page of the feed is built in two steps:
+
+1. every source returns the ``(date, id)`` keys of its newest rows after the
+   cursor, already ordered by the database, and ``heapq.merge`` lazily
+   interleaves them;
+2. only the rows that made it into the page are loaded, with their related
+   objects, one query per source.
+
+Pages are addressed by an opaque cursor encoding the last ``(date, type, id)``
+returned, so deep pages cost the same as the first one.
+"""
+
+import base64
+import heapq
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+
+
+_sources = {}
+
+
+class ActivitySource:
+    """A kind of activity shown in the feed
+
+    Subclasses set ``name`` (the activity type), implement ``queryset`` and
+    ``serialize``, and are registered with ``@register``.
+    """
+    name = None
+    date_field = 'created_at'
+    select_related = ()
+    icon = '📌'
+
+    def queryset(self, user):
+        """Rows of this source visible in the user's feed"""
+        raise NotImplementedError
+
+    def serialize(self, obj):
+        """Activity dict with 'title' and 'description' for one row"""
+        raise NotImplementedError
+
+    def keys(self, user, cursor, limit):
+        """Newest (date, name, pk) keys after the cursor, newest first"""
+        queryset = self.queryset(user)
+        if cursor is not None:
+            date, name, pk = cursor
+            older = Q(**{f'{self.date_field}__lt': date})
+            if self.name < name:
+                older |= Q(**{self.date_field: date})
+            elif self.name == name:
+                older |= Q(**{self.date_field: date, 'pk__lt': pk})
+            queryset = queryset.filter(older)
+        rows = queryset.order_by(f'-{self.date_field}', '-pk').values_list(self.date_field, 'pk')[:limit]
+        return ((date, self.name, pk) for date, pk in rows)
+
+    def load(self, user, pks):
+        """Rows by primary key, with their related objects"""
+        return self.queryset(user).select_related(*self.select_related).in_bulk(pks)
+
+
+def register(source_class):
+    """Class decorator adding an activity source to the feed"""
+    _sources[source_class.name] = source_class()
+    return source_class
+
+
+def encode_cursor(key):
+    date, name, pk = key
+    payload = json.dumps([date.isoformat(), name, pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """Parse a cursor, raising ValueError when it is malformed"""
+    try:
+        date, name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date), str(name), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Curseur invalide') from exc
+
+
+def activity_feed(user, limit=10, cursor=None, types=None):
+    """One page of the user's activities, newest first
+
+    Returns ``(activities, next_cursor)``; ``next_cursor`` is None on the
+    last page.
+    """
+    key = decode_cursor(cursor) if cursor else None
+    sources = [source for name, source in _sources.items() if types is None or name in types]
+
+    streams = [source.keys(user, key, limit + 1) for source in sources]
+    page = list(islice(heapq.merge(*streams, reverse=True), limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    loaded = {}
+    for source in sources:
+        pks = [pk for _, name, pk in page if name == source.name]
+        if pks:
+            loaded[source.name] = source.load(user, pks)
+
+    activities = []
+    for date, name, pk in page:
+        obj = loaded[name].get(pk)
+        if obj is None:
+            continue
+        source = _sources[name]
+        activities.append({
+            'id': f'{name}:{pk}',
+            'type': name,
+            **source.serialize(obj),
+            'date': date.isoformat(),
+            'icon': source.icon,
+        })
+
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+    return activities, next_cursor
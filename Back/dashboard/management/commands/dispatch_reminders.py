@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.reminders import BATCH_SIZE, run
+
+
+class Command(BaseCommand):
+    help = 'Deliver due reminders (schedules, documents, transport) through the configured channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Reminders claimed per transaction')
+        parser.add_argument('--poll-interval', type=float, default=30.0, help='Seconds between two passes')
+        parser.add_argument('--channels', help='Comma separated channels (default: settings.REMINDER_CHANNELS)')
+        parser.add_argument('--once', action='store_true', help='Deliver what is due now and exit')
+
+    def handle(self, *args, **options):
+        channel_names = options['channels'].split(',') if options['channels'] else None
+        try:
+            delivered = run(
+                batch_size=options['batch_size'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+                channel_names=channel_names,
+            )
+        except ImportError as exc:
+            raise CommandError(f'Canal inconnu: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'{delivered} rappels envoyés'))
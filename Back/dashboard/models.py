@@ -1,3 +1,21 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class OutboxMessage(models.Model):
+    """Reminder delivered by the outbox channel of dashboard.reminders"""
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='outbox_messages')
+    source = models.CharField(max_length=50)  # ReminderSource name
+    source_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='outbox_unique_source_row'),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} pour {self.student_id}"
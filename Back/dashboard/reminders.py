@@ -0,0 +1,183 @@
+"""
+Reminder dispatch.
+
+Apps describe their due items with a ``ReminderSource`` registered from their
+``reminders.py`` module (discovered when the dashboard app loads). A dispatch
+pass, for every source:
+
+1. claims the oldest due rows through the partial ``(remind_at) WHERE NOT
+   is_sent`` index, in batches, with ``select_for_update(skip_locked=True)``
+   where the database supports it so concurrent dispatchers split the work;
+2. hands the batch to every configured channel;
+3. marks the whole batch sent with one UPDATE, in the same transaction.
+
+Channels are listed in ``settings.REMINDER_CHANNELS`` by registered name or
+dotted path. The ``outbox`` channel writes ``OutboxMessage`` rows in the
+dispatch transaction (unique per source row, so a retried batch adds nothing);
+``log`` writes one log line per reminder. Without row locks (SQLite) two
+concurrent dispatchers may both deliver a batch; the outbox still holds it once.
+
+``python manage.py dispatch_reminders`` drives the dispatch.
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'REMINDER_BATCH_SIZE', 500)
+CHANNELS = getattr(settings, 'REMINDER_CHANNELS', ['outbox', 'log'])
+
+# source: ReminderSource.name; pk: row of the source; due: its due time
+Delivery = namedtuple('Delivery', 'source pk student_id title message due')
+
+_sources = {}
+_channels = {}
+
+
+class ReminderSource:
+    """A model holding due reminders
+
+    Subclasses set ``name`` and ``model`` and are registered with
+    ``@register``; ``due_field`` and ``sent_field`` name the due time and the
+    sent flag, ``fields`` the columns read to build a delivery.
+    """
+    name = None
+    model = None
+    due_field = 'remind_at'
+    sent_field = 'is_sent'
+    fields = ('student_id', 'title', 'message')
+
+    def due(self, now):
+        return self.model.objects.filter(**{self.sent_field: False, f'{self.due_field}__lte': now})
+
+    def deliveries(self, rows):
+        """Deliveries of (pk, due, *fields) rows"""
+        return [
+            Delivery(self.name, pk, student_id, title, message, due)
+            for pk, due, student_id, title, message in rows
+        ]
+
+    def claim(self, now, limit):
+        """Lock up to ``limit`` due rows (oldest first) for the current transaction"""
+        due = self.due(now).order_by(self.due_field, 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        return self.deliveries(due.values_list('pk', self.due_field, *self.fields)[:limit])
+
+    def mark_sent(self, pks):
+        return self.model.objects.filter(pk__in=pks).update(**{self.sent_field: True})
+
+
+def register(source_class):
+    """Class decorator adding a reminder source to the dispatcher"""
+    _sources[source_class.name] = source_class()
+    return source_class
+
+
+class Channel:
+    """A way of delivering reminders; ``deliver`` receives a batch of Delivery tuples"""
+    name = None
+
+    def deliver(self, deliveries):
+        raise NotImplementedError
+
+
+def register_channel(channel_class):
+    """Class decorator making a channel available by name in REMINDER_CHANNELS"""
+    _channels[channel_class.name] = channel_class
+    return channel_class
+
+
+@register_channel
+class OutboxChannel(Channel):
+    """Stores reminders in the outbox table, for the app or an external sender to pick up"""
+    name = 'outbox'
+
+    def deliver(self, deliveries):
+        from .models import OutboxMessage
+
+        OutboxMessage.objects.bulk_create(
+            [
+                OutboxMessage(
+                    student_id=delivery.student_id,
+                    source=delivery.source,
+                    source_id=delivery.pk,
+                    title=delivery.title,
+                    message=delivery.message,
+                )
+                for delivery in deliveries
+            ],
+            ignore_conflicts=True,
+        )
+
+
+@register_channel
+class LoggingChannel(Channel):
+    name = 'log'
+
+    def deliver(self, deliveries):
+        for delivery in deliveries:
+            logger.info('Reminder %s:%s to %s: %s', delivery.source, delivery.pk, delivery.student_id, delivery.title)
+
+
+def channels(names=None):
+    """Channel instances of ``names`` (default: settings.REMINDER_CHANNELS)"""
+    return [
+        (_channels[name] if name in _channels else import_string(name))()
+        for name in (names if names is not None else CHANNELS)
+    ]
+
+
+def dispatch_batch(source, channel_list, now=None, limit=BATCH_SIZE):
+    """Deliver one batch of a source's due reminders; returns the number delivered"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        deliveries = source.claim(now, limit)
+        if not deliveries:
+            return 0
+        for channel in channel_list:
+            channel.deliver(deliveries)
+        source.mark_sent([delivery.pk for delivery in deliveries])
+    return len(deliveries)
+
+
+def dispatch_due(now=None, batch_size=BATCH_SIZE, channel_names=None):
+    """Deliver every due reminder of every source; returns {source name: count}"""
+    now = now or timezone.now()
+    channel_list = channels(channel_names)
+    report = {}
+    for name, source in _sources.items():
+        report[name] = 0
+        while sent := dispatch_batch(source, channel_list, now, batch_size):
+            report[name] += sent
+            if sent < batch_size:
+                break
+    return report
+
+
+def run(batch_size=BATCH_SIZE, poll_interval=30.0, once=False, channel_names=None):
+    """Dispatch due reminders until interrupted (or one pass with ``once``)"""
+    delivered = 0
+    while True:
+        try:
+            report = dispatch_due(batch_size=batch_size, channel_names=channel_names)
+        except Exception:
+            if once:
+                raise
+            # A failed batch stays unsent and is retried on the next pass
+            logger.exception('Reminder dispatch failed')
+            report = {}
+        delivered += sum(report.values())
+        if any(report.values()):
+            logger.info('Reminders delivered: %s', report)
+        if once:
+            return delivered
+        time.sleep(poll_interval)
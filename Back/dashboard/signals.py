@@ -0,0 +1,59 @@
+"""
+Invalidation of the cached dashboard statistics.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from budget.models import Budget, Expense
+from budget.signals import expenses_bulk_created
+from matching.models import GroupMembership, StudyGroup
+from schedules.models import Assignment, Course
+
+from .stats import invalidate_dashboard_stats
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def expense_changed(sender, instance, **kwargs):
+    student_ids = Budget.objects.filter(pk=instance.budget_id).values_list('student_id', flat=True)
+    invalidate_dashboard_stats(student_ids)
+
+
+@receiver(expenses_bulk_created)
+def expenses_bulk_written(sender, student_ids, **kwargs):
+    invalidate_dashboard_stats(student_ids)
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def student_row_changed(sender, instance, **kwargs):
+    invalidate_dashboard_stats([instance.student_id])
+
+
+@receiver(post_save, sender=StudyGroup)
+def study_group_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_dashboard_stats(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def assignment_changed(sender, instance, **kwargs):
+    invalidate_dashboard_stats(
+        Course.students.through.objects.filter(course_id=instance.course_id).values_list('student_id', flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        invalidate_dashboard_stats([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_dashboard_stats(instance.students.values_list('pk', flat=True))
+    else:
+        invalidate_dashboard_stats(pk_set)
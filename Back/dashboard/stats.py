@@ -0,0 +1,137 @@
+"""
+Dashboard statistics computed in a single query and cached per user.
+
+Every figure is a correlated subquery on the user's row, so the database does
+the aggregation. Results are cached in ``settings.DASHBOARD_CACHE_ALIAS`` and
+dropped by the signals in ``dashboard.signals`` whenever an underlying row
+changes.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import Student
+from budget.models import Budget, Expense
+from matching.models import GroupMembership
+from schedules.models import Assignment, Course
+
+
+CACHE_ALIAS = getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _cache_key(student_id):
+    return f'dashboard:stats:{student_id}'
+
+
+def _aggregate(queryset, group_field, aggregate, output_field):
+    """Correlated single-value aggregate subquery grouped on the outer student"""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(value=aggregate).values('value')[:1],
+            output_field=output_field,
+        ),
+        0,
+        output_field=output_field,
+    )
+
+
+def compute_dashboard_stats(user, today=None):
+    """Compute the dashboard figures of a user with one database query"""
+    today = today or timezone.localdate()
+    current_month = today.replace(day=1)
+    week_ago = today - timedelta(days=7)
+    start_of_today = timezone.make_aware(datetime.combine(today, time.min))
+    money = DecimalField(max_digits=12, decimal_places=2)
+    integer = IntegerField()
+
+    row = Student.objects.filter(pk=user.pk).annotate(
+        total_budget=Coalesce(
+            Subquery(
+                Budget.objects.filter(student=OuterRef('pk'), month=current_month).values('total_budget')[:1],
+                output_field=money,
+            ),
+            0,
+            output_field=money,
+        ),
+        budget_id=Subquery(
+            Budget.objects.filter(student=OuterRef('pk'), month=current_month).values('pk')[:1]
+        ),
+        total_expenses=Coalesce(
+            Subquery(
+                Budget.objects.filter(student=OuterRef('pk'), month=current_month).values('spent_total')[:1],
+                output_field=money,
+            ),
+            0,
+            output_field=money,
+        ),
+        recent_expenses=_aggregate(
+            Expense.objects.filter(budget__student=OuterRef('pk'), date__gte=week_ago),
+            'budget__student', Sum('amount'), money,
+        ),
+        active_study_groups=_aggregate(
+            GroupMembership.objects.filter(student=OuterRef('pk'), group__status='ACTIVE'),
+            'student', Count('pk'), integer,
+        ),
+        pending_assignments=_aggregate(
+            Assignment.objects.filter(
+                course__students=OuterRef('pk'), due_date__gte=start_of_today, is_completed=False
+            ),
+            'course__students', Count('pk'), integer,
+        ),
+        enrolled_courses=_aggregate(
+            Course.students.through.objects.filter(student=OuterRef('pk')),
+            'student', Count('pk'), integer,
+        ),
+    ).values(
+        'total_budget', 'budget_id', 'total_expenses', 'recent_expenses',
+        'active_study_groups', 'pending_assignments', 'enrolled_courses',
+    ).get()
+
+    if row['budget_id'] is None:
+        total_budget = total_expenses = remaining_budget = 0
+    else:
+        total_budget = float(row['total_budget'])
+        total_expenses = float(row['total_expenses'])
+        remaining_budget = total_budget - total_expenses
+
+    return {
+        'budget': {
+            'total_budget': total_budget,
+            'total_expenses': total_expenses,
+            'remaining_budget': remaining_budget,
+            'recent_expenses': float(row['recent_expenses']),
+        },
+        'academic': {
+            'active_study_groups': row['active_study_groups'],
+            'pending_assignments': row['pending_assignments'],
+            'enrolled_courses': row['enrolled_courses'],
+        },
+        'social': {
+            'forum_posts': 0,  # À implémenter si nécessaire
+            'events_attending': 0,  # À implémenter si nécessaire
+        },
+    }
+
+
+def get_dashboard_stats(user):
+    """Cached dashboard figures of a user, recomputed when invalidated or on a new day"""
+    cache = caches[CACHE_ALIAS]
+    today = timezone.localdate()
+    cached = cache.get(_cache_key(user.pk))
+    if cached is not None and cached['date'] == today.isoformat():
+        return cached['stats']
+
+    stats = compute_dashboard_stats(user, today)
+    cache.set(_cache_key(user.pk), {'date': today.isoformat(), 'stats': stats}, CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats(student_ids):
+    """Drop the cached dashboard figures of the given students"""
+    caches[CACHE_ALIAS].delete_many([_cache_key(student_id) for student_id in set(student_ids)])
@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path('stats/', views.dashboard_stats, name='dashboard_stats'),
     path('stats/activities/', views.recent_activities, name='recent_activities'),
+    path('feed/', views.activity_feed_page, name='activity_feed'),
     path('stats/upcoming/', views.upcoming_items, name='upcoming_items'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
 ]
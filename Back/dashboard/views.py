@@ -1,112 +1,45 @@
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Sum
 from datetime import datetime, timedelta
-from accounts.models import Student
-from budget.models import Budget, Expense
-from schedules.models import Course, Assignment
-from matching.models import StudyGroup
+from budget.models import BudgetAlert
+from schedules.models import Assignment
+from .feed import activity_feed
+from .stats import get_dashboard_stats
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Get dashboard statistics for the current user"""
-    user = request.user
-    
-    # Budget stats
-    current_month = datetime.now().replace(day=1).date()
-    try:
-        current_budget = Budget.objects.get(student=user, month=current_month)
-        total_budget = float(current_budget.total_budget)
-        total_expenses = float(current_budget.total_expenses)
-        remaining_budget = total_budget - total_expenses
-    except Budget.DoesNotExist:
-        total_budget = 0
-        total_expenses = 0
-        remaining_budget = 0
-    
-    # Study groups stats
-    active_groups = StudyGroup.objects.filter(
-        members=user,
-        status='ACTIVE'
-    ).count()
-    
-    # Assignments stats
-    pending_assignments = Assignment.objects.filter(
-        course__students=user,
-        due_date__gte=datetime.now().date(),
-        is_completed=False
-    ).count() if hasattr(Assignment, 'is_completed') else 0
-    
-    # Recent expenses (last 7 days)
-    week_ago = datetime.now().date() - timedelta(days=7)
-    recent_expenses = Expense.objects.filter(
-        budget__student=user,
-        date__gte=week_ago
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    return Response({
-        'budget': {
-            'total_budget': total_budget,
-            'total_expenses': total_expenses,
-            'remaining_budget': remaining_budget,
-            'recent_expenses': float(recent_expenses)
-        },
-        'academic': {
-            'active_study_groups': active_groups,
-            'pending_assignments': pending_assignments,
-            'enrolled_courses': user.courses.count() if hasattr(user, 'courses') else 0
-        },
-        'social': {
-            'forum_posts': 0,  # À implémenter si nécessaire
-            'events_attending': 0  # À implémenter si nécessaire
-        }
-    })
+    return Response(get_dashboard_stats(request.user))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def recent_activities(request):
     """Get recent activities for the user"""
-    user = request.user
-    limit = int(request.GET.get('limit', 5))
-    
-    activities = []
-    
-    # Recent expenses
-    recent_expenses = Expense.objects.filter(
-        budget__student=user
-    ).order_by('-created_at')[:limit]
-    
-    for expense in recent_expenses:
-        activities.append({
-            'type': 'expense',
-            'title': f'Dépense: {expense.description}',
-            'description': f'{expense.amount}€ - {expense.category.name}',
-            'date': expense.created_at.isoformat(),
-            'icon': '💳'
-        })
-    
-    # Recent study group activities
-    recent_groups = StudyGroup.objects.filter(
-        members=user
-    ).order_by('-created_at')[:limit]
-    
-    for group in recent_groups:
-        activities.append({
-            'type': 'study_group',
-            'title': f'Groupe d\'étude: {group.name}',
-            'description': f'{group.course.name}',
-            'date': group.created_at.isoformat(),
-            'icon': '📚'
-        })
-    
-    # Sort by date and limit
-    activities.sort(key=lambda x: x['date'], reverse=True)
-    
-    return Response(activities[:limit])
+    limit = min(int(request.GET.get('limit', 5)), 50)
+    activities, _ = activity_feed(request.user, limit)
+    return Response(activities)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def activity_feed_page(request):
+    """Get one page of the user's activity feed (cursor-based pagination)"""
+    limit = min(int(request.GET.get('limit', 20)), 100)
+    types = request.GET.get('types')
+    try:
+        activities, next_cursor = activity_feed(
+            request.user, limit,
+            cursor=request.GET.get('cursor'),
+            types=types.split(',') if types else None,
+        )
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': activities, 'next_cursor': next_cursor})
 
 
 @api_view(['GET'])
@@ -163,44 +96,47 @@ def upcoming_items(request):
     return Response(upcoming[:limit])
 
 
+ALERT_LEVELS = {
+    'OVERSPEND': 'warning',
+    'LOW_FUNDS': 'warning',
+    'GOAL_REMINDER': 'info',
+    'RECURRING_DUE': 'info',
+}
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notifications(request):
-    """Get user notifications"""
-    user = request.user
-    
-    notifications = [
+    """Get user notifications (budget alerts raised by budget.alerts)"""
+    limit = min(int(request.GET.get('limit', 20)), 100)
+    alerts = BudgetAlert.objects.filter(student=request.user)
+    if request.GET.get('unread') == 'true':
+        alerts = alerts.filter(is_read=False)
+
+    return Response([
         {
-            'id': 1,
-            'type': 'info',
-            'title': 'Bienvenue sur SmartCampus!',
-            'message': 'Complétez votre profil pour une meilleure expérience',
-            'is_read': False,
-            'created_at': datetime.now().isoformat()
+            'id': alert.id,
+            'type': ALERT_LEVELS.get(alert.alert_type, 'info'),
+            'alert_type': alert.alert_type,
+            'title': alert.title,
+            'message': alert.message,
+            'is_read': alert.is_read,
+            'created_at': alert.created_at.isoformat(),
         }
-    ]
-    
-    # Check budget alerts
-    try:
-        current_month = datetime.now().replace(day=1).date()
-        current_budget = Budget.objects.get(student=user, month=current_month)
-        if current_budget.remaining_budget < 0:
-            notifications.append({
-                'id': 2,
-                'type': 'warning',
-                'title': 'Budget dépassé',
-                'message': f'Vous avez dépassé votre budget de {abs(current_budget.remaining_budget)}€',
-                'is_read': False,
-                'created_at': datetime.now().isoformat()
-            })
-    except Budget.DoesNotExist:
-        notifications.append({
-            'id': 3,
-            'type': 'info',
-            'title': 'Configurez votre budget',
-            'message': 'Créez votre premier budget mensuel',
-            'is_read': False,
-            'created_at': datetime.now().isoformat()
-        })
-    
-    return Response(notifications)
+        for alert in alerts[:limit]
+    ])
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """Mark the given notifications (or all of them without ids) as read"""
+    alerts = BudgetAlert.objects.filter(student=request.user, is_read=False)
+    ids = request.data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or any(isinstance(pk, bool) or not isinstance(pk, int) for pk in ids):
+            return Response(
+                {'error': "ids doit être une liste d'identifiants entiers"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        alerts = alerts.filter(pk__in=ids)
+    return Response({'updated': alerts.update(is_read=True)})
@@ -0,0 +1,20 @@
+from dashboard.feed import ActivitySource, register
+
+from .models import Document
+
+
+@register
+class DocumentActivity(ActivitySource):
+    name = 'document'
+    select_related = ('category',)
+    icon = '📄'
+
+    def queryset(self, user):
+        return Document.objects.filter(student=user)
+
+    def serialize(self, document):
+        category = document.category.name if document.category else document.get_document_type_display()
+        return {
+            'title': f'Document: {document.title}',
+            'description': category,
+        }
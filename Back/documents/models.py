@@ -216,6 +216,10 @@ class DocumentReminder(models.Model):
     
     class Meta:
         ordering = ['remind_at']
+        indexes = [
+            # Due reminders polled by dashboard.reminders
+            models.Index(fields=['remind_at'], condition=models.Q(is_sent=False), name='document_reminder_due_idx'),
+        ]
 
 
 class DocumentComment(models.Model):
@@ -0,0 +1,9 @@
+from dashboard.reminders import ReminderSource, register
+
+from .models import DocumentReminder
+
+
+@register
+class DocumentReminderSource(ReminderSource):
+    name = 'document_reminder'
+    model = DocumentReminder
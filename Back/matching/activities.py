@@ -0,0 +1,19 @@
+from dashboard.feed import ActivitySource, register
+
+from .models import StudyGroup
+
+
+@register
+class StudyGroupActivity(ActivitySource):
+    name = 'study_group'
+    select_related = ('course',)
+    icon = '📚'
+
+    def queryset(self, user):
+        return StudyGroup.objects.filter(members=user)
+
+    def serialize(self, group):
+        return {
+            'title': f'Groupe d\'étude: {group.name}',
+            'description': group.course.name,
+        }
@@ -0,0 +1,106 @@
+"""
+Materialization of pre-calculated scores into ``StudentCompatibility``.
+
+Each pair is stored once per course with ``student1_id < student2_id``.
+Students whose matching features changed are queued in
+``CompatibilityChange`` by the signals in ``matching.signals``; refreshing
+recomputes only their row of the score matrix for each course they follow.
+"""
+
+import numpy as np
+from django.utils import timezone
+
+from schedules.models import Course
+
+from .engine import CohortFeatures, compatibility_matrix
+from .models import CompatibilityChange, StudentCompatibility
+
+
+BATCH_SIZE = 1000
+ROW_CHUNK_SIZE = 256
+
+# Factor name in the engine -> column on StudentCompatibility
+FACTOR_FIELDS = {
+    'schedule': 'schedule_compatibility',
+    'academic': 'academic_compatibility',
+    'personality': 'personality_compatibility',
+    'communication': 'preference_compatibility',
+}
+
+
+def cohort_features(course):
+    """Feature arrays for every student enrolled in a course"""
+    return CohortFeatures(course.students.order_by('pk'))
+
+
+def _store_rows(course, features, rows):
+    """Compute the score rows of the given students and upsert every pair"""
+    rows = np.asarray(rows, dtype=np.int64)
+    ids = [student.pk for student in features.students]
+    done = set()
+    written = 0
+
+    for start in range(0, len(rows), ROW_CHUNK_SIZE):
+        chunk = rows[start:start + ROW_CHUNK_SIZE]
+        total, scores = compatibility_matrix(features, chunk)
+        objects = []
+        for k, i in enumerate(chunk.tolist()):
+            for j in range(len(ids)):
+                # A pair whose both sides are refreshed is written only once
+                if j == i or j in done:
+                    continue
+                student1_id, student2_id = (ids[i], ids[j]) if ids[i] < ids[j] else (ids[j], ids[i])
+                fields = {field: float(scores[factor][k, j]) for factor, field in FACTOR_FIELDS.items()}
+                objects.append(StudentCompatibility(
+                    student1_id=student1_id,
+                    student2_id=student2_id,
+                    course=course,
+                    compatibility_score=float(total[k, j]),
+                    **fields,
+                ))
+            done.add(i)
+        StudentCompatibility.objects.bulk_create(
+            objects,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['student1', 'student2', 'course'],
+            update_fields=['compatibility_score', 'calculated_at', *FACTOR_FIELDS.values()],
+        )
+        written += len(objects)
+    return written
+
+
+def rebuild_course(course):
+    """Recompute every pair of a course (needed after a weight change)"""
+    features = cohort_features(course)
+    StudentCompatibility.objects.filter(course=course).exclude(
+        student1__in=features.index.keys(), student2__in=features.index.keys()
+    ).delete()
+    return _store_rows(course, features, range(len(features)))
+
+
+def refresh_course(course, student_ids):
+    """Recompute the rows of the given students within one course"""
+    features = cohort_features(course)
+    rows = sorted(features.index[pk] for pk in student_ids if pk in features.index)
+    if not rows:
+        return 0
+    return _store_rows(course, features, rows)
+
+
+def refresh_changed():
+    """Recompute the scores of every queued student, course by course"""
+    started = timezone.now()
+    changed = list(CompatibilityChange.objects.values_list('student_id', flat=True))
+    if not changed:
+        return 0
+
+    written = 0
+    courses = Course.objects.filter(students__in=changed).distinct()
+    for course in courses:
+        enrolled = course.students.filter(pk__in=changed).values_list('pk', flat=True)
+        written += refresh_course(course, set(enrolled))
+
+    CompatibilityChange.objects.filter(student_id__in=changed, changed_at__lte=started).delete()
+    return written
+
@@ -0,0 +1,284 @@
+"""
+Vectorized compatibility engine for study partner matching.
+
+Computes the same scores as the scalar ``MatchingAlgorithm`` helpers, but for
+a whole cohort at once: features are loaded in a single pass and every pair
+is scored with NumPy array operations.
+"""
+
+import time
+
+import numpy as np
+from django.db.models import QuerySet
+
+from accounts.availability import availability_mask, has_availability
+
+
+SCORE_WEIGHTS = {
+    'schedule': 0.4,
+    'academic': 0.3,
+    'personality': 0.2,
+    'communication': 0.1,
+}
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """Element-wise number of set bits of a uint32 array"""
+    values = np.ascontiguousarray(values, dtype=np.uint32)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (4,)).sum(axis=-1)
+
+
+def availability_masks(students):
+    """Stack the weekly availability masks of students into an (n, 7) uint32 array"""
+    masks = [availability_mask(student) for student in students]
+    return np.array(masks, dtype=np.uint32).reshape(len(masks), 7)
+
+
+def _encode(values):
+    """Map arbitrary hashable values to integer codes (equal values share a code)"""
+    codes = {}
+    return np.array([codes.setdefault(value, len(codes)) for value in values], dtype=np.int64)
+
+
+class CohortFeatures:
+    """Columnar feature arrays for a list of students"""
+
+    def __init__(self, students):
+        if isinstance(students, QuerySet):
+            students = students.select_related('profile')
+        self.students = list(students)
+        self.index = {student.pk: i for i, student in enumerate(self.students)}
+
+        levels, filieres, gpas, comms, has_profile = [], [], [], [], []
+        has_prefs, styles, sizes = [], [], []
+
+        for student in self.students:
+            levels.append(student.level)
+            filieres.append(student.filiere)
+
+            try:
+                profile = student.profile
+            except Exception:
+                profile = None
+            has_profile.append(profile is not None)
+            gpas.append((getattr(profile, 'gpa', 0) or 0) if profile is not None else 0)
+            comms.append(getattr(profile, 'communication_preference', 'whatsapp') if profile is not None else None)
+
+            prefs = student.study_preferences or {}
+            has_prefs.append(bool(prefs))
+            styles.append(prefs.get('study_style') or None)
+            sizes.append(prefs.get('preferred_group_size', 4))
+
+        self.level = _encode(levels)
+        self.filiere = _encode(filieres)
+        self.gpa = np.array(gpas, dtype=np.float64)
+        self.has_profile = np.array(has_profile, dtype=bool)
+        self.communication = _encode(comms)
+        self.has_prefs = np.array(has_prefs, dtype=bool)
+        self.has_style = np.array([style is not None for style in styles], dtype=bool)
+        self.style = _encode(styles)
+        self.group_size = np.array(sizes, dtype=np.float64)
+        self.availability = availability_masks(self.students)
+        self.has_availability = np.array([has_availability(student) for student in self.students], dtype=bool)
+
+    def __len__(self):
+        return len(self.students)
+
+
+def schedule_scores(mask, masks, known=True):
+    """Mean per-day Jaccard overlap of weekly masks
+
+    ``mask`` and ``masks`` broadcast against each other with the 7 days on the
+    last axis, e.g. one student (7,) against a whole course (n, 7). Scores are
+    0.0 where no day is shared and 0.5 (neutral) where ``known`` (broadcast
+    without the day axis) is False, i.e. either student has no availability data.
+    """
+    mask = np.asarray(mask, dtype=np.uint32)
+    masks = np.asarray(masks, dtype=np.uint32)
+
+    both = (mask != 0) & (masks != 0)
+    overlap = popcount(mask & masks).astype(np.float64)
+    union = popcount(mask | masks)
+    ratios = np.where(both, overlap / np.maximum(union, 1), 0.0)
+
+    # Sum day by day to keep the same rounding as the scalar implementation
+    overlap_score = np.zeros(ratios.shape[:-1], dtype=np.float64)
+    for day in range(ratios.shape[-1]):
+        overlap_score += ratios[..., day]
+    scores = overlap_score / np.maximum(both.sum(axis=-1), 1)
+    return np.where(known, scores, 0.5)
+
+
+def _pairs(values, rows):
+    """Broadcast ``values`` of the selected rows against every student"""
+    left = values if rows is None else values[rows]
+    return left[:, None], values[None, :]
+
+
+def schedule_matrix(features, rows=None, chunk_size=256):
+    """Pairwise mean per-day Jaccard overlap of availability masks"""
+    masks = features.availability
+    left = masks if rows is None else masks[rows]
+    known1, known2 = _pairs(features.has_availability, rows)
+    chunks = [
+        schedule_scores(
+            left[start:start + chunk_size, None, :], masks[None, :, :],
+            known1[start:start + chunk_size] & known2,
+        )
+        for start in range(0, len(left), chunk_size)
+    ]
+    return np.concatenate(chunks) if chunks else np.zeros((0, len(masks)))
+
+
+def academic_matrix(features, rows=None):
+    """Pairwise level, filiere and GPA compatibility"""
+    level1, level2 = _pairs(features.level, rows)
+    level_score = np.where(level1 == level2, 1.0, 0.7)
+    filiere1, filiere2 = _pairs(features.filiere, rows)
+    filiere_score = np.where(filiere1 == filiere2, 1.0, 0.8)
+
+    gpa1, gpa2 = _pairs(features.gpa, rows)
+    both_gpa = (gpa1 > 0) & (gpa2 > 0)
+    gpa_score = np.where(both_gpa, np.maximum(0, 1 - np.abs(gpa1 - gpa2) / 4.0), 1.0)
+
+    return level_score * 0.4 + filiere_score * 0.3 + gpa_score * 0.3
+
+
+def personality_matrix(features, rows=None):
+    """Pairwise study style and group size preference compatibility"""
+    has_style1, has_style2 = _pairs(features.has_style, rows)
+    style1, style2 = _pairs(features.style, rows)
+    style_score = np.where(style1 == style2, 1.0, 0.5)
+
+    size1, size2 = _pairs(features.group_size, rows)
+    size_score = np.maximum(0, 1 - np.abs(size1 - size2) / 4)
+
+    scores = np.where(has_style1 & has_style2, (style_score + size_score) / 2, size_score)
+    has_prefs1, has_prefs2 = _pairs(features.has_prefs, rows)
+    return np.where(has_prefs1 & has_prefs2, scores, 0.7)
+
+
+def communication_matrix(features, rows=None):
+    """Pairwise communication channel compatibility"""
+    comm1, comm2 = _pairs(features.communication, rows)
+    scores = np.where(comm1 == comm2, 1.0, 0.7)
+    has_profile1, has_profile2 = _pairs(features.has_profile, rows)
+    return np.where(has_profile1 & has_profile2, scores, 0.8)
+
+
+def compatibility_matrix(features, rows=None):
+    """Weighted total and per-factor score matrices for a cohort
+
+    With ``rows`` (an index array) only those students are scored against the
+    whole cohort, giving (len(rows), n) matrices instead of (n, n).
+    """
+    scores = {
+        'schedule': schedule_matrix(features, rows),
+        'academic': academic_matrix(features, rows),
+        'personality': personality_matrix(features, rows),
+        'communication': communication_matrix(features, rows),
+    }
+    total = (
+        scores['schedule'] * SCORE_WEIGHTS['schedule'] +
+        scores['academic'] * SCORE_WEIGHTS['academic'] +
+        scores['personality'] * SCORE_WEIGHTS['personality'] +
+        scores['communication'] * SCORE_WEIGHTS['communication']
+    )
+    return total, scores
+
+
+def group_sizes(n, group_size, max_members):
+    """Sizes of balanced groups for n students
+
+    Uses n // group_size groups so every group has at least ``group_size``
+    members, spreading the remainder one by one; falls back to more, smaller
+    groups when that would exceed ``max_members``.
+    """
+    if n == 0:
+        return []
+    n_groups = max(1, n // group_size)
+    if -(-n // n_groups) > max_members:
+        n_groups = -(-n // max_members)
+    base, extra = divmod(n, n_groups)
+    return [base + 1] * extra + [base] * (n_groups - extra)
+
+
+def balanced_groups(scores, group_size=4, max_members=6, seed=42, time_budget=2.0):
+    """Partition a cohort into capacity-constrained groups of compatible students
+
+    ``scores`` is the (n, n) compatibility matrix. A greedy pass seeds each
+    group and fills it with the student adding the most compatibility, then
+    pairwise swaps between groups are applied while they raise the total
+    within-group compatibility, until no swap helps or ``time_budget``
+    seconds have elapsed. Returns a list of index arrays, one per group.
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    weights = np.array(scores, dtype=np.float64)
+    np.fill_diagonal(weights, 0.0)
+    n = len(weights)
+    sizes = group_sizes(n, group_size, max(max_members, group_size))
+    n_groups = len(sizes)
+    if n_groups == 0:
+        return []
+
+    # Greedy seed: random first member, then the most compatible remaining
+    # student for each open seat, filling groups round-robin
+    assignment = np.full(n, -1, dtype=np.int64)
+    group_sums = np.zeros((n, n_groups), dtype=np.float64)
+    order = rng.permutation(n)
+    for g, student in enumerate(order[:n_groups]):
+        assignment[student] = g
+        group_sums[:, g] += weights[:, student]
+    counts = np.ones(n_groups, dtype=np.int64)
+
+    while (assignment < 0).any():
+        for g in range(n_groups):
+            if counts[g] >= sizes[g]:
+                continue
+            unassigned = np.flatnonzero(assignment < 0)
+            student = unassigned[np.argmax(group_sums[unassigned, g])]
+            assignment[student] = g
+            group_sums[:, g] += weights[:, student]
+            counts[g] += 1
+
+    # Local search: best improving swap for each student in turn
+    students = np.arange(n)
+    improved = n_groups > 1
+    while improved and time.perf_counter() - started < time_budget:
+        improved = False
+        for a in rng.permutation(n):
+            ga = assignment[a]
+            # Gain of swapping a with every student b, given b's current group
+            delta = (
+                group_sums[a, assignment] - weights[a] +
+                group_sums[students, ga] - weights[a] -
+                group_sums[a, ga] -
+                group_sums[students, assignment]
+            )
+            delta[assignment == ga] = 0.0
+            b = int(np.argmax(delta))
+            if delta[b] > 1e-12:
+                gb = assignment[b]
+                assignment[a], assignment[b] = gb, ga
+                group_sums[:, ga] += weights[:, b] - weights[:, a]
+                group_sums[:, gb] += weights[:, a] - weights[:, b]
+                improved = True
+            if time.perf_counter() - started >= time_budget:
+                break
+
+    return [np.flatnonzero(assignment == g) for g in range(n_groups)]
+
+
+def mean_compatibility(scores, members):
+    """Mean pairwise compatibility within one group (0.0 for fewer than two members)"""
+    if len(members) < 2:
+        return 0.0
+    block = np.asarray(scores)[np.ix_(members, members)]
+    pairs = len(members) * (len(members) - 1)
+    return float((block.sum() - np.trace(block)) / pairs)
@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.availability import DAYS, encode_availability
+from accounts.models import Student, StudentProfile
+from matching.models import MatchingAlgorithm
+from schedules.models import Course
+
+
+SLOTS = ['08:00-10:00', '10:00-12:00', '14:00-16:00', '16:00-18:00', '18:00-20:00']
+
+
+def synthetic_students(count, seed=42):
+    """Build unsaved students with random matching features"""
+    rng = random.Random(seed)
+    students = []
+    for i in range(count):
+        student = Student(
+            username=f'bench_{i}',
+            student_id=f'BENCH{i:05d}',
+            level=rng.choice(['L1', 'L2', 'L3', 'M1', 'M2']),
+            filiere=rng.choice(['INFO', 'MATH', 'PHYS', 'ECON']),
+        )
+        if rng.random() < 0.9:
+            student.study_preferences = {
+                'study_style': rng.choice(['group', 'solo', 'mixed', None]),
+                'preferred_group_size': rng.randint(2, 8),
+            }
+        if rng.random() < 0.85:
+            student.availability = {
+                day: rng.sample(SLOTS, rng.randint(0, 3))
+                for day in DAYS if rng.random() < 0.7
+            }
+        student.availability_mask = encode_availability(student.availability)
+        if rng.random() < 0.9:
+            StudentProfile(
+                student=student,
+                gpa=round(rng.uniform(0, 4), 2) if rng.random() < 0.8 else None,
+                enrollment_year=2024,
+                expected_graduation=2027,
+                communication_preference=rng.choice(['whatsapp', 'telegram', 'discord', 'email']),
+            )
+        students.append(student)
+    return students
+
+
+class Command(BaseCommand):
+    help = 'Compare scalar and vectorized compatibility scoring on a cohort'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=300, help='Synthetic cohort size')
+        parser.add_argument('--course', help='Use the students enrolled in this course code instead')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['course']:
+            try:
+                course = Course.objects.get(code=options['course'])
+            except Course.DoesNotExist:
+                raise CommandError(f"Cours introuvable: {options['course']}")
+            students = course.students.all()
+        else:
+            course = None
+            students = synthetic_students(options['students'], options['seed'])
+
+        start = time.perf_counter()
+        student_list, total, scores = MatchingAlgorithm.calculate_compatibility_matrix(students, course)
+        vector_time = time.perf_counter() - start
+
+        n = len(student_list)
+        max_diff = 0.0
+        start = time.perf_counter()
+        for i in range(n):
+            for j in range(i + 1, n):
+                score, _ = MatchingAlgorithm.calculate_compatibility(student_list[i], student_list[j], course)
+                max_diff = max(max_diff, abs(score - total[i, j]))
+        scalar_time = time.perf_counter() - start
+
+        pairs = n * (n - 1) // 2
+        self.stdout.write(f'{n} students, {pairs} pairs')
+        self.stdout.write(f'scalar:     {scalar_time * 1000:10.1f} ms')
+        self.stdout.write(f'vectorized: {vector_time * 1000:10.1f} ms')
+        if vector_time > 0:
+            self.stdout.write(f'speedup:    {scalar_time / vector_time:10.1f}x')
+        self.stdout.write(f'max abs difference: {max_diff:.3g}')
+        if max_diff > 1e-12:
+            raise CommandError('Vectorized scores diverge from the scalar implementation')
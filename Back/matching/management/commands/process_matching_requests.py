@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from matching.worker import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, run
+
+
+class Command(BaseCommand):
+    help = 'Process pending MatchingRequests with a local worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Worker processes')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Requests claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit')
+
+    def handle(self, *args, **options):
+        processed = run(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{processed} demandes traitées'))
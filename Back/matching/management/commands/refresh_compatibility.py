@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matching.compatibility import rebuild_course, refresh_changed
+from schedules.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Refresh pre-calculated StudentCompatibility scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every pair instead of only students queued as changed (after a weight change)',
+        )
+        parser.add_argument('--course', action='append', help='Course code to rebuild (with --full), repeatable')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        if options['full']:
+            courses = Course.objects.all()
+            if options['course']:
+                courses = courses.filter(code__in=options['course'])
+                if len(courses) != len(set(options['course'])):
+                    raise CommandError('Cours introuvable')
+            written = 0
+            for course in courses:
+                count = rebuild_course(course)
+                written += count
+                self.stdout.write(f'{course.code}: {count} paires')
+        elif options['course']:
+            raise CommandError('--course requires --full')
+        else:
+            written = refresh_changed()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'{written} paires recalculées en {elapsed:.2f}s'))
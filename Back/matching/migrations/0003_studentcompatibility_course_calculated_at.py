@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0002_compatibility_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentcompatibility',
+            index=models.Index(fields=['course', 'calculated_at'], name='matching_st_course__2767b9_idx'),
+        ),
+    ]
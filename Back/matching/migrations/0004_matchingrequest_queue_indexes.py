@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0003_studentcompatibility_course_calculated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchingrequest',
+            index=models.Index(fields=['status', 'created_at'], name='matching_ma_status_631fee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchingrequest',
+            index=models.Index(fields=['status', 'expires_at'], name='matching_ma_status_f01a3d_idx'),
+        ),
+    ]
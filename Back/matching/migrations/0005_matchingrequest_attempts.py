@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0004_matchingrequest_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchingrequest',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='matchingrequest',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='matchingrequest',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('PROCESSING', 'En cours'), ('COMPLETED', 'Terminé'), ('EXPIRED', 'Expiré'), ('FAILED', 'Échec')], default='PENDING', max_length=15),
+        ),
+    ]
@@ -1,9 +1,7 @@
 from django.db import models
 from django.conf import settings
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-import pandas as pd
+
+from accounts.availability import availability_mask, has_availability, schedule_overlap
 
 
 class StudyGroup(models.Model):
@@ -96,6 +94,7 @@ class MatchingRequest(models.Model):
         ('PROCESSING', 'En cours'),
         ('COMPLETED', 'Terminé'),
         ('EXPIRED', 'Expiré'),
+        ('FAILED', 'Échec'),
     ]
     
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -112,6 +111,15 @@ class MatchingRequest(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    # Set by matching.worker on each claim: a request PROCESSING for too long is reclaimed
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
     
     def __str__(self):
         return f"Demande de {self.student.username} pour {self.course.name}"
@@ -134,11 +142,21 @@ class StudentCompatibility(models.Model):
     
     class Meta:
         unique_together = ('student1', 'student2', 'course')
+        indexes = [models.Index(fields=['course', 'calculated_at'])]
     
     def __str__(self):
         return f"{self.student1.username} <-> {self.student2.username}: {self.compatibility_score:.2f}"
 
 
+class CompatibilityChange(models.Model):
+    """Students whose pre-calculated compatibility scores are stale"""
+    student = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    changed_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Scores à recalculer pour {self.student_id}"
+
+
 class MatchingAlgorithm:
     """AI-powered matching algorithm"""
     
@@ -168,33 +186,28 @@ class MatchingAlgorithm:
         )
         
         return total_score, scores
-    
+
+    @staticmethod
+    def calculate_compatibility_matrix(students, course):
+        """Calculate compatibility scores for every pair of students at once
+
+        Returns the ordered student list, the weighted score matrix and a dict
+        of per-factor matrices, matching ``calculate_compatibility`` pair by pair.
+        """
+        from .engine import CohortFeatures, compatibility_matrix
+
+        features = CohortFeatures(students)
+        total, scores = compatibility_matrix(features)
+        return features.students, total, scores
+
     @staticmethod
     def _calculate_schedule_compatibility(student1, student2):
         """Calculate schedule overlap compatibility"""
-        avail1 = student1.availability or {}
-        avail2 = student2.availability or {}
-        
-        if not avail1 or not avail2:
+        if not has_availability(student1) or not has_availability(student2):
             return 0.5  # Neutral score if no availability data
         
-        # Calculate overlap in available time slots
-        overlap_score = 0
-        total_slots = 0
-        
-        for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-            slots1 = avail1.get(day, [])
-            slots2 = avail2.get(day, [])
-            
-            if slots1 and slots2:
-                # Simple overlap calculation
-                overlap = len(set(slots1) & set(slots2))
-                total = len(set(slots1) | set(slots2))
-                if total > 0:
-                    overlap_score += overlap / total
-                total_slots += 1
-        
-        return overlap_score / max(total_slots, 1)
+        # Jaccard overlap of the hourly availability bitmasks, averaged per day
+        return schedule_overlap(availability_mask(student1), availability_mask(student2))
     
     @staticmethod
     def _calculate_academic_compatibility(student1, student2):
@@ -257,71 +270,22 @@ class MatchingAlgorithm:
             return 0.8  # Neutral score
     
     @staticmethod
-    def find_optimal_groups(students, course, group_size=4):
-        """Use clustering to form optimal study groups"""
-        if len(students) < 2:
+    def find_optimal_groups(students, course, group_size=4, max_members=6, seed=42, time_budget=2.0):
+        """Form balanced study groups that maximize within-group compatibility
+
+        Every group gets between ``group_size`` and ``max_members`` students
+        (smaller groups only when the cohort is too small). Returns a list of
+        ``(students, avg_compatibility_score)`` tuples, the score being the
+        mean pairwise compatibility used for ``StudyGroup.avg_compatibility_score``.
+        """
+        from .engine import balanced_groups, mean_compatibility
+
+        student_list, total, _ = MatchingAlgorithm.calculate_compatibility_matrix(students, course)
+        if len(student_list) < 2:
             return []
-        
-        # Create feature matrix
-        features = []
-        student_list = list(students)
-        
-        for student in student_list:
-            feature_vector = MatchingAlgorithm._create_feature_vector(student)
-            features.append(feature_vector)
-        
-        # Only proceed if we have scikit-learn available
-        try:
-            # Normalize features
-            scaler = StandardScaler()
-            features_scaled = scaler.fit_transform(features)
-            
-            # Determine number of clusters
-            n_groups = max(1, len(students) // group_size)
-            
-            # Apply K-means clustering
-            kmeans = KMeans(n_clusters=n_groups, random_state=42)
-            cluster_labels = kmeans.fit_predict(features_scaled)
-            
-            # Group students by cluster
-            groups = {}
-            for i, label in enumerate(cluster_labels):
-                if label not in groups:
-                    groups[label] = []
-                groups[label].append(student_list[i])
-            
-            return list(groups.values())
-        except ImportError:
-            # Fallback to simple grouping if scikit-learn is not available
-            return [student_list[i:i+group_size] for i in range(0, len(student_list), group_size)]
-    
-    @staticmethod
-    def _create_feature_vector(student):
-        """Create numerical feature vector for clustering"""
-        features = []
-        
-        # Level encoding
-        level_encoding = {'L1': 1, 'L2': 2, 'L3': 3, 'M1': 4, 'M2': 5}
-        features.append(level_encoding.get(student.level, 3))
-        
-        # Filiere encoding
-        filiere_encoding = {'INFO': 1, 'MATH': 2, 'PHYS': 3, 'ECON': 4, 'GESTION': 5, 'DROIT': 6}
-        features.append(filiere_encoding.get(student.filiere, 1))
-        
-        # GPA (if available)
-        try:
-            gpa = getattr(student.profile, 'gpa', 2.5) or 2.5
-        except:
-            gpa = 2.5
-        features.append(gpa)
-        
-        # Study preferences
-        prefs = student.study_preferences or {}
-        features.append(prefs.get('preferred_group_size', 4))
-        
-        # Time preferences (encoded as numbers)
-        time_pref = prefs.get('preferred_study_time', 'afternoon')
-        time_encoding = {'morning': 1, 'afternoon': 2, 'evening': 3, 'flexible': 2}
-        features.append(time_encoding.get(time_pref, 2))
-        
-        return features
+
+        groups = balanced_groups(total, group_size, max_members, seed=seed, time_budget=time_budget)
+        return [
+            ([student_list[i] for i in members], mean_compatibility(total, members))
+            for members in groups
+        ]
@@ -0,0 +1,165 @@
+"""
+Top-k study partner recommendations.
+
+Each process keeps one ``PartnerIndex`` per course: the dense compatibility
+matrix of the enrolled students, loaded once from ``StudentCompatibility``
+and then patched with the rows recalculated since the last query, so a
+recommendation is a partial sort of a single row. Students enrolled since the
+last ``refresh_compatibility`` have no stored pair yet: their rows are scored
+live when the index is built. A course with no stored pairs at all is scored
+live as a whole, and rescored when its students' queued feature changes
+(``CompatibilityChange``) move.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .compatibility import cohort_features
+from .engine import compatibility_matrix
+from .models import CompatibilityChange, GroupMembership, StudentCompatibility, StudyGroup
+
+
+# Re-read rows written slightly before the last sync, in case their
+# transaction committed after it
+SYNC_OVERLAP = timedelta(minutes=1)
+
+_indexes = {}
+
+
+def feature_version(course):
+    """(count, latest change) of the queued feature changes of a course's students"""
+    queued = CompatibilityChange.objects.filter(student__courses=course).aggregate(
+        count=Count('pk'), latest=Max('changed_at')
+    )
+    return queued['count'], queued['latest']
+
+
+class PartnerIndex:
+    """In-memory compatibility matrix of one course"""
+
+    def __init__(self, course):
+        self.course = course
+        self.ids = np.array(sorted(course.students.values_list('pk', flat=True)), dtype=np.int64)
+        self.position = {pk: i for i, pk in enumerate(self.ids.tolist())}
+        self.scores = np.full((len(self.ids), len(self.ids)), -np.inf)
+        self.synced_at = None
+        self.version = None
+        self.precomputed = StudentCompatibility.objects.filter(course=course).exists()
+
+        if self.precomputed:
+            self.sync()
+            self.score_missing()
+        else:
+            # Nothing materialized yet for this course: score the cohort directly
+            self.version = feature_version(course)
+            features = cohort_features(course)
+            self.scores, _ = compatibility_matrix(features)
+
+    def sync(self):
+        """Patch the matrix with the pairs recalculated since the last sync"""
+        now = timezone.now()
+        pairs = StudentCompatibility.objects.filter(course=self.course)
+        if self.synced_at is not None:
+            pairs = pairs.filter(calculated_at__gte=self.synced_at - SYNC_OVERLAP)
+        self.synced_at = now
+
+        rows = [
+            (self.position[student1_id], self.position[student2_id], score)
+            for student1_id, student2_id, score
+            in pairs.values_list('student1_id', 'student2_id', 'compatibility_score').iterator(chunk_size=5000)
+            if student1_id in self.position and student2_id in self.position
+        ]
+        if rows:
+            i, j, score = (np.array(column) for column in zip(*rows))
+            self.scores[i, j] = score
+            self.scores[j, i] = score
+        return len(rows)
+
+    def score_missing(self):
+        """Score live the rows of the students without any stored pair"""
+        missing = ~np.isfinite(self.scores).any(axis=1)
+        if len(self.ids) < 2 or not missing.any():
+            return 0
+        features = cohort_features(self.course)
+        if [student.pk for student in features.students] != self.ids.tolist():
+            # Enrollment changed meanwhile: get_index rebuilds the index on the next query
+            return 0
+        rows = np.flatnonzero(missing)
+        total, _ = compatibility_matrix(features, rows)
+        self.scores[rows, :] = total
+        self.scores[:, rows] = total.T
+        self.scores[rows, rows] = -np.inf
+        return len(rows)
+
+    def top(self, student_id, k, exclude=()):
+        """Ids and scores of the k best partners of a student, best first"""
+        row = self.scores[self.position[student_id]].copy()
+        row[self.position[student_id]] = -np.inf
+        for pk in exclude:
+            if pk in self.position:
+                row[self.position[pk]] = -np.inf
+
+        k = min(k, len(row))
+        if k <= 0:
+            return []
+        if k < len(row):
+            candidates = np.argpartition(-row, k - 1)[:k]
+        else:
+            candidates = np.arange(len(row))
+        candidates = candidates[np.argsort(-row[candidates], kind='stable')]
+        return [
+            (int(self.ids[i]), float(row[i]))
+            for i in candidates if np.isfinite(row[i])
+        ]
+
+
+def get_index(course):
+    """Partner index of a course, rebuilt when enrollment (or, scored live, features) changed, synced otherwise"""
+    index = _indexes.get(course.pk)
+    enrolled = set(course.students.values_list('pk', flat=True))
+    if index is None or enrolled != set(index.position):
+        index = _indexes[course.pk] = PartnerIndex(course)
+    elif index.precomputed:
+        index.sync()
+    elif StudentCompatibility.objects.filter(course=course).exists() or feature_version(course) != index.version:
+        index = _indexes[course.pk] = PartnerIndex(course)
+    return index
+
+
+def full_group_members(course):
+    """Students already in a full study group of the course"""
+    full_groups = StudyGroup.objects.filter(course=course).annotate(
+        member_count=Count('members')
+    ).filter(member_count__gte=F('max_members'))
+    return set(GroupMembership.objects.filter(
+        group__in=full_groups, is_active=True
+    ).values_list('student_id', flat=True))
+
+
+def recommend_partners(student, course, k=10, exclude_full_groups=True):
+    """Best k classmates for a student in a course as (student_id, score) pairs"""
+    index = get_index(course)
+    if student.pk not in index.position:
+        return []
+    exclude = full_group_members(course) if exclude_full_groups else ()
+    return index.top(student.pk, k, exclude)
+
+
+def complete_matching_request(matching_request, k=10):
+    """Store the top partners of a MatchingRequest and the groups they can be joined in"""
+    partners = recommend_partners(matching_request.student, matching_request.course, k)
+    matching_request.compatibility_scores = {str(pk): round(score, 4) for pk, score in partners}
+    matching_request.status = 'COMPLETED'
+    matching_request.save(update_fields=['compatibility_scores', 'status'])
+
+    open_groups = StudyGroup.objects.filter(
+        course=matching_request.course, status__in=['FORMING', 'ACTIVE']
+    ).annotate(member_count=Count('members')).filter(member_count__lt=F('max_members'))
+    groups = StudyGroup.objects.filter(
+        pk__in=open_groups.values('pk'), members__in=[pk for pk, _ in partners]
+    ).exclude(members=matching_request.student).distinct()
+    matching_request.matched_groups.set(groups)
+    return partners
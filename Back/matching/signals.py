@@ -0,0 +1,85 @@
+"""
+Change tracking for pre-calculated compatibility scores.
+
+Edits to the features used by ``MatchingAlgorithm`` queue the student in
+``CompatibilityChange``; ``python manage.py refresh_compatibility`` then
+recomputes only the affected rows.
+"""
+
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Student, StudentProfile
+from schedules.models import Course
+
+from .models import CompatibilityChange, StudentCompatibility
+
+
+STUDENT_FIELDS = ('availability', 'study_preferences', 'level', 'filiere')
+PROFILE_FIELDS = ('gpa', 'communication_preference')
+
+
+def mark_changed(student_ids):
+    """Queue students whose matching features changed (one upsert)"""
+    now = timezone.now()
+    CompatibilityChange.objects.bulk_create(
+        [CompatibilityChange(student_id=student_id, changed_at=now) for student_id in set(student_ids)],
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=['changed_at'],
+    )
+
+
+def forget_enrollment(course_ids, student_ids):
+    """Drop the stored pairs of students who left a course"""
+    StudentCompatibility.objects.filter(course__in=course_ids).filter(
+        Q(student1__in=student_ids) | Q(student2__in=student_ids)
+    ).delete()
+
+
+def _features_changed(sender, instance, fields, update_fields):
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return False
+    if instance._state.adding:
+        return True
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    return previous is None or any(previous[field] != getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=Student)
+def detect_student_change(sender, instance, update_fields=None, **kwargs):
+    # New students have no enrollments yet; joining a course queues them
+    instance._compatibility_changed = (
+        not instance._state.adding and
+        _features_changed(sender, instance, STUDENT_FIELDS, update_fields)
+    )
+
+
+@receiver(pre_save, sender=StudentProfile)
+def detect_profile_change(sender, instance, update_fields=None, **kwargs):
+    instance._compatibility_changed = _features_changed(sender, instance, PROFILE_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=StudentProfile)
+def queue_changed_student(sender, instance, **kwargs):
+    if getattr(instance, '_compatibility_changed', False):
+        mark_changed([instance.student_id if sender is StudentProfile else instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def track_enrollment(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        mark_changed([instance.pk] if reverse else pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            forget_enrollment(pk_set, [instance.pk])
+        else:
+            forget_enrollment([instance.pk], pk_set)
+    elif action == 'pre_clear':
+        if reverse:
+            forget_enrollment(instance.courses.values_list('pk', flat=True), [instance.pk])
+        else:
+            StudentCompatibility.objects.filter(course=instance).delete()
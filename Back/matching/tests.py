@@ -0,0 +1,53 @@
+from django.test import TestCase
+
+from accounts.models import Student, StudentProfile
+
+from .models import MatchingAlgorithm
+
+
+STUDENTS = [
+    # level, filiere, availability, study preferences, profile (gpa, communication) or None
+    ('L1', 'INFO', {'monday': ['matin'], 'wednesday': ['14:00-18:00']}, {'study_style': 'visual', 'preferred_group_size': 3}, (14.5, 'whatsapp')),
+    ('L1', 'INFO', {'monday': ['10h-12h'], 'friday': ['soir']}, {'study_style': 'visual'}, (11.0, 'discord')),
+    ('L2', 'MATH', {'monday': [], 'tuesday': ['bientôt']}, {'preferred_group_size': 6}, (None, 'whatsapp')),
+    ('L1', 'PHYS', {}, {}, None),
+    ('M1', 'INFO', {'wednesday': ['15:00-17:00', '9']}, {'study_style': 'auditory', 'preferred_group_size': 2}, (16.0, 'email')),
+    ('L1', 'INFO', {'monday': ['matin'], 'wednesday': ['14:00-18:00']}, {'study_style': 'visual', 'preferred_group_size': 3}, (14.5, 'whatsapp')),
+]
+
+
+class CompatibilityMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i, (level, filiere, availability, preferences, profile) in enumerate(STUDENTS):
+            student = Student.objects.create(
+                username=f'student{i}', student_id=f'E{i:03d}', level=level, filiere=filiere,
+                availability=availability, study_preferences=preferences,
+            )
+            if profile is not None:
+                StudentProfile.objects.create(
+                    student=student, enrollment_year=2024, expected_graduation=2027,
+                    gpa=profile[0], communication_preference=profile[1],
+                )
+
+    def test_matrix_matches_pairwise_scores(self):
+        students, total, scores = MatchingAlgorithm.calculate_compatibility_matrix(
+            Student.objects.order_by('pk'), course=None
+        )
+        self.assertEqual(total.shape, (len(STUDENTS), len(STUDENTS)))
+        for i, student1 in enumerate(students):
+            for j, student2 in enumerate(students):
+                expected_total, expected = MatchingAlgorithm.calculate_compatibility(student1, student2, None)
+                self.assertAlmostEqual(total[i, j], expected_total, places=12)
+                for factor, score in expected.items():
+                    self.assertAlmostEqual(scores[factor][i, j], score, places=12, msg=(factor, i, j))
+
+    def test_schedule_scores(self):
+        students = list(Student.objects.order_by('pk'))
+        schedule = MatchingAlgorithm._calculate_schedule_compatibility
+        self.assertEqual(schedule(students[0], students[5]), 1.0)
+        # Availability filled in without a single hour: no overlap, as before the bitmasks
+        self.assertEqual(schedule(students[0], students[2]), 0.0)
+        # No availability at all: neutral
+        self.assertEqual(schedule(students[0], students[3]), 0.5)
+        self.assertEqual(schedule(students[2], students[3]), 0.5)
@@ -1,5 +1,8 @@
 from django.urls import path
+from . import views
 
 urlpatterns = [
-    # URLs will be added as we implement views
+    path('courses/<int:course_id>/partners/', views.partner_recommendations, name='partner_recommendations'),
+    path('requests/', views.create_matching_request, name='create_matching_request'),
+    path('requests/<int:request_id>/', views.matching_request_detail, name='matching_request_detail'),
 ]
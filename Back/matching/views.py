@@ -1,3 +1,91 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from accounts.models import Student
+from schedules.models import Course
+from .models import MatchingRequest, StudyGroup
+from .worker import REQUEST_TTL
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def partner_recommendations(request, course_id):
+    """Get the best study partners for the current user in a course"""
+    # Loaded on first use so URL loading does not import NumPy
+    from .recommendations import recommend_partners
+
+    course = get_object_or_404(Course, pk=course_id, students=request.user)
+    try:
+        k = min(int(request.GET.get('k', 10)), 50)
+    except ValueError:
+        return Response({'error': 'Paramètre k invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    exclude_full_groups = request.GET.get('exclude_full_groups', 'true').lower() != 'false'
+
+    partners = recommend_partners(request.user, course, k, exclude_full_groups)
+    students = Student.objects.in_bulk([pk for pk, _ in partners])
+
+    return Response([
+        {
+            'id': pk,
+            'username': students[pk].username,
+            'first_name': students[pk].first_name,
+            'last_name': students[pk].last_name,
+            'level': students[pk].level,
+            'filiere': students[pk].filiere,
+            'compatibility_score': round(score, 4),
+        }
+        for pk, score in partners if pk in students
+    ])
+
+
+def _matching_request_data(matching_request):
+    return {
+        'id': matching_request.id,
+        'course': matching_request.course_id,
+        'status': matching_request.status,
+        'preferred_group_size': matching_request.preferred_group_size,
+        'study_type': matching_request.study_type,
+        'compatibility_scores': matching_request.compatibility_scores,
+        'matched_groups': [group.id for group in matching_request.matched_groups.all()],
+        'created_at': matching_request.created_at.isoformat(),
+        'expires_at': matching_request.expires_at.isoformat(),
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_matching_request(request):
+    """Queue a matching request; it is processed by process_matching_requests"""
+    course = get_object_or_404(Course, pk=request.data.get('course'), students=request.user)
+    study_type = request.data.get('study_type', 'GENERAL')
+    if study_type not in dict(StudyGroup.STUDY_TYPE_CHOICES):
+        return Response({'error': 'Type d\'étude invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        preferred_group_size = int(request.data.get('preferred_group_size', 4))
+    except (TypeError, ValueError):
+        preferred_group_size = 0
+    if isinstance(request.data.get('preferred_group_size'), bool) or preferred_group_size < 2:
+        return Response({'error': 'Taille de groupe invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    matching_request = MatchingRequest.objects.create(
+        student=request.user,
+        course=course,
+        preferred_group_size=preferred_group_size,
+        study_type=study_type,
+        availability=request.data.get('availability', {}),
+        preferences=request.data.get('preferences', {}),
+        expires_at=timezone.now() + REQUEST_TTL,
+    )
+    return Response(_matching_request_data(matching_request), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def matching_request_detail(request, request_id):
+    """Get the status and results of one of the current user's matching requests"""
+    matching_request = get_object_or_404(MatchingRequest, pk=request_id, student=request.user)
+    return Response(_matching_request_data(matching_request))
@@ -0,0 +1,136 @@
+"""
+Database-backed queue for MatchingRequest processing.
+
+Pending requests are claimed in batches (``select_for_update(skip_locked=True)``
+where the database supports it, a conditional UPDATE otherwise), grouped by
+course and handed to a process pool, so the cohort matrix of a course is built
+once per batch. No broker is needed: the ``matching_requests`` table is the
+queue, and ``python manage.py process_matching_requests`` drives it.
+
+A request whose processing fails goes back to PENDING, and to FAILED after
+``MATCHING_MAX_ATTEMPTS`` claims. One left PROCESSING by a crashed worker is
+released the same way once its claim is ``MATCHING_LEASE_MINUTES`` old.
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MatchingRequest
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = getattr(settings, 'MATCHING_WORKERS', 2)
+DEFAULT_BATCH_SIZE = getattr(settings, 'MATCHING_BATCH_SIZE', 100)
+DEFAULT_TOP_K = getattr(settings, 'MATCHING_TOP_K', 10)
+REQUEST_TTL = timedelta(days=7)
+MAX_ATTEMPTS = getattr(settings, 'MATCHING_MAX_ATTEMPTS', 3)
+LEASE = timedelta(minutes=getattr(settings, 'MATCHING_LEASE_MINUTES', 10))
+
+
+def expire_stale(now=None):
+    """Move pending or stuck requests past their expires_at to EXPIRED"""
+    now = now or timezone.now()
+    return MatchingRequest.objects.filter(
+        status__in=['PENDING', 'PROCESSING'], expires_at__lte=now
+    ).update(status='EXPIRED')
+
+
+def release(request_ids):
+    """Put claimed requests back in the queue, or FAILED once out of attempts; returns (requeued, failed)"""
+    claimed = MatchingRequest.objects.filter(pk__in=request_ids, status='PROCESSING')
+    failed = claimed.filter(attempts__gte=MAX_ATTEMPTS).update(status='FAILED')
+    return claimed.update(status='PENDING'), failed
+
+
+def reclaim_stuck(now=None):
+    """Release the requests claimed longer than the lease ago (their worker died)"""
+    now = now or timezone.now()
+    stuck = MatchingRequest.objects.filter(status='PROCESSING', claimed_at__lt=now - LEASE)
+    return release(list(stuck.values_list('pk', flat=True)))
+
+
+def claim_pending(limit=DEFAULT_BATCH_SIZE):
+    """Mark up to ``limit`` pending requests PROCESSING and group their ids by course"""
+    now = timezone.now()
+    claim = {'status': 'PROCESSING', 'claimed_at': now, 'attempts': F('attempts') + 1}
+    with transaction.atomic():
+        pending = MatchingRequest.objects.filter(
+            status='PENDING', expires_at__gt=now
+        ).order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            rows = list(pending.select_for_update(skip_locked=True).values_list('pk', 'course_id')[:limit])
+            MatchingRequest.objects.filter(pk__in=[pk for pk, _ in rows]).update(**claim)
+        else:
+            # No row locks (SQLite): only keep the rows this UPDATE switched
+            rows = [
+                (pk, course_id)
+                for pk, course_id in pending.values_list('pk', 'course_id')[:limit]
+                if MatchingRequest.objects.filter(pk=pk, status='PENDING').update(**claim)
+            ]
+
+    batches = {}
+    for pk, course_id in rows:
+        batches.setdefault(course_id, []).append(pk)
+    return batches
+
+
+def process_batch(course_id, request_ids, k=DEFAULT_TOP_K):
+    """Complete every claimed request of one course (runs in a pool worker)"""
+    from .recommendations import complete_matching_request
+
+    done = 0
+    requests = MatchingRequest.objects.filter(
+        pk__in=request_ids, status='PROCESSING'
+    ).select_related('student', 'course')
+    for matching_request in requests:
+        try:
+            complete_matching_request(matching_request, k)
+            done += 1
+        except Exception:
+            logger.exception('Matching request %s failed', matching_request.pk)
+            release([matching_request.pk])
+    return done
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def run(workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE, poll_interval=5.0, once=False):
+    """Expire, claim and process requests until interrupted (or one pass with ``once``)"""
+    # Connections must not be shared with forked workers
+    connections.close_all()
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            expired = expire_stale()
+            reclaim_stuck()
+            batches = claim_pending(batch_size)
+            connections.close_all()
+
+            futures = {pool.submit(process_batch, course_id, ids): ids for course_id, ids in batches.items()}
+            done = 0
+            for future, ids in futures.items():
+                try:
+                    done += future.result()
+                except Exception:
+                    logger.exception('Matching batch failed, releasing %d requests', len(ids))
+                    release(ids)
+            processed += done
+            if expired or batches:
+                logger.info('%d requests completed, %d expired', done, expired)
+
+            if once:
+                return processed
+            if not batches:
+                time.sleep(poll_interval)
@@ -0,0 +1,265 @@
+"""
+Room and student conflicts of the timetable.
+
+Weekly sessions are intervals of minutes keyed by (room or student, weekday);
+exams are keyed by (room or student, date). An ``IntervalIndex`` keeps the
+intervals of each key sorted by start together with the running maximum of
+their ends, so whether an interval clashes with a key is answered by one
+bisection. ``audit`` loads the whole timetable once and finds every
+overlapping pair with a sweep line per key, then checks each exam against the
+weekly sessions of its weekday through the index.
+
+``schedule_conflicts`` and ``exam_conflicts`` check a single row: the rows of
+the same room, or of the same students, on its weekday or date are loaded
+into an ``IntervalIndex`` and queried once. ``Schedule.clean`` and
+``Exam.clean`` raise them as validation errors, and ``schedules.signals``
+when students are added to a session or an exam. Enrolling in a ``Course``
+is not checked: it does not place a student in any session.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import DateTimeField, ExpressionWrapper, F
+from django.utils import timezone
+
+from .models import Exam, Schedule
+
+
+DAY_MINUTES = 24 * 60
+WEEKDAYS = [code for code, _ in Schedule.DAYS_OF_WEEK]
+
+# kind: 'room' or 'student'; key: room name or student id; day: weekday code or date;
+# first/second: ('schedule' | 'exam', pk)
+Conflict = namedtuple('Conflict', 'kind key day first second')
+
+
+def minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def weekday(day):
+    """Weekday code of a date (None on Sundays, which have no sessions)"""
+    index = day.weekday()
+    return WEEKDAYS[index] if index < len(WEEKDAYS) else None
+
+
+def exam_interval(exam_date, duration):
+    """(local date, start minute, end minute) of an exam, cut at midnight"""
+    start = timezone.localtime(exam_date)
+    first = minutes(start)
+    return start.date(), first, min(first + int(duration.total_seconds() // 60), DAY_MINUTES)
+
+
+class IntervalIndex:
+    """Half-open intervals grouped by key, sorted by start"""
+
+    def __init__(self, intervals=()):
+        self._groups = defaultdict(list)
+        for key, start, end, ref in intervals:
+            self._groups[key].append((start, end, ref))
+        self._reach = {}
+        for key, group in self._groups.items():
+            group.sort()
+            self._reach[key] = self._running_max(group)
+
+    @staticmethod
+    def _running_max(group):
+        reach, furthest = [], 0
+        for _, end, _ in group:
+            furthest = max(furthest, end)
+            reach.append(furthest)
+        return reach
+
+    def overlapping(self, key, start, end, exclude=None):
+        """References of the intervals of ``key`` overlapping [start, end)
+
+        Answered in O(log n) when nothing overlaps; every hit adds one step.
+        """
+        group = self._groups.get(key)
+        if not group:
+            return []
+        reach = self._reach[key]
+        # Only intervals starting before ``end`` can overlap; the last one reaching past ``start`` bounds the walk
+        position = bisect_left(group, (end,))
+        hits = []
+        while position > 0 and reach[position - 1] > start:
+            position -= 1
+            other_start, other_end, ref = group[position]
+            if other_end > start and ref != exclude:
+                hits.append(ref)
+        return hits[::-1]
+
+
+def sweep(intervals):
+    """Every overlapping pair among (start, end, ref) intervals, in one pass"""
+    active = []
+    for start, end, ref in sorted(intervals):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other in active:
+            yield other, ref
+        heapq.heappush(active, (end, ref))
+
+
+def _pairs(kind, grouped):
+    for (key, day), intervals in grouped.items():
+        if len(intervals) > 1:
+            for first, second in sweep(intervals):
+                yield Conflict(kind, key, day, first, second)
+
+
+def _audit(kind, sessions, exams):
+    """Conflicts of one kind: sessions by (key, weekday), exams by (key, date)"""
+    conflicts = list(_pairs(kind, sessions))
+    conflicts += _pairs(kind, exams)
+    index = IntervalIndex(
+        (group, start, end, ref) for group, intervals in sessions.items() for start, end, ref in intervals
+    )
+    for (key, day), intervals in exams.items():
+        code = weekday(day)
+        for start, end, ref in intervals:
+            for other in index.overlapping((key, code), start, end):
+                conflicts.append(Conflict(kind, key, day, other, ref))
+    return conflicts
+
+
+def audit(date_from=None, date_to=None):
+    """Every room and student conflict of the weekly sessions and of the exams between two dates"""
+    exams = Exam.objects.all()
+    if date_from:
+        exams = exams.filter(exam_date__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        exams = exams.filter(exam_date__lte=timezone.make_aware(datetime.combine(date_to, time.max)))
+
+    session_times = {}
+    rooms = defaultdict(list)
+    for pk, day, start, end, room in Schedule.objects.values_list(
+        'pk', 'day_of_week', 'start_time', 'end_time', 'room'
+    ):
+        interval = (minutes(start), minutes(end), ('schedule', pk))
+        session_times[pk] = (day, interval)
+        if room:
+            rooms[room, day].append(interval)
+
+    exam_times = {}
+    exam_rooms = defaultdict(list)
+    for pk, exam_date, duration, room in exams.values_list('pk', 'exam_date', 'duration', 'room'):
+        day, start, end = exam_interval(exam_date, duration)
+        interval = (start, end, ('exam', pk))
+        exam_times[pk] = (day, interval)
+        if room:
+            exam_rooms[room, day].append(interval)
+
+    students = defaultdict(list)
+    for student_id, schedule_id in Schedule.students.through.objects.values_list('student_id', 'schedule_id'):
+        day, interval = session_times[schedule_id]
+        students[student_id, day].append(interval)
+    exam_students = defaultdict(list)
+    for student_id, exam_id in Exam.students.through.objects.filter(exam__in=exams).values_list(
+        'student_id', 'exam_id'
+    ):
+        day, interval = exam_times[exam_id]
+        exam_students[student_id, day].append(interval)
+
+    return _audit('room', rooms, exam_rooms) + _audit('student', students, exam_students)
+
+
+def exams_between(start, end):
+    """Exams overlapping the aware datetimes [start, end)"""
+    return Exam.objects.alias(
+        exam_end=ExpressionWrapper(F('exam_date') + F('duration'), output_field=DateTimeField())
+    ).filter(exam_date__lt=end, exam_end__gt=start)
+
+
+def _in_order(model, refs):
+    rows = model.objects.filter(pk__in=refs).select_related('course').in_bulk()
+    return [rows[pk] for pk in refs if pk in rows]
+
+
+def _clashing_sessions(sessions, code, start, end, exclude=None):
+    """Sessions of a queryset on weekday ``code`` overlapping [start, end) minutes"""
+    if code is None:
+        return []
+    rows = sessions.filter(day_of_week=code).values_list('pk', 'start_time', 'end_time').distinct()
+    index = IntervalIndex((code, minutes(first), minutes(last), pk) for pk, first, last in rows)
+    return _in_order(Schedule, index.overlapping(code, start, end, exclude))
+
+
+def _clashing_exams(exams, day, start, end, exclude=None):
+    """Exams of a queryset on local date ``day`` overlapping [start, end) minutes"""
+    midnight = timezone.make_aware(datetime.combine(day, time.min))
+    rows = exams.filter(exam_date__gte=midnight, exam_date__lt=midnight + timedelta(days=1)).values_list(
+        'pk', 'exam_date', 'duration'
+    ).distinct()
+    index = IntervalIndex((day, *exam_interval(exam_date, duration)[1:], pk) for pk, exam_date, duration in rows)
+    return _in_order(Exam, index.overlapping(day, start, end, exclude))
+
+
+def schedule_conflicts(schedule, student_ids=None):
+    """Sessions clashing with ``schedule``: {'room': [...], 'students': [...]}
+
+    Students are those of the saved session, or ``student_ids`` about to be added to it.
+    """
+    code, start, end = schedule.day_of_week, minutes(schedule.start_time), minutes(schedule.end_time)
+    conflicts = {'room': [], 'students': []}
+    if schedule.room and student_ids is None:
+        conflicts['room'] = _clashing_sessions(
+            Schedule.objects.filter(room=schedule.room), code, start, end, schedule.pk
+        )
+    if student_ids is None and schedule.pk:
+        student_ids = Schedule.students.through.objects.filter(schedule=schedule.pk).values('student_id')
+    if student_ids is not None:
+        conflicts['students'] = _clashing_sessions(
+            Schedule.objects.filter(students__in=student_ids), code, start, end, schedule.pk
+        )
+    return conflicts
+
+
+def exam_conflicts(exam, student_ids=None):
+    """Exams and sessions clashing with ``exam``: {'room': [...], 'students': [...]}
+
+    Students are those of the saved exam, or ``student_ids`` about to be added to it.
+    """
+    day, start, end = exam_interval(exam.exam_date, exam.duration)
+    conflicts = {'room': [], 'students': []}
+    if exam.room and student_ids is None:
+        conflicts['room'] = [
+            *_clashing_exams(Exam.objects.filter(room=exam.room), day, start, end, exam.pk),
+            *_clashing_sessions(Schedule.objects.filter(room=exam.room), weekday(day), start, end),
+        ]
+    if student_ids is None and exam.pk:
+        student_ids = Exam.students.through.objects.filter(exam=exam.pk).values('student_id')
+    if student_ids is not None:
+        conflicts['students'] = [
+            *_clashing_exams(Exam.objects.filter(students__in=student_ids), day, start, end, exam.pk),
+            *_clashing_sessions(Schedule.objects.filter(students__in=student_ids), weekday(day), start, end),
+        ]
+    return conflicts
+
+
+def describe(entry):
+    """Short French label of a clashing session or exam"""
+    if isinstance(entry, Exam):
+        start = timezone.localtime(entry.exam_date)
+        return f'{entry.course.code} {entry.title} le {start:%d/%m/%Y à %H:%M}'
+    return (
+        f'{entry.course.code} ({entry.get_type_display()}) le {entry.get_day_of_week_display()} '
+        f'de {entry.start_time:%H:%M} à {entry.end_time:%H:%M}'
+    )
+
+
+def clash_errors(conflicts):
+    """Raise the ValidationError of the clashes found by schedule_conflicts / exam_conflicts"""
+    errors = {}
+    if conflicts['room']:
+        errors['room'] = [f'Salle déjà occupée: {describe(entry)}' for entry in conflicts['room']]
+    if conflicts['students']:
+        errors['students'] = [
+            f'Des étudiants sont déjà inscrits à {describe(entry)}' for entry in conflicts['students']
+        ]
+    if errors:
+        raise ValidationError(errors)
@@ -0,0 +1,330 @@
+"""
+Exam session timetabling.
+
+Given a set of exams, rooms with their capacities and time slots, every exam
+gets a slot and a room so that no student sits two exams at once, no room
+hosts two exams, and as few students as possible have exams in consecutive
+slots of the same day.
+
+- ``ConflictGraph`` reads the ``Exam.students`` table once into NumPy columns
+  and builds the exam conflict graph as a symmetric CSR matrix whose weights
+  are the numbers of students two exams share.
+- ``ExamScheduler`` colours the graph with DSatur (the exam with the most
+  distinct blocked slots goes first, into its cheapest feasible slot; an exam
+  that fits nowhere moves up to three blocking exams to other slots), then
+  improves the back-to-back count with simulated annealing over single-exam
+  moves. Slots stay feasible throughout: a slot accepts an exam when none of
+  its neighbours sits there, the exam fits in the slot, and the slot's free
+  rooms can still seat every exam placed in it, biggest exam in the biggest
+  room.
+- Rooms taken and students sitting in exams outside the set, at the time of
+  a slot, are taken into account.
+
+NumPy is imported here only; the ``schedule_exams`` command loads this module.
+"""
+
+import math
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+
+from .conflicts import exams_between
+from .models import Exam
+from .timetable import mark_stale
+
+
+TIME_LIMIT = 30  # seconds of local search
+MOVES_PER_EXAM = 1000
+MAX_EJECTIONS = 3  # exams moved away to make room for one that fits nowhere
+UNPLACED = -1
+NO_SLOT = -2
+
+# start: aware datetime; length: timedelta
+Slot = namedtuple('Slot', 'start length')
+
+
+def _columns(rows, count):
+    columns = list(zip(*rows))
+    return columns if columns else [()] * count
+
+
+class ConflictGraph:
+    """Exams sharing students, as a CSR matrix of shared student counts"""
+
+    def __init__(self, exam_ids):
+        self.exam_ids = np.array(sorted(exam_ids), dtype=np.int64)
+        exam, student = _columns(
+            Exam.students.through.objects.filter(exam__in=self.exam_ids.tolist()).values_list(
+                'exam_id', 'student_id'
+            ),
+            2,
+        )
+        exam = np.searchsorted(self.exam_ids, np.array(exam, dtype=np.int64))
+        student = np.array(student, dtype=np.int64)
+        order = np.lexsort((exam, student))
+        self.enrolled_exam, self.enrolled_student = exam[order], student[order]
+        self.sizes = np.bincount(exam, minlength=self.size)
+        self._build()
+
+    @property
+    def size(self):
+        return len(self.exam_ids)
+
+    def _build(self):
+        exam, student = self.enrolled_exam, self.enrolled_student
+        # Rows are sorted by student: pairs of one student's exams sit ``offset`` rows apart
+        firsts, seconds = [], []
+        offset = 1
+        while offset < len(student):
+            same = student[:-offset] == student[offset:]
+            if not same.any():
+                break
+            firsts.append(exam[:-offset][same])
+            seconds.append(exam[offset:][same])
+            offset += 1
+        first = np.concatenate(firsts) if firsts else np.zeros(0, dtype=np.int64)
+        second = np.concatenate(seconds) if seconds else np.zeros(0, dtype=np.int64)
+
+        pairs, weights = np.unique(first * self.size + second, return_counts=True)
+        rows = np.concatenate([pairs // self.size, pairs % self.size])
+        columns = np.concatenate([pairs % self.size, pairs // self.size])
+        weights = np.concatenate([weights, weights])
+        order = np.argsort(rows, kind='stable')
+        self.indices = columns[order]
+        self.weights = weights[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=self.size))])
+        self.degree = np.bincount(rows, weights=weights, minlength=self.size)
+
+    def neighbours(self, exam):
+        """(exam indices, shared students) of the exams sharing students with ``exam``"""
+        start, end = self.indptr[exam], self.indptr[exam + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def exams_of(self, student_ids):
+        """Indices of the exams any of ``student_ids`` sits"""
+        return np.unique(self.enrolled_exam[np.isin(self.enrolled_student, list(student_ids))])
+
+
+class ExamScheduler:
+    """Slot and room assignment of the exams of a ConflictGraph"""
+
+    def __init__(self, graph, durations, slots, rooms, seed=0):
+        """``durations``: timedelta per exam index; ``rooms``: {name: capacity}"""
+        self.graph = graph
+        self.slots = sorted(slots)
+        self.random = random.Random(seed)
+        n, count = graph.size, len(self.slots)
+
+        self.fits = np.array(
+            [[duration <= slot.length for slot in self.slots] for duration in durations], dtype=bool
+        ).reshape(n, count)
+        self.clash = np.zeros((n, count), dtype=np.int64)  # neighbours (or outside exams) in each slot
+        self.slot_rooms = []
+        for index, slot in enumerate(self.slots):
+            outside = exams_between(slot.start, slot.start + slot.length).exclude(
+                pk__in=graph.exam_ids.tolist()
+            )
+            taken = set(outside.values_list('room', flat=True))
+            self.slot_rooms.append(sorted(
+                ((capacity, name) for name, capacity in rooms.items() if name not in taken), reverse=True
+            ))
+            busy = outside.values_list('students', flat=True)
+            self.clash[graph.exams_of(set(busy) - {None}), index] += 1
+
+        # Consecutive slots of a day
+        self.previous = np.full(count, NO_SLOT)
+        self.next = np.full(count, NO_SLOT)
+        for index in range(1, count):
+            if self.slots[index].start.date() == self.slots[index - 1].start.date():
+                self.previous[index] = index - 1
+                self.next[index - 1] = index
+
+        self.slot_of = np.full(n, UNPLACED)
+        self.members = [[] for _ in range(count)]
+
+    # Feasibility
+
+    def _rooms_fit(self, slot, sizes):
+        capacities = self.slot_rooms[slot]
+        if len(sizes) > len(capacities):
+            return False
+        return all(size <= capacity for size, (capacity, _) in zip(sorted(sizes, reverse=True), capacities))
+
+    def feasible(self, exam, slot):
+        if not self.fits[exam, slot] or self.clash[exam, slot]:
+            return False
+        sizes = self.graph.sizes
+        return self._rooms_fit(slot, [sizes[exam], *(sizes[other] for other in self.members[slot])])
+
+    # Cost: students with this exam and another one in an adjacent slot
+
+    def slot_costs(self, exam):
+        """Back-to-back students ``exam`` would have in every slot"""
+        neighbours, weights = self.graph.neighbours(exam)
+        taken = self.slot_of[neighbours]
+        placed = taken >= 0
+        taken, weights = taken[placed], weights[placed]
+        costs = np.zeros(len(self.slots))
+        for adjacent in (self.previous[taken], self.next[taken]):
+            valid = adjacent >= 0
+            costs += np.bincount(adjacent[valid], weights=weights[valid], minlength=len(self.slots))
+        return costs
+
+    def back_to_back(self):
+        placed = np.flatnonzero(self.slot_of >= 0)
+        return int(sum(self.slot_costs(exam)[self.slot_of[exam]] for exam in placed) // 2)
+
+    def _place(self, exam, slot):
+        old = self.slot_of[exam]
+        neighbours, _ = self.graph.neighbours(exam)
+        if old >= 0:
+            self.members[old].remove(exam)
+            self.clash[neighbours, old] -= 1
+        self.slot_of[exam] = slot
+        self.members[slot].append(exam)
+        self.clash[neighbours, slot] += 1
+
+    # Construction
+
+    def colour(self):
+        """DSatur: place the most constrained exam first, in its cheapest feasible slot"""
+        remaining = set(range(self.graph.size))
+        while remaining:
+            saturation = np.count_nonzero(self.clash, axis=1)
+            exam = max(remaining, key=lambda e: (saturation[e], self.graph.degree[e], self.graph.sizes[e], -e))
+            remaining.discard(exam)
+            costs = self.slot_costs(exam)
+            candidates = [slot for slot in np.argsort(costs, kind='stable') if self.feasible(exam, slot)]
+            if candidates:
+                # Among equally cheap slots, spread exams over the emptiest one
+                best = min(candidates, key=lambda slot: (costs[slot], len(self.members[slot])))
+                self._place(exam, best)
+            else:
+                self._eject(exam)
+
+    def _eject(self, exam):
+        """Place ``exam`` by moving the few exams blocking one of its slots elsewhere"""
+        neighbours, _ = self.graph.neighbours(exam)
+        for slot in np.argsort(self.clash[exam], kind='stable'):
+            if not self.fits[exam, slot] or self.clash[exam, slot] > MAX_EJECTIONS:
+                continue
+            blockers = [int(other) for other in neighbours if self.slot_of[other] == slot]
+            if len(blockers) != self.clash[exam, slot]:
+                continue  # blocked by an exam outside the set
+            if not blockers and not self.feasible(exam, slot):
+                continue  # blocked by the rooms
+            moved = []
+            for other in blockers:
+                target = next(
+                    (target for target in range(len(self.slots)) if target != slot and self.feasible(other, target)),
+                    None,
+                )
+                if target is None:
+                    break
+                self._place(other, target)
+                moved.append(other)
+            if len(moved) == len(blockers) and self.feasible(exam, slot):
+                self._place(exam, slot)
+                return True
+            for other in moved:
+                self._place(other, slot)
+        return False
+
+    # Improvement
+
+    def improve(self, time_limit=TIME_LIMIT, max_moves=None):
+        """Simulated annealing over single-exam moves; keeps the best assignment seen"""
+        placed = [int(exam) for exam in np.flatnonzero(self.slot_of >= 0)]
+        cost = self.back_to_back()
+        if not placed or not cost:
+            return cost
+        best_cost, best = cost, self.slot_of.copy()
+        max_moves = max_moves or MOVES_PER_EXAM * len(placed)
+        # Starts out accepting moves that add a typical shared-student count
+        start_temperature = max(1.0, float(np.median(self.graph.weights)))
+        temperature = start_temperature
+        deadline = time.monotonic() + time_limit
+
+        for move in range(max_moves):
+            if move % 256 == 0:
+                if time.monotonic() > deadline:
+                    break
+                temperature = start_temperature * (1 - move / max_moves) + 1e-3
+            exam = self.random.choice(placed)
+            old = self.slot_of[exam]
+            # Slots without a clash; the exam's own slot is one of them
+            open_slots = np.flatnonzero((self.clash[exam] == 0) & self.fits[exam])
+            if len(open_slots) < 2:
+                continue
+            slot = open_slots[self.random.randrange(len(open_slots))]
+            if slot == old:
+                continue
+            costs = self.slot_costs(exam)
+            delta = costs[slot] - costs[old]
+            if delta > 0 and self.random.random() >= math.exp(-delta / temperature):
+                continue
+            if not self.feasible(exam, slot):
+                continue
+            self._place(exam, slot)
+            cost += delta
+            if cost < best_cost:
+                best_cost, best = cost, self.slot_of.copy()
+                if not best_cost:
+                    break
+
+        for exam in placed:
+            if self.slot_of[exam] != best[exam]:
+                self._place(exam, best[exam])
+        return int(best_cost)
+
+    def rooms(self):
+        """{exam index: room name}: biggest exam first, in the smallest free room seating it"""
+        sizes = self.graph.sizes
+        assigned = {}
+        for slot, members in enumerate(self.members):
+            free = sorted(self.slot_rooms[slot])
+            for exam in sorted(members, key=lambda e: -sizes[e]):
+                position = next(i for i, (capacity, _) in enumerate(free) if capacity >= sizes[exam])
+                assigned[exam] = free.pop(position)[1]
+        return assigned
+
+
+def schedule_exams(exam_ids, slots, rooms, time_limit=TIME_LIMIT, seed=0):
+    """Plan a session; returns {'assignment': {exam pk: (Slot, room)}, 'unplaced', 'back_to_back', ...}"""
+    started = time.perf_counter()
+    graph = ConflictGraph(exam_ids)
+    durations = dict(Exam.objects.filter(pk__in=graph.exam_ids.tolist()).values_list('pk', 'duration'))
+    scheduler = ExamScheduler(graph, [durations[int(pk)] for pk in graph.exam_ids], slots, rooms, seed)
+
+    scheduler.colour()
+    initial = scheduler.back_to_back()
+    final = scheduler.improve(time_limit)
+    rooms_of = scheduler.rooms()
+    return {
+        'assignment': {
+            int(graph.exam_ids[exam]): (scheduler.slots[scheduler.slot_of[exam]], room)
+            for exam, room in rooms_of.items()
+        },
+        'unplaced': [int(graph.exam_ids[exam]) for exam in np.flatnonzero(scheduler.slot_of == UNPLACED)],
+        'students': len(np.unique(graph.enrolled_student)),
+        'conflicts': int(len(graph.weights) // 2),
+        'initial_back_to_back': initial,
+        'back_to_back': final,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def apply_schedule(assignment):
+    """Write a planned assignment to the exams and flag the students' timetables"""
+    exams = list(Exam.objects.filter(pk__in=assignment))
+    for exam in exams:
+        slot, exam.room = assignment[exam.pk]
+        exam.exam_date = slot.start
+    with transaction.atomic():
+        Exam.objects.bulk_update(exams, ['exam_date', 'room'])
+        # bulk_update sends no post_save
+        mark_stale(Exam.students.through.objects.filter(exam__in=assignment).values_list('student_id', flat=True))
+    return len(exams)
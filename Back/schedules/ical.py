@@ -0,0 +1,222 @@
+"""
+iCalendar feed of a student's timetable.
+
+Each student can get a secret feed URL (``Timetable.feed_token``) to subscribe
+to from a phone or desktop calendar. The feed holds the weekly sessions as
+events recurring until the end of the term, the exams, and the deadlines of
+open assignments. It is streamed event by event from chunked querysets.
+Sessions are written in local time (``TIME_ZONE``, defined in a VTIMEZONE
+block over the term) so that they keep their hour across offset changes.
+
+Calendar clients poll every few minutes, so the validators come from the
+student's Timetable row alone: ``version`` is bumped by ``schedules.signals``
+on every change to the student's sessions, exams or assignments, and
+``changed_at`` records when. A poll of an unchanged feed is answered with a
+304 after one lookup on the unique token index.
+"""
+
+import secrets
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Assignment, Exam, Schedule, Timetable
+
+
+CHUNK_SIZE = 500
+PRODID = '-//SmartCampus//Emploi du temps//FR'
+BYDAY = {'MON': 'MO', 'TUE': 'TU', 'WED': 'WE', 'THU': 'TH', 'FRI': 'FR', 'SAT': 'SA'}
+WEEKDAYS = {code: index for index, (code, _) in enumerate(Schedule.DAYS_OF_WEEK)}
+SESSION_TYPES = dict(Schedule.TYPE_CHOICES)
+
+FeedState = namedtuple('FeedState', 'student_id version changed_at')
+
+
+def feed_token(student_id, rotate=False):
+    """Token of a student's feed, created on first use; ``rotate`` revokes the previous URL"""
+    timetable, _ = Timetable.objects.get_or_create(student_id=student_id)
+    if timetable.feed_token and not rotate:
+        return timetable.feed_token
+    token = secrets.token_urlsafe(32)
+    Timetable.objects.filter(pk=student_id).update(feed_token=token)
+    return token
+
+
+def feed_state(token):
+    """FeedState of a token, or None when it is unknown (one indexed lookup)"""
+    row = Timetable.objects.filter(feed_token=token).values_list('student_id', 'version', 'changed_at').first()
+    return FeedState(*row) if row else None
+
+
+def term(today=None):
+    """(first day, last day) of the current term: settings CALENDAR_TERM, else the academic year"""
+    configured = getattr(settings, 'CALENDAR_TERM', None)
+    if configured:
+        return configured
+    today = today or timezone.localdate()
+    year = today.year if today.month >= 9 else today.year - 1
+    return date(year, 9, 1), date(year + 1, 6, 30)
+
+
+def feed_etag(state, current_term):
+    return f'{state.student_id}-{state.version}-{state.changed_at.timestamp():.0f}-{current_term[0]:%Y%m%d}'
+
+
+# Serialization (RFC 5545)
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _line(name, value):
+    """A content line folded at 75 octets"""
+    line = f'{name}:{value}'
+    if len(line.encode()) <= 75:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append(''.join(current))
+            # Continuation lines start with a space
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(day, clock):
+    return f'{day:%Y%m%d}T{clock:%H%M%S}'
+
+
+def _offset(delta):
+    seconds = int(delta.total_seconds())
+    sign, seconds = '-' if seconds < 0 else '+', abs(seconds)
+    text = f'{sign}{seconds // 3600:02d}{seconds % 3600 // 60:02d}'
+    return text + f'{seconds % 60:02d}' if seconds % 60 else text
+
+
+def _observance(zone, onset, before):
+    """STANDARD/DAYLIGHT block of the offset starting at UTC ``onset``; DTSTART is in the offset before it"""
+    local = onset.astimezone(zone)
+    kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+    return ''.join([
+        f'BEGIN:{kind}\r\n',
+        _line('DTSTART', f'{(onset + before).replace(tzinfo=None):%Y%m%dT%H%M%S}'),
+        _line('TZOFFSETFROM', _offset(before)),
+        _line('TZOFFSETTO', _offset(local.utcoffset())),
+        _line('TZNAME', _escape(local.tzname())),
+        f'END:{kind}\r\n',
+    ])
+
+
+@lru_cache(maxsize=8)
+def _vtimezone(name, first_day, last_day):
+    """VTIMEZONE of the default time zone over the term: its offset on the first day, then every change"""
+    zone = timezone.get_default_timezone()
+    moment = datetime.combine(first_day - timedelta(days=1), time(), dt_timezone.utc)
+    end = datetime.combine(last_day + timedelta(days=1), time(), dt_timezone.utc)
+    offset = moment.astimezone(zone).utcoffset()
+    blocks = [_observance(zone, moment, offset)]
+    while moment < end:
+        following = moment + timedelta(hours=1)
+        if following.astimezone(zone).utcoffset() != offset:
+            # The change happened within the hour: narrow it down to the minute
+            low, high = moment, following
+            while high - low > timedelta(minutes=1):
+                middle = low + (high - low) / 2
+                if middle.astimezone(zone).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            blocks.append(_observance(zone, high, offset))
+            offset = high.astimezone(zone).utcoffset()
+        moment = following
+    return ''.join(['BEGIN:VTIMEZONE\r\n', _line('TZID', name), *blocks, 'END:VTIMEZONE\r\n'])
+
+
+def _event(uid, stamp, *lines):
+    return ''.join([
+        'BEGIN:VEVENT\r\n',
+        _line('UID', f'{uid}@smartcampus'),
+        _line('DTSTAMP', stamp),
+        *(_line(name, value) for name, value in lines if value is not None),
+        'END:VEVENT\r\n',
+    ])
+
+
+def iter_feed(student_id, changed_at, current_term=None):
+    """Lines of a student's calendar, one event per chunk"""
+    first_day, last_day = current_term or term()
+    tz = settings.TIME_ZONE
+    stamp = _utc(changed_at)
+    until = _utc(timezone.make_aware(datetime.combine(last_day, time.max)))
+
+    yield ''.join([
+        'BEGIN:VCALENDAR\r\n',
+        'VERSION:2.0\r\n',
+        _line('PRODID', PRODID),
+        'CALSCALE:GREGORIAN\r\n',
+        'METHOD:PUBLISH\r\n',
+        _line('X-WR-CALNAME', 'Emploi du temps'),
+        _line('X-WR-TIMEZONE', tz),
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M\r\n',
+        'X-PUBLISHED-TTL:PT15M\r\n',
+        # Every TZID used by the events needs its definition (RFC 5545 3.2.19)
+        _vtimezone(tz, first_day, last_day),
+    ])
+
+    sessions = Schedule.objects.filter(students=student_id).values_list(
+        'pk', 'day_of_week', 'start_time', 'end_time', 'room', 'type', 'course__code', 'course__name',
+        'course__professor',
+    )
+    for pk, day, start, end, room, session_type, code, name, professor in sessions.iterator(CHUNK_SIZE):
+        first = first_day + timedelta(days=(WEEKDAYS[day] - first_day.weekday()) % 7)
+        yield _event(
+            f'schedule-{pk}', stamp,
+            (f'DTSTART;TZID={tz}', _local(first, start)),
+            (f'DTEND;TZID={tz}', _local(first, end)),
+            ('RRULE', f'FREQ=WEEKLY;BYDAY={BYDAY[day]};UNTIL={until}'),
+            ('SUMMARY', _escape(f'{name} ({SESSION_TYPES.get(session_type, session_type)})')),
+            ('LOCATION', _escape(room) if room else None),
+            ('DESCRIPTION', _escape(f'{code} - {professor}')),
+        )
+
+    exams = Exam.objects.filter(students=student_id).values_list(
+        'pk', 'title', 'exam_date', 'duration', 'room', 'instructions', 'course__name'
+    )
+    for pk, title, exam_date, duration, room, instructions, course in exams.iterator(CHUNK_SIZE):
+        yield _event(
+            f'exam-{pk}', stamp,
+            ('DTSTART', _utc(exam_date)),
+            ('DTEND', _utc(exam_date + duration)),
+            ('SUMMARY', _escape(f'Examen: {title} - {course}')),
+            ('LOCATION', _escape(room) if room else None),
+            ('DESCRIPTION', _escape(instructions) if instructions else None),
+        )
+
+    assignments = Assignment.objects.filter(student=student_id, is_completed=False).values_list(
+        'pk', 'title', 'due_date', 'description', 'course__name'
+    )
+    for pk, title, due_date, description, course in assignments.iterator(CHUNK_SIZE):
+        # No DTEND: the event is the deadline itself
+        yield _event(
+            f'assignment-{pk}', stamp,
+            ('DTSTART', _utc(due_date)),
+            ('SUMMARY', _escape(f'À rendre: {title} - {course}')),
+            ('DESCRIPTION', _escape(description) if description else None),
+        )
+
+    yield 'END:VCALENDAR\r\n'
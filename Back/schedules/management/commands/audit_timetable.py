@@ -0,0 +1,58 @@
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schedules.conflicts import audit
+from schedules.models import Exam, Schedule
+
+
+class Command(BaseCommand):
+    help = 'Report every room and student conflict of the weekly timetable and of the exams of a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First exam date to check, YYYY-MM-DD (default: all exams)')
+        parser.add_argument('--to', dest='date_to', help='Last exam date to check')
+        parser.add_argument('--limit', type=int, default=50, help='Conflicts listed (0: summary only)')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError:
+            raise CommandError('Date invalide (format attendu: AAAA-MM-JJ)')
+
+        start = time.perf_counter()
+        conflicts = audit(date_from, date_to)
+        elapsed = time.perf_counter() - start
+
+        listed = conflicts[:options['limit']]
+        labels = self._labels(listed)
+        for conflict in listed:
+            where = f'salle {conflict.key}' if conflict.kind == 'room' else f'étudiant {conflict.key}'
+            self.stdout.write(f'{where}: {labels[conflict.first]} / {labels[conflict.second]}')
+        if len(conflicts) > len(listed):
+            self.stdout.write(f'... {len(conflicts) - len(listed)} autres')
+
+        counts = Counter(conflict.kind for conflict in conflicts)
+        style = self.style.WARNING if conflicts else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{counts['room']} conflits de salle, {counts['student']} conflits d'étudiants "
+            f"(analyse en {elapsed:.2f}s)"
+        ))
+
+    @staticmethod
+    def _labels(conflicts):
+        refs = {ref for conflict in conflicts for ref in (conflict.first, conflict.second)}
+        labels = {}
+        sessions = Schedule.objects.filter(pk__in=[pk for kind, pk in refs if kind == 'schedule'])
+        for pk, code, day, start, end in sessions.values_list(
+            'pk', 'course__code', 'day_of_week', 'start_time', 'end_time'
+        ):
+            labels['schedule', pk] = f'{code} {day} {start:%H:%M}-{end:%H:%M}'
+        exams = Exam.objects.filter(pk__in=[pk for kind, pk in refs if kind == 'exam'])
+        for pk, code, title, exam_date in exams.values_list('pk', 'course__code', 'title', 'exam_date'):
+            labels['exam', pk] = f'{code} {title} ({timezone.localtime(exam_date):%d/%m/%Y %H:%M})'
+        return labels
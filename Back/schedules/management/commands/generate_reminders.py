@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from schedules.reminders import HORIZON, generate_reminders
+
+
+class Command(BaseCommand):
+    help = 'Create the reminders of upcoming assignments and exams (e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=HORIZON.days, help='How far ahead to look')
+
+    def handle(self, *args, **options):
+        report = generate_reminders(horizon=timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} rappels créés, {report['moved']} déplacés, {report['removed']} supprimés"
+        ))
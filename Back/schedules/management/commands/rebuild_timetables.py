@@ -0,0 +1,29 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from schedules.models import Exam, Schedule, Timetable
+from schedules.timetable import build_timetables
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stale student timetables, including those built on an earlier day (all of them with --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every timetable, not only stale ones')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['all']:
+            student_ids = (
+                set(Schedule.students.through.objects.values_list('student_id', flat=True))
+                | set(Exam.students.through.objects.values_list('student_id', flat=True))
+                | set(Timetable.objects.values_list('student_id', flat=True))
+            )
+        else:
+            student_ids = set(Timetable.objects.filter(Timetable.stale_q()).values_list('student_id', flat=True))
+
+        remaining = iter(sorted(student_ids))
+        while chunk := list(islice(remaining, options['chunk_size'])):
+            build_timetables(chunk)
+        self.stdout.write(self.style.SUCCESS(f'{len(student_ids)} emplois du temps reconstruits'))
@@ -0,0 +1,74 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from schedules.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Plan an exam session: a slot and a room for every exam, no student sitting two exams at once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First day of the session (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=10, help='Length of the session in days (Sundays skipped)')
+        parser.add_argument('--times', default='09:00,14:00', help='Start times of the slots of a day')
+        parser.add_argument('--slot-hours', type=float, default=3, help='Length of a slot')
+        parser.add_argument('--rooms', required=True, help='Rooms and capacities, e.g. A101:120,B202:40')
+        parser.add_argument('--type', dest='exam_type', help='Only exams of this type (e.g. FINAL)')
+        parser.add_argument('--ids', help='Only these exam ids (comma separated)')
+        parser.add_argument('--time-limit', type=float, default=30, help='Seconds of local search')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--apply', action='store_true', help='Write the dates and rooms to the exams')
+
+    def handle(self, *args, **options):
+        from schedules.exam_scheduler import Slot, apply_schedule, schedule_exams
+
+        try:
+            first_day = date.fromisoformat(options['start'])
+            times = [time.fromisoformat(value.strip()) for value in options['times'].split(',')]
+            rooms = {}
+            for value in options['rooms'].split(','):
+                name, capacity = value.rsplit(':', 1)
+                rooms[name.strip()] = int(capacity)
+                if rooms[name.strip()] <= 0:
+                    raise ValueError(f'capacité de {name.strip()} nulle')
+            ids = [int(pk) for pk in options['ids'].split(',')] if options['ids'] else None
+        except ValueError as exc:
+            raise CommandError(f'Paramètre invalide: {exc}')
+
+        length = timedelta(hours=options['slot_hours'])
+        slots = [
+            Slot(timezone.make_aware(datetime.combine(day, start)), length)
+            for day in (first_day + timedelta(days=offset) for offset in range(options['days']))
+            if day.weekday() != 6
+            for start in times
+        ]
+
+        exams = Exam.objects.all()
+        if options['exam_type']:
+            exams = exams.filter(type=options['exam_type'])
+        if ids is not None:
+            exams = exams.filter(pk__in=ids)
+        exam_ids = list(exams.values_list('pk', flat=True))
+        if not exam_ids:
+            raise CommandError('Aucun examen à planifier')
+
+        result = schedule_exams(exam_ids, slots, rooms, options['time_limit'], options['seed'])
+        for pk, (slot, room) in sorted(result['assignment'].items(), key=lambda item: (item[1][0], item[1][1])):
+            self.stdout.write(f'{timezone.localtime(slot.start):%d/%m/%Y %H:%M}  {room:<10} examen {pk}')
+        self.stdout.write(
+            f"{len(exam_ids)} examens, {result['students']} étudiants, {result['conflicts']} paires en conflit; "
+            f"enchaînements: {result['initial_back_to_back']} -> {result['back_to_back']} "
+            f"({result['seconds']:.1f}s)"
+        )
+        if result['unplaced']:
+            self.stdout.write(self.style.ERROR(
+                f"{len(result['unplaced'])} examens sans créneau ni salle possible: "
+                + ', '.join(map(str, result['unplaced']))
+            ))
+        if options['apply']:
+            if result['unplaced']:
+                raise CommandError('Planning incomplet: rien n\'a été enregistré')
+            updated = apply_schedule(result['assignment'])
+            self.stdout.write(self.style.SUCCESS(f'{updated} examens planifiés'))
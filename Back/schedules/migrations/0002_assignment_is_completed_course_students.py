@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedules', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='is_completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='students',
+            field=models.ManyToManyField(blank=True, related_name='courses', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
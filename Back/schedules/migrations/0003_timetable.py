@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_image_renditions'),
+        ('schedules', '0002_assignment_is_completed_course_students'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timetable',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('payload', models.TextField(blank=True)),
+                ('etag', models.CharField(blank=True, max_length=32)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('built_version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
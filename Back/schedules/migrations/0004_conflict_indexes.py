@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0003_timetable'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['room', 'exam_date'], name='schedules_e_room_44238f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['day_of_week', 'room', 'start_time'], name='schedules_s_day_of__d95ce2_idx'),
+        ),
+    ]
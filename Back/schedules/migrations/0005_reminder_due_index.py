@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0004_conflict_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['remind_at'], name='reminder_due_idx'),
+        ),
+    ]
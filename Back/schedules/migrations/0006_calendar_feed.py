@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0005_reminder_due_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetable',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='timetable',
+            name='feed_token',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0006_calendar_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetable',
+            name='built_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
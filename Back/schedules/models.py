@@ -1,5 +1,8 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Q
 from django.conf import settings
+from django.utils import timezone
 
 
 class Course(models.Model):
@@ -62,9 +65,21 @@ class Schedule(models.Model):
     
     class Meta:
         ordering = ['day_of_week', 'start_time']
+        indexes = [
+            # Conflict checks: sessions of a room on a day, by start time
+            models.Index(fields=['day_of_week', 'room', 'start_time']),
+        ]
     
     def __str__(self):
         return f"{self.course.name} - {self.get_day_of_week_display()} {self.start_time}"
+    
+    def clean(self):
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError({'end_time': "L'heure de fin doit être après l'heure de début"})
+        if not (self.day_of_week and self.start_time and self.end_time):
+            return
+        from .conflicts import clash_errors, schedule_conflicts
+        clash_errors(schedule_conflicts(self))
 
 
 class Assignment(models.Model):
@@ -118,8 +133,21 @@ class Exam(models.Model):
     instructions = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'exam_date']),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.course.name}"
+    
+    def clean(self):
+        if self.duration is not None and self.duration.total_seconds() <= 0:
+            raise ValidationError({'duration': 'La durée doit être positive'})
+        if self.exam_date is None or self.duration is None:
+            return
+        from .conflicts import clash_errors, exam_conflicts
+        clash_errors(exam_conflicts(self))
 
 
 class Reminder(models.Model):
@@ -144,5 +172,46 @@ class Reminder(models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, null=True, blank=True)
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Due reminders polled by dashboard.reminders
+            models.Index(fields=['remind_at'], condition=models.Q(is_sent=False), name='reminder_due_idx'),
+        ]
+    
     def __str__(self):
         return f"Rappel: {self.title} pour {self.student.username}"
+
+
+class Timetable(models.Model):
+    """Precomputed weekly timetable of a student, built by schedules.timetable"""
+    student = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    payload = models.TextField(blank=True)  # Serialized JSON served as-is
+    etag = models.CharField(max_length=32, blank=True)
+    # Bumped by schedules.signals on every change; the payload is fresh while both match
+    version = models.PositiveIntegerField(default=0)
+    built_version = models.PositiveIntegerField(default=0)
+    # Local day of the build: the payload leaves out the exams of earlier days
+    built_on = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    changed_at = models.DateTimeField(default=timezone.now)  # Last version bump
+    # Secret of the student's iCalendar feed (schedules.ical)
+    feed_token = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    
+    def __str__(self):
+        return f"Emploi du temps de {self.student_id}"
+    
+    # A timetable is stale when never built, changed since its build, or built on
+    # an earlier day (its exam list starts at the day of the build)
+    @property
+    def is_stale(self):
+        return not self.etag or self.version != self.built_version or self.built_on != timezone.localdate()
+    
+    @classmethod
+    def stale_q(cls):
+        """``is_stale`` as a filter"""
+        return (
+            Q(etag='') | ~Q(version=F('built_version'))
+            | Q(built_on=None) | ~Q(built_on=timezone.localdate())
+        )
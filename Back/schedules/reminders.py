@@ -0,0 +1,114 @@
+"""
+Reminders of assignments and exams.
+
+``generate_reminders`` creates the ``Reminder`` rows of the open assignments
+and of the exams due within a horizon, one per assignment and one per
+(exam, student), ``REMINDER_LEADS`` ahead of the due time. Reruns only add
+what is missing, move unsent reminders whose due time changed and drop unsent
+ones that no longer apply (assignment completed, student removed from the
+exam). ``dashboard.reminders`` delivers them.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from dashboard.reminders import ReminderSource, register
+
+from .models import Assignment, Exam, Reminder
+
+
+LEADS = getattr(settings, 'REMINDER_LEADS', {'ASSIGNMENT': timedelta(days=1), 'EXAM': timedelta(days=2)})
+HORIZON = timedelta(days=getattr(settings, 'REMINDER_HORIZON_DAYS', 14))
+
+
+@register
+class ScheduleReminder(ReminderSource):
+    name = 'reminder'
+    model = Reminder
+
+
+def _assignment_text(title, course, due):
+    return f'Devoir à rendre: {title}', f'{course}: à rendre le {timezone.localtime(due):%d/%m/%Y à %H:%M}'
+
+
+def _exam_text(title, course, exam_date, room):
+    start = timezone.localtime(exam_date)
+    return f'Examen: {title}', f'{course}: le {start:%d/%m/%Y à %H:%M}, salle {room}'
+
+
+def _sync(reminder_type, expected, existing, now, report):
+    """Create the missing reminders and move the unsent ones whose due time changed
+
+    ``expected``: {key: (student_id, reference fields, due, title, message)};
+    ``existing``: {key: (pk, remind_at, is_sent)}.
+    """
+    lead = LEADS[reminder_type]
+    created, moved = [], []
+    for key, (student_id, references, due, title, message) in expected.items():
+        remind_at = max(due - lead, now)
+        current = existing.get(key)
+        if current is None:
+            created.append(Reminder(
+                student_id=student_id, reminder_type=reminder_type, title=title, message=message,
+                remind_at=remind_at, **references,
+            ))
+        elif not current[2] and current[1] != remind_at and max(current[1], remind_at) > now:
+            # Unsent and due at another time (both already due counts as unchanged)
+            moved.append(Reminder(pk=current[0], remind_at=remind_at, title=title, message=message))
+    Reminder.objects.bulk_create(created, batch_size=1000)
+    Reminder.objects.bulk_update(moved, ['remind_at', 'title', 'message'], batch_size=1000)
+    report['created'] += len(created)
+    report['moved'] += len(moved)
+
+
+def generate_reminders(now=None, horizon=HORIZON):
+    """Create or update the reminders of the assignments and exams due within ``horizon``"""
+    now = now or timezone.now()
+    window = {'gt': now, 'lte': now + horizon}
+    report = {'created': 0, 'moved': 0, 'removed': 0}
+
+    assignments = Assignment.objects.filter(
+        is_completed=False, **{f'due_date__{lookup}': value for lookup, value in window.items()}
+    )
+    expected = {
+        pk: (student_id, {'assignment_id': pk}, due, *_assignment_text(title, course, due))
+        for pk, student_id, title, course, due in assignments.values_list(
+            'pk', 'student_id', 'title', 'course__name', 'due_date'
+        )
+    }
+    existing = {
+        assignment_id: (pk, remind_at, is_sent)
+        for pk, assignment_id, remind_at, is_sent in Reminder.objects.filter(
+            reminder_type='ASSIGNMENT', assignment__in=assignments
+        ).values_list('pk', 'assignment_id', 'remind_at', 'is_sent')
+    }
+    _sync('ASSIGNMENT', expected, existing, now, report)
+
+    exams = Exam.objects.filter(**{f'exam_date__{lookup}': value for lookup, value in window.items()})
+    seats = Exam.students.through.objects.filter(exam__in=exams).values_list(
+        'exam_id', 'student_id', 'exam__title', 'exam__course__name', 'exam__exam_date', 'exam__room'
+    )
+    expected = {
+        (exam_id, student_id): (
+            student_id, {'exam_id': exam_id}, exam_date, *_exam_text(title, course, exam_date, room)
+        )
+        for exam_id, student_id, title, course, exam_date, room in seats
+    }
+    existing = {
+        (exam_id, student_id): (pk, remind_at, is_sent)
+        for pk, exam_id, student_id, remind_at, is_sent in Reminder.objects.filter(
+            reminder_type='EXAM', exam__in=exams
+        ).values_list('pk', 'exam_id', 'student_id', 'remind_at', 'is_sent')
+    }
+    _sync('EXAM', expected, existing, now, report)
+
+    report['removed'] += Reminder.objects.filter(
+        is_sent=False, reminder_type='ASSIGNMENT', assignment__is_completed=True
+    ).delete()[0]
+    report['removed'] += Reminder.objects.filter(is_sent=False, reminder_type='EXAM', exam__isnull=False).exclude(
+        Exists(Exam.students.through.objects.filter(exam=OuterRef('exam'), student=OuterRef('student')))
+    ).delete()[0]
+    return report
@@ -0,0 +1,80 @@
+"""
+Staleness tracking for the precomputed timetables of schedules.timetable.
+
+Removals are recorded after the rows are gone (post_delete, post_remove,
+post_clear) so a rebuild running concurrently cannot pick up the old data
+after the timetable was flagged. Students added to a session or an exam are
+checked for clashes first (``schedules.conflicts``).
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .conflicts import clash_errors, exam_conflicts, schedule_conflicts
+from .models import Assignment, Course, Exam, Schedule
+from .timetable import mark_stale
+
+
+def check_new_students(sender, instance, reverse, pk_set):
+    """Refuse students whose sessions or exams clash with the ones they are added to"""
+    model = Schedule if sender is Schedule.students.through else Exam
+    check = schedule_conflicts if model is Schedule else exam_conflicts
+    entries = model.objects.filter(pk__in=pk_set) if reverse else [instance]
+    student_ids = [instance.pk] if reverse else list(pk_set)
+    for entry in entries:
+        clash_errors(check(entry, student_ids))
+
+
+def _students(instance):
+    return list(instance.students.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=Exam)
+def timetable_entry_saved(sender, instance, created, **kwargs):
+    # New rows have no students yet; adding them flags the timetables
+    if not created:
+        mark_stale(_students(instance))
+
+
+@receiver(pre_delete, sender=Schedule)
+@receiver(pre_delete, sender=Exam)
+def remember_timetable_students(sender, instance, **kwargs):
+    instance._timetable_students = _students(instance)
+
+
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=Exam)
+def timetable_entry_deleted(sender, instance, **kwargs):
+    mark_stale(getattr(instance, '_timetable_students', []))
+
+
+@receiver(m2m_changed, sender=Schedule.students.through)
+@receiver(m2m_changed, sender=Exam.students.through)
+def timetable_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_add':
+        check_new_students(sender, instance, reverse, pk_set)
+    elif action == 'pre_clear':
+        instance._timetable_students = [instance.pk] if reverse else _students(instance)
+    elif action == 'post_clear':
+        mark_stale(getattr(instance, '_timetable_students', []))
+    elif action in ('post_add', 'post_remove'):
+        mark_stale([instance.pk] if reverse else pk_set)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, **kwargs):
+    if not created:
+        mark_stale(
+            set(Schedule.students.through.objects.filter(schedule__course=instance).values_list('student_id', flat=True))
+            | set(Exam.students.through.objects.filter(exam__course=instance).values_list('student_id', flat=True))
+            | set(Assignment.objects.filter(course=instance).values_list('student_id', flat=True))
+        )
+
+
+# Assignments are not in the timetable payload but are in the calendar feed,
+# whose validators follow Timetable.version
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def assignment_changed(sender, instance, **kwargs):
+    mark_stale([instance.student_id])
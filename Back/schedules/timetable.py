@@ -0,0 +1,146 @@
+"""
+Precomputed weekly timetables.
+
+A student's week (sessions grouped by day, upcoming exams and the courses they
+refer to) is stored as one serialized JSON payload in ``Timetable`` with the
+MD5 of its content as ETag. ``schedules.signals`` bumps ``Timetable.version``
+of the students affected by a change, and a timetable built on an earlier day
+is out of date too, since its exam list starts at that day
+(``Timetable.is_stale``). A stale timetable is rebuilt on its next fetch, and
+``python manage.py rebuild_timetables`` rebuilds them in bulk (daily, and
+ahead of the start of a semester).
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Course, Exam, Schedule, Timetable
+
+
+DAYS = [code for code, _ in Schedule.DAYS_OF_WEEK]
+
+
+def mark_stale(student_ids):
+    """Flag the timetables of the given students for a rebuild"""
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+    Timetable.objects.bulk_create([Timetable(student_id=pk) for pk in student_ids], ignore_conflicts=True)
+    Timetable.objects.filter(student__in=student_ids).update(version=F('version') + 1, changed_at=timezone.now())
+
+
+def _by_student(through, field, student_ids, **filters):
+    grouped = defaultdict(list)
+    rows = through.objects.filter(student_id__in=student_ids, **filters).values_list('student_id', field)
+    for student_id, pk in rows:
+        grouped[student_id].append(pk)
+    return grouped
+
+
+def build_timetables(student_ids, today=None):
+    """Rebuild and store the timetables of the given students; returns {student_id: (etag, payload)}"""
+    student_ids = set(student_ids)
+    today = today or timezone.localdate()
+    versions = dict(Timetable.objects.filter(student__in=student_ids).values_list('student_id', 'version'))
+
+    schedule_ids = _by_student(Schedule.students.through, 'schedule_id', student_ids)
+    exam_ids = _by_student(
+        Exam.students.through, 'exam_id', student_ids,
+        exam__exam_date__gte=timezone.make_aware(datetime.combine(today, time.min)),
+    )
+
+    sessions = {
+        pk: {
+            'id': pk,
+            'course': course_id,
+            'start': start.strftime('%H:%M'),
+            'end': end.strftime('%H:%M'),
+            'room': room,
+            'type': session_type,
+            'day': day,
+        }
+        for pk, course_id, day, start, end, room, session_type in Schedule.objects.filter(
+            pk__in={pk for pks in schedule_ids.values() for pk in pks}
+        ).values_list('pk', 'course_id', 'day_of_week', 'start_time', 'end_time', 'room', 'type')
+    }
+    exams = {
+        pk: {
+            'id': pk,
+            'course': course_id,
+            'title': title,
+            'start': timezone.localtime(exam_date).isoformat(),
+            'minutes': int(duration.total_seconds() // 60),
+            'room': room,
+            'type': exam_type,
+        }
+        for pk, course_id, title, exam_date, duration, room, exam_type in Exam.objects.filter(
+            pk__in={pk for pks in exam_ids.values() for pk in pks}
+        ).values_list('pk', 'course_id', 'title', 'exam_date', 'duration', 'room', 'type')
+    }
+    courses = {
+        pk: {'code': code, 'name': name, 'professor': professor}
+        for pk, code, name, professor in Course.objects.filter(
+            pk__in={item['course'] for item in (*sessions.values(), *exams.values())}
+        ).values_list('pk', 'code', 'name', 'professor')
+    }
+
+    built = {}
+    rows = []
+    for student_id in student_ids:
+        days = {day: [] for day in DAYS}
+        for pk in schedule_ids.get(student_id, ()):
+            session = sessions[pk]
+            days[session['day']].append({key: value for key, value in session.items() if key != 'day'})
+        for day_sessions in days.values():
+            day_sessions.sort(key=lambda session: (session['start'], session['id']))
+        student_exams = sorted((exams[pk] for pk in exam_ids.get(student_id, ())), key=lambda exam: exam['start'])
+        used = {session['course'] for day in days.values() for session in day} | {exam['course'] for exam in student_exams}
+
+        payload = json.dumps(
+            {
+                'days': days,
+                'exams': student_exams,
+                'courses': {str(pk): courses[pk] for pk in sorted(used) if pk in courses},
+            },
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
+        etag = hashlib.md5(payload.encode()).hexdigest()
+        built[student_id] = (etag, payload)
+        version = versions.get(student_id, 0)
+        rows.append(Timetable(
+            student_id=student_id, payload=payload, etag=etag, version=version, built_version=version,
+            built_on=today,
+        ))
+
+    # Only built_version is written back, so a change made during the build keeps the row stale
+    Timetable.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=['payload', 'etag', 'built_version', 'built_on', 'updated_at'],
+    )
+    return built
+
+
+def current_etag(student_id):
+    """ETag of a student's timetable, rebuilding it first when stale"""
+    timetable = Timetable.objects.filter(student_id=student_id).only(
+        'etag', 'version', 'built_version', 'built_on'
+    ).first()
+    if timetable is not None and not timetable.is_stale:
+        return timetable.etag
+    return build_timetables([student_id])[student_id][0]
+
+
+def load_timetable(student_id):
+    """(etag, payload) of a student's timetable, rebuilding it first when stale"""
+    timetable = Timetable.objects.filter(student_id=student_id).first()
+    if timetable is not None and not timetable.is_stale:
+        return timetable.etag, timetable.payload
+    return build_timetables([student_id])[student_id]
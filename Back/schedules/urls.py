@@ -1,5 +1,9 @@
 from django.urls import path
 
+from . import views
+
 urlpatterns = [
-    # URLs will be added as we implement views
+    path('timetable/', views.timetable, name='timetable'),
+    path('calendar/', views.calendar_link, name='calendar_link'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
 ]
@@ -1,3 +1,71 @@
-from django.shortcuts import render
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import condition, require_safe
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from .ical import feed_etag, feed_state, feed_token, iter_feed, term
+from .timetable import current_etag, load_timetable
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def timetable(request):
+    """Weekly timetable of the current user; revalidate with If-None-Match"""
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if if_none_match:
+        etag = quote_etag(current_etag(request.user.pk))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+    etag, payload = load_timetable(request.user.pk)
+    response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = quote_etag(etag)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def calendar_link(request):
+    """Subscription URL of the current user's calendar feed; POST replaces it"""
+    token = feed_token(request.user.pk, rotate=request.method == 'POST')
+    return Response({'url': request.build_absolute_uri(reverse('calendar_feed', args=[token]))})
+
+
+def _feed(request, token):
+    # Shared by the validators and the view: a request costs one lookup
+    if not hasattr(request, '_calendar_feed'):
+        request._calendar_feed = feed_state(token)
+        request._calendar_term = term()
+    return request._calendar_feed
+
+
+def _feed_etag(request, token):
+    state = _feed(request, token)
+    return feed_etag(state, request._calendar_term) if state else None
+
+
+def _feed_last_modified(request, token):
+    state = _feed(request, token)
+    return state.changed_at if state else None
+
+
+@require_safe
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def calendar_feed(request, token):
+    """iCalendar feed of a student, authenticated by the token in its URL (calendar clients send no credentials)"""
+    state = _feed(request, token)
+    if state is None:
+        raise Http404
+    response = StreamingHttpResponse(
+        iter_feed(state.student_id, state.changed_at, request._calendar_term),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'inline; filename="emploi-du-temps.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
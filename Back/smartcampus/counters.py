@@ -0,0 +1,15 @@
+"""
+Denormalized counters maintained with conditional UPDATEs (budget totals,
+transport seats).
+
+A full ``save()`` of an instance loaded before such an UPDATE would write the
+stale value back, so models holding counters save every other field instead.
+"""
+
+
+def fields_without_counters(instance, counters):
+    """Concrete fields of ``instance`` to save, leaving ``counters`` to their UPDATEs"""
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counters
+    ]
@@ -0,0 +1,233 @@
+"""
+Background processing of uploaded images.
+
+An ImageField registered with ``register_image_field`` gets two sibling
+fields, ``<field>_small`` and ``<field>_thumb``, plus ``<field>_width`` and
+``<field>_height``. When a new file is saved the request returns at once; after
+the transaction commits a pool thread
+
+- re-encodes the original in place, capped at ``IMAGE_MAX_SIZE`` pixels, with
+  its EXIF orientation applied and every EXIF tag (GPS included) dropped,
+- writes the small and thumbnail renditions (WebP, or JPEG when Pillow lacks
+  WebP support),
+- records them and the dimensions with one conditional UPDATE, so an image
+  replaced meanwhile is left alone.
+
+The sanitized original is saved under a new name and the row switched to it
+by the same UPDATE; the upload is deleted only then, so the row never points
+at a missing file. Saves of an instance loaded before the pool finished carry
+the new name and the renditions over instead of reverting them.
+
+``python manage.py process_images`` picks up images whose processing was lost
+(e.g. a restart with work still queued).
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+IMAGE_MAX_SIZE = getattr(settings, 'IMAGE_MAX_SIZE', 2048)
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 82)
+RENDITION_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+# Formats an original is re-encoded in; anything else becomes JPEG
+ORIGINAL_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF', 'BMP', 'TIFF'}
+
+# (model, field name) -> {rendition: longest side in pixels}
+_registry = {}
+_pool = None
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='images')
+    return _pool
+
+
+def _encode(image, size, image_format):
+    """Bytes of ``image`` downscaled to fit ``size`` pixels, without metadata"""
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image_format in ('JPEG', 'BMP') and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    output = BytesIO()
+    image.save(output, image_format, quality=IMAGE_QUALITY, optimize=image_format == 'JPEG')
+    return image.size, output.getvalue()
+
+
+def _file_fields(field_name):
+    return (field_name, f'{field_name}_small', f'{field_name}_thumb')
+
+
+def _managed_fields(field_name):
+    """Fields written by the pool"""
+    return (f'{field_name}_small', f'{field_name}_thumb', f'{field_name}_width', f'{field_name}_height')
+
+
+def _delete(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete %s', name)
+
+
+def process_image(model, pk, field_name):
+    """Sanitize the original image of one row and write its renditions"""
+    renditions = _registry[model, field_name]
+    instance = model.objects.filter(pk=pk).first()
+    source = getattr(instance, field_name, None)
+    if not source:
+        return False
+
+    storage = source.storage
+    uploaded = source.name
+    stem = os.path.splitext(os.path.basename(uploaded))[0]
+    with storage.open(uploaded, 'rb') as stream, Image.open(stream) as image:
+        original_format = image.format if image.format in ORIGINAL_FORMATS else 'JPEG'
+        image = ImageOps.exif_transpose(image)
+        (width, height), original = _encode(image, IMAGE_MAX_SIZE, original_format)
+        encoded = {
+            name: _encode(image, size, RENDITION_FORMAT)[1] for name, size in renditions.items()
+        }
+
+    # Next to the upload, under a name of its own: the upload stays until the row moves off it
+    names = {field_name: storage.save(uploaded, ContentFile(original))}
+    for name, content in encoded.items():
+        rendition_field = model._meta.get_field(f'{field_name}_{name}')
+        filename = rendition_field.generate_filename(instance, f'{stem}{EXTENSIONS[RENDITION_FORMAT]}')
+        names[f'{field_name}_{name}'] = storage.save(filename, ContentFile(content))
+
+    updated = model.objects.filter(pk=pk, **{field_name: uploaded}).update(
+        **names, **{f'{field_name}_width': width, f'{field_name}_height': height}
+    )
+    if not updated:
+        # A newer upload replaced the image while this one was processed
+        _delete(storage, names.values())
+        return False
+    _delete(storage, [uploaded])
+    return True
+
+
+def _run(model, pk, field_name):
+    try:
+        process_image(model, pk, field_name)
+    except Exception:
+        logger.exception('Processing %s.%s of %s failed', model.__name__, field_name, pk)
+    finally:
+        connection.close()
+
+
+def schedule(model, pk, field_name):
+    """Process an image in the pool once the current transaction commits"""
+    transaction.on_commit(lambda: _executor().submit(_run, model, pk, field_name))
+
+
+def pending(model, field_name):
+    """Rows with an image whose renditions have not been written yet"""
+    return model.objects.exclude(**{field_name: ''}).filter(**{f'{field_name}_small': ''})
+
+
+def image_urls(instance, field_name, request=None):
+    """URLs and dimensions of an image; ``url`` is the small rendition once it exists"""
+    def url(name):
+        file = getattr(instance, name)
+        if not file:
+            return None
+        return request.build_absolute_uri(file.url) if request is not None else file.url
+
+    original = url(field_name)
+    small = url(f'{field_name}_small')
+    return {
+        'url': small or original,
+        'thumbnail': url(f'{field_name}_thumb') or small or original,
+        'original': original,
+        'width': getattr(instance, f'{field_name}_width'),
+        'height': getattr(instance, f'{field_name}_height'),
+    }
+
+
+def register_image_field(model, field_name, **renditions):
+    """Process new uploads of ``model.field_name`` in the background (renditions: small, thumb)"""
+    _registry[model, field_name] = renditions
+    uid = f'images:{model._meta.label}.{field_name}'
+    previous_attr = f'_previous_{field_name}_files'
+    loaded_attr = f'_loaded_{field_name}'
+    written = {field_name, *_managed_fields(field_name)}
+
+    def remember_loaded(sender, instance, **kwargs):
+        # Read from __dict__: a deferred field must not cost a query
+        value = instance.__dict__.get(field_name)
+        setattr(instance, loaded_attr, getattr(value, 'name', value))
+
+    def untouched(update_fields):
+        return update_fields is not None and not written.intersection(update_fields)
+
+    def remember_previous(sender, instance, update_fields=None, **kwargs):
+        if untouched(update_fields):
+            return
+        previous = None
+        if not instance._state.adding:
+            previous = model.objects.filter(pk=instance.pk).values_list(
+                *_file_fields(field_name), *_managed_fields(field_name)
+            ).first()
+        current = getattr(instance, field_name).name
+        if previous is not None and current in (previous[0], getattr(instance, loaded_attr, None)):
+            # Same image: keep what the pool wrote since this instance was loaded (its new name included)
+            setattr(instance, field_name, previous[0])
+            for name, value in zip(_managed_fields(field_name), previous[3:]):
+                setattr(instance, name, value)
+        setattr(instance, previous_attr, previous and previous[:3])
+
+    def image_saved(sender, instance, update_fields=None, **kwargs):
+        setattr(instance, loaded_attr, getattr(instance, field_name).name)
+        if untouched(update_fields):
+            return
+        previous = getattr(instance, previous_attr, None)
+        current = getattr(instance, field_name)
+        if previous is None:
+            if not current:
+                return
+        elif previous[0] == current.name:
+            return
+        if previous is not None:
+            storage = current.storage
+            stale = [name for name in previous if name and name != current.name]
+            transaction.on_commit(lambda: _delete(storage, stale))
+        # Renditions of the previous image no longer apply
+        cleared = dict(zip(_managed_fields(field_name), ('', '', None, None)))
+        model.objects.filter(pk=instance.pk).update(**cleared)
+        for name, value in cleared.items():
+            setattr(instance, name, value)
+        if current:
+            schedule(model, instance.pk, field_name)
+
+    def image_deleted(sender, instance, **kwargs):
+        storage = getattr(instance, field_name).storage
+        names = [getattr(instance, name).name for name in _file_fields(field_name) if getattr(instance, name)]
+        transaction.on_commit(lambda: _delete(storage, names))
+
+    post_init.connect(remember_loaded, sender=model, weak=False, dispatch_uid=f'{uid}:post_init')
+    pre_save.connect(remember_previous, sender=model, weak=False, dispatch_uid=f'{uid}:pre_save')
+    post_save.connect(image_saved, sender=model, weak=False, dispatch_uid=f'{uid}:post_save')
+    post_delete.connect(image_deleted, sender=model, weak=False, dispatch_uid=f'{uid}:post_delete')
+
+
+def registered_fields():
+    return list(_registry)
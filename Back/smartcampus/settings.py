@@ -76,6 +76,15 @@ DATABASES = {
     }
 }
 
+# Cache (per-process memory by default; point at Redis/Memcached in production)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = 300  # seconds
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,20 @@
+from dashboard.feed import ActivitySource, register
+
+from .models import TransportBooking
+
+
+@register
+class TransportBookingActivity(ActivitySource):
+    name = 'transport_booking'
+    select_related = ('schedule__route',)
+    icon = '🚌'
+
+    def queryset(self, user):
+        return TransportBooking.objects.filter(request__student=user)
+
+    def serialize(self, booking):
+        route = booking.schedule.route
+        return {
+            'title': f'Réservation {booking.booking_reference}',
+            'description': f'{route.start_location} → {route.end_location}',
+        }
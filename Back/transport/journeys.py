@@ -0,0 +1,235 @@
+"""
+Journey planning over the transport network.
+
+``JourneyGraph`` is built from the active routes and the schedules of active
+providers. Each schedule runs its route's stops (start, ``Route.waypoints``,
+end) on its days, reaching the stops at times spread evenly between its
+departure and arrival times. Every (boarding stop, alighting stop, price)
+served by a schedule is an edge holding its departures over two weeks, in
+minutes from Monday 00:00, sorted, with the earliest arrival reachable from
+each departure onwards: the best connection leaving after a given time is one
+``bisect`` away. Riding on through a stop costs one fare; changing vehicles
+takes ``TRANSPORT_TRANSFER_MINUTES``.
+
+- ``earliest`` is a time-dependent Dijkstra on arrival times.
+- ``cheapest`` settles (fare, arrival) labels in fare order, keeping a label
+  only when it reaches its stop earlier than every cheaper one: the first
+  label reaching the destination is the cheapest journey, and the earliest
+  among the cheapest.
+
+Both look ``TRANSPORT_JOURNEY_HORIZON_HOURS`` ahead. Seats are not
+considered: ``transport.seats`` answers for a given departure.
+
+The graph is built once per process and reused until ``transport.signals``
+bumps the network version in the cache, on any change to routes, schedules
+or providers; with a shared cache backend every process sees the change.
+"""
+
+import heapq
+import time as clock
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .matcher import place_key
+from .models import Route, TransportSchedule
+
+
+TRANSFER_MINUTES = getattr(settings, 'TRANSPORT_TRANSFER_MINUTES', 5)
+HORIZON = timedelta(hours=getattr(settings, 'TRANSPORT_JOURNEY_HORIZON_HOURS', 24))
+CACHE_ALIAS = getattr(settings, 'TRANSPORT_CACHE_ALIAS', 'default')
+VERSION_KEY = 'transport:network:version'
+DAY = 24 * 60
+WEEK = 7 * DAY
+WEEKDAYS = {code: index for index, (code, _) in enumerate(TransportSchedule.DAYS_OF_WEEK)}
+
+# departure, arrival: aware datetimes
+Leg = namedtuple('Leg', 'schedule_id origin destination departure arrival price')
+Journey = namedtuple('Journey', 'departure arrival price legs')
+
+
+def _stop_name(waypoint):
+    return waypoint.get('name', '') if isinstance(waypoint, dict) else waypoint
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+class _Edge:
+    """Departures from one stop to another at one fare (in cents), sorted, with the best arrival from each onwards"""
+    __slots__ = ('target', 'price', 'times', 'arrivals', 'schedules', 'choice')
+
+    def __init__(self, target, price, rows):
+        rows.sort()
+        self.target, self.price = target, price
+        self.times = [row[0] for row in rows]
+        self.arrivals = [row[1] for row in rows]
+        self.schedules = [row[2] for row in rows]
+        # choice[i]: the departure arriving first among departures i and later
+        self.choice = [0] * len(rows)
+        choice = None
+        for index in range(len(rows) - 1, -1, -1):
+            if choice is None or self.arrivals[index] <= self.arrivals[choice]:
+                choice = index
+            self.choice[index] = choice
+
+    def next(self, ready):
+        """Index of the departure arriving first among those leaving at ``ready`` or later, or None"""
+        index = bisect_left(self.times, ready)
+        return self.choice[index] if index < len(self.times) else None
+
+
+class JourneyGraph:
+    """Time-dependent graph of the scheduled departures between stops"""
+
+    def __init__(self, routes, schedules):
+        """``routes``: (pk, start, end, waypoints, estimated_duration) rows;
+        ``schedules``: (pk, route_id, departure_time, arrival_time, days_of_week, price) rows"""
+        self.names = {}
+        stops = {}
+        for pk, start, end, waypoints, duration in routes:
+            stops[pk] = ([start, *(_stop_name(waypoint) for waypoint in waypoints or []), end], duration)
+            for stop in stops[pk][0]:
+                self.names.setdefault(place_key(stop), str(stop).strip())
+
+        departures = defaultdict(list)
+        for pk, route_id, departure, arrival, days, price in schedules:
+            if route_id not in stops:
+                continue
+            places, duration = stops[route_id]
+            keys = [place_key(stop) for stop in places]
+            length = (_minutes(arrival) - _minutes(departure)) % DAY or duration.total_seconds() // 60
+            at = [_minutes(departure) + length * index / (len(keys) - 1) for index in range(len(keys))]
+            for day in {WEEKDAYS[str(code)[:3].upper()] for code in days or [] if str(code)[:3].upper() in WEEKDAYS}:
+                for week in (0, WEEK):
+                    base = week + day * DAY
+                    for first in range(len(keys) - 1):
+                        for last in range(first + 1, len(keys)):
+                            if keys[first] != keys[last]:
+                                departures[keys[first], keys[last], int(price * 100)].append(
+                                    (base + at[first], base + at[last], pk)
+                                )
+
+        self.edges = defaultdict(list)
+        for (origin, destination, price), rows in departures.items():
+            self.edges[origin].append(_Edge(destination, price, rows))
+        self.size = sum(len(rows) for rows in departures.values())
+
+    @classmethod
+    def from_database(cls):
+        return cls(
+            Route.objects.filter(is_active=True).values_list(
+                'pk', 'start_location', 'end_location', 'waypoints', 'estimated_duration'
+            ),
+            TransportSchedule.objects.filter(route__is_active=True, provider__is_active=True).values_list(
+                'pk', 'route_id', 'departure_time', 'arrival_time', 'days_of_week', 'price'
+            ),
+        )
+
+    @staticmethod
+    def week_position(when):
+        """(Monday 00:00 of the week of ``when``, minutes from it to ``when``)"""
+        local = timezone.localtime(when).replace(tzinfo=None)
+        monday = datetime(local.year, local.month, local.day) - timedelta(days=local.weekday())
+        return monday, (local - monday).total_seconds() / 60
+
+    def _journey(self, trail, monday):
+        legs = []
+        while trail is not None:
+            trail, stop, edge, index = trail
+            legs.append(Leg(
+                edge.schedules[index], self.names[stop], self.names[edge.target],
+                timezone.make_aware(monday + timedelta(minutes=edge.times[index])),
+                timezone.make_aware(monday + timedelta(minutes=edge.arrivals[index])),
+                Decimal(edge.price).scaleb(-2),
+            ))
+        legs.reverse()
+        return Journey(legs[0].departure, legs[-1].arrival, sum((leg.price for leg in legs), Decimal('0.00')), legs)
+
+    def earliest(self, origin, destination, when, horizon=HORIZON):
+        """Journey arriving first, leaving ``origin`` at ``when`` or later; None when there is none"""
+        source, target = place_key(origin), place_key(destination)
+        monday, start = self.week_position(when)
+        limit = start + horizon.total_seconds() / 60
+        arrival, trails = {source: start}, {source: None}
+        heap = [(start, source)]
+        while heap:
+            minute, stop = heapq.heappop(heap)
+            if minute > arrival[stop]:
+                continue
+            if stop == target:
+                return self._journey(trails[stop], monday) if trails[stop] else None
+            ready = minute if stop == source else minute + TRANSFER_MINUTES
+            for edge in self.edges.get(stop, ()):
+                index = edge.next(ready)
+                if index is None:
+                    continue
+                reached = edge.arrivals[index]
+                if reached <= limit and reached < arrival.get(edge.target, limit + 1):
+                    arrival[edge.target] = reached
+                    trails[edge.target] = (trails[stop], stop, edge, index)
+                    heapq.heappush(heap, (reached, edge.target))
+        return None
+
+    def cheapest(self, origin, destination, when, horizon=HORIZON):
+        """Cheapest journey (arriving first among the cheapest) leaving ``origin`` at ``when`` or later"""
+        source, target = place_key(origin), place_key(destination)
+        monday, start = self.week_position(when)
+        limit = start + horizon.total_seconds() / 60
+        # Arrival of the cheapest label settled at each stop so far: later labels must beat it
+        settled = {}
+        heap, pushed = [(0, start, 0, source, None)], 0
+        while heap:
+            fare, minute, _, stop, trail = heapq.heappop(heap)
+            if minute >= settled.get(stop, limit + 1):
+                continue
+            settled[stop] = minute
+            if stop == target:
+                return self._journey(trail, monday) if trail else None
+            ready = minute if stop == source else minute + TRANSFER_MINUTES
+            for edge in self.edges.get(stop, ()):
+                index = edge.next(ready)
+                if index is None:
+                    continue
+                reached = edge.arrivals[index]
+                if reached <= limit and reached < settled.get(edge.target, limit + 1):
+                    pushed += 1
+                    heapq.heappush(heap, (fare + edge.price, reached, pushed, edge.target, (trail, stop, edge, index)))
+        return None
+
+    def plan(self, origin, destination, when, horizon=HORIZON):
+        """{'earliest': Journey, 'cheapest': Journey} (None when unreachable within the horizon)"""
+        return {
+            'earliest': self.earliest(origin, destination, when, horizon),
+            'cheapest': self.cheapest(origin, destination, when, horizon),
+        }
+
+
+_graph = (None, None)
+
+
+def network():
+    """The journey graph, rebuilt when the network version in the cache changed"""
+    global _graph
+    cache = caches[CACHE_ALIAS]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, clock.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    if _graph[0] != version or _graph[1] is None:
+        _graph = (version, JourneyGraph.from_database())
+    return _graph[1]
+
+
+def invalidate_network():
+    caches[CACHE_ALIAS].set(VERSION_KEY, clock.time_ns(), None)
+
+
+def plan_journey(origin, destination, when=None):
+    return network().plan(origin, destination, when or timezone.now())
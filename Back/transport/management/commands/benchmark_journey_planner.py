@@ -0,0 +1,145 @@
+import random
+import statistics
+import time
+from bisect import bisect_left
+from datetime import datetime, time as clock, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transport.journeys import DAY, TRANSFER_MINUTES, WEEKDAYS, JourneyGraph
+from transport.matcher import place_key
+
+
+def synthetic_network(stops, routes, seed=42):
+    """(route rows, schedule rows) of lines over a grid of stops"""
+    rng = random.Random(seed)
+    side = max(2, int(stops ** 0.5))
+    route_rows, schedule_rows = [], []
+    for route_id in range(1, routes + 1):
+        x, y = rng.randrange(side), rng.randrange(side)
+        path = [(x, y)]
+        for _ in range(rng.randint(3, 9)):
+            dx, dy = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+            x, y = min(max(x + dx, 0), side - 1), min(max(y + dy, 0), side - 1)
+            if (x, y) not in path:
+                path.append((x, y))
+        names = [f'arrêt {x}-{y}' for x, y in path]
+        if len(names) < 2:
+            continue
+        duration = timedelta(minutes=6 * (len(names) - 1))
+        route_rows.append((route_id, names[0], names[-1], names[1:-1], duration))
+        days = rng.choice([['MON', 'TUE', 'WED', 'THU', 'FRI'], list(WEEKDAYS), ['SAT', 'SUN']])
+        price = Decimal(rng.choice(['1.00', '1.50', '2.00', '3.50']))
+        first = rng.randint(5 * 60, 8 * 60)
+        for departure in range(first, 22 * 60, rng.choice([15, 20, 30, 60])):
+            arrival = departure + int(duration.total_seconds() // 60)
+            schedule_rows.append((
+                len(schedule_rows) + 1, route_id, clock(departure // 60, departure % 60),
+                clock(arrival // 60 % 24, arrival % 60), days, price,
+            ))
+    return route_rows, schedule_rows
+
+
+def connections(route_rows, schedule_rows):
+    """Every hop of every trip over two weeks, sorted by departure"""
+    stops = {pk: [start_name, *waypoints, end] for pk, start_name, end, waypoints, _ in route_rows}
+    hops = []
+    for pk, route_id, departure, arrival, days, _ in schedule_rows:
+        keys = [place_key(stop) for stop in stops[route_id]]
+        begin = departure.hour * 60 + departure.minute
+        length = (arrival.hour * 60 + arrival.minute - begin) % DAY
+        at = [begin + length * index / (len(keys) - 1) for index in range(len(keys))]
+        for day in days:
+            for week in (0, 7 * DAY):
+                base = week + WEEKDAYS[day] * DAY
+                for index in range(len(keys) - 1):
+                    hops.append((base + at[index], base + at[index + 1], keys[index], keys[index + 1], (pk, base)))
+    hops.sort(key=lambda hop: hop[0])
+    return hops
+
+
+def connection_scan(hops, origin, destination, start, limit):
+    """Earliest arrival minute by a plain connection scan over every trip, for checking"""
+    arrival, on_trip = {origin: start}, set()
+    for departure, reached, first, last, trip in hops[bisect_left(hops, (start,)):]:
+        if departure > limit:
+            break
+        if reached >= arrival.get(destination, limit + 1):
+            break
+        ready = arrival.get(first)
+        boards = ready is not None and departure >= (ready if first == origin else ready + TRANSFER_MINUTES)
+        if trip in on_trip or boards:
+            on_trip.add(trip)
+            if reached < arrival.get(last, limit + 1):
+                arrival[last] = reached
+    return arrival.get(destination)
+
+
+def _check_legs(journey):
+    for previous, leg in zip(journey.legs, journey.legs[1:]):
+        if leg.origin != previous.destination or leg.departure < previous.arrival + timedelta(minutes=TRANSFER_MINUTES):
+            raise CommandError(f'Correspondance impossible: {previous} puis {leg}')
+
+
+class Command(BaseCommand):
+    help = 'Time journey queries on a synthetic network and check them against a connection scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=400)
+        parser.add_argument('--routes', type=int, default=300)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--checks', type=int, default=50, help='Queries also answered by a connection scan')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        route_rows, schedule_rows = synthetic_network(options['stops'], options['routes'], options['seed'])
+        start = time.perf_counter()
+        graph = JourneyGraph(route_rows, schedule_rows)
+        self.stdout.write(
+            f'{len(route_rows)} lignes, {len(schedule_rows)} horaires, {graph.size} départs indexés '
+            f'en {time.perf_counter() - start:.2f}s'
+        )
+
+        hops = connections(route_rows, schedule_rows)
+        places = sorted(graph.names)
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        timings = {'earliest': [], 'cheapest': []}
+        found = 0
+        for query in range(options['queries']):
+            origin, destination = rng.sample(places, 2)
+            when = timezone.make_aware(
+                datetime.combine(monday, clock()) + timedelta(minutes=rng.randrange(7 * DAY))
+            )
+            journeys = {}
+            for kind in timings:
+                start = time.perf_counter()
+                journeys[kind] = getattr(graph, kind)(origin, destination, when)
+                timings[kind].append((time.perf_counter() - start) * 1000)
+            earliest, cheapest = journeys['earliest'], journeys['cheapest']
+            if (earliest is None) != (cheapest is None):
+                raise CommandError(f'{origin} → {destination}: un seul des deux trajets trouvé')
+            if earliest is None:
+                continue
+            found += 1
+            _check_legs(earliest)
+            _check_legs(cheapest)
+            if cheapest.price > earliest.price or cheapest.arrival < earliest.arrival:
+                raise CommandError(f'{origin} → {destination}: trajets incohérents')
+            if query < options['checks']:
+                base, minute = JourneyGraph.week_position(when)
+                expected = connection_scan(hops, place_key(origin), place_key(destination), minute, minute + DAY)
+                got = (timezone.localtime(earliest.arrival).replace(tzinfo=None) - base).total_seconds() / 60
+                if expected is None or abs(expected - got) > 1e-6:
+                    raise CommandError(f'{origin} → {destination}: arrivée {got}, attendue {expected}')
+
+        self.stdout.write(f"{options['queries']} requêtes, {found} avec un trajet")
+        for kind, values in timings.items():
+            values.sort()
+            self.stdout.write(
+                f'{kind:9} moyenne {statistics.mean(values):.2f} ms, '
+                f'p95 {values[int(len(values) * 0.95) - 1]:.2f} ms, max {values[-1]:.2f} ms'
+            )
+        self.stdout.write(self.style.SUCCESS('Arrivées identiques à la recherche exhaustive'))
@@ -0,0 +1,100 @@
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transport.pooling import VEHICLE_CAPACITY, PoolRequest, RidePooler
+
+
+DESTINATIONS = ['campus', 'cité universitaire']
+HOP_MINUTES = 4
+
+
+class Lines:
+    """Synthetic corridors: each neighbourhood sits on a line ending at every destination"""
+
+    def __init__(self, neighbourhoods, lines):
+        self.position = {place: (index % lines, index // lines) for index, place in enumerate(neighbourhoods)}
+
+    def pickup_offset(self, first, stop, destination):
+        (line, position), (other_line, other_position) = self.position[first], self.position[stop]
+        if line != other_line or other_position <= position:
+            return None
+        return (other_position - position) * HOP_MINUTES
+
+
+def synthetic_requests(count, neighbourhoods, seed=42):
+    """Requests around two rush hours, as PoolRequests"""
+    rng = random.Random(seed)
+    requests = []
+    for pk in range(1, count + 1):
+        peak = rng.choice([8 * 60, 8 * 60, 13 * 60, 17 * 60])
+        requests.append(PoolRequest(
+            pk, rng.choice(neighbourhoods), rng.choice(DESTINATIONS), int(rng.gauss(peak, 25)),
+            rng.choice([60, 60, 15]), rng.choice([1, 1, 1, 1, 2, 2, 3]),
+        ))
+    return requests
+
+
+class Command(BaseCommand):
+    help = 'Pool synthetic transport requests and check the rides found'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000)
+        parser.add_argument('--neighbourhoods', type=int, default=40)
+        parser.add_argument('--lines', type=int, default=8, help='Corridors the neighbourhoods are spread over')
+        parser.add_argument('--capacity', type=int, default=VEHICLE_CAPACITY)
+        parser.add_argument('--time-limit', type=float, default=2.0)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def run(self, requests, corridors, options):
+        pooler = RidePooler(requests, options['capacity'], corridors, options['seed'])
+        start = time.perf_counter()
+        pooler.pack()
+        packed = len(pooler.rides)
+        pooler.merge_rides()
+        merged = len(pooler.rides)
+        # A move budget rather than the clock alone, so both runs search alike
+        pooler.improve(options['time_limit'], max_moves=20 * packed)
+        return pooler, time.perf_counter() - start, (packed, merged, len(pooler.rides))
+
+    def handle(self, *args, **options):
+        neighbourhoods = [f'quartier {i}' for i in range(options['neighbourhoods'])]
+        requests = synthetic_requests(options['requests'], neighbourhoods, options['seed'])
+        corridors = Lines(neighbourhoods, options['lines'])
+        pooler, elapsed, (packed, merged, final) = self.run(requests, corridors, options)
+
+        by_pk = {request.pk: request for request in requests}
+        seen = Counter()
+        for ride in pooler.rides:
+            departure = ride.departure()
+            if ride.seats > options['capacity']:
+                raise CommandError(f'Trajet au-delà de la capacité: {ride.seats} places')
+            for request, offset in ride.members:
+                seen[request.pk] += 1
+                if offset != corridors.pickup_offset(ride.first, request.origin, ride.destination) and offset != 0:
+                    raise CommandError(f'Arrêt hors corridor pour la demande {request.pk}')
+                if abs(departure + offset - request.minute) > request.window:
+                    raise CommandError(f'Demande {request.pk} prise hors de sa fenêtre')
+        missing = [pk for pk in by_pk if seen[pk] != 1 and by_pk[pk].seats <= options['capacity']]
+        if missing:
+            raise CommandError(f'{len(missing)} demandes perdues ou dupliquées')
+
+        again, _, _ = self.run(requests, corridors, options)
+        same = [pooler.proposal(ride) for ride in pooler.rides] == [again.proposal(ride) for ride in again.rides]
+
+        seats = Counter()
+        for request in requests:
+            seats[request.origin, request.destination] += request.seats
+        pooled = [ride for ride in pooler.rides if len(ride.members) > 1]
+        self.stdout.write(f"{len(requests)} demandes, {sum(seats.values())} places, capacité {options['capacity']}")
+        self.stdout.write(f'véhicules: {packed} par origine, {merged} après fusions, {final} après recherche locale')
+        self.stdout.write(f'borne inférieure (places / capacité): {-(-sum(seats.values()) // options["capacity"])}')
+        self.stdout.write(
+            f'{len(pooled)} trajets partagés, {sum(len(ride.members) for ride in pooled)} demandes regroupées, '
+            f'détour total {sum(ride.detour() for ride in pooler.rides):.0f} min'
+        )
+        self.stdout.write(f'{elapsed:.2f}s, déterministe: {"oui" if same else "non"}')
+        if not same:
+            raise CommandError('Deux exécutions avec la même graine diffèrent')
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transport.matcher import CHUNK_SIZE, match_pending
+
+
+class Command(BaseCommand):
+    help = 'Match every pending transport request against the transport schedules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = match_pending(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['requests']} demandes traitées en {time.perf_counter() - start:.2f}s: "
+            f"{report['matched']} avec des horaires, {report['unmatched']} sans"
+        ))
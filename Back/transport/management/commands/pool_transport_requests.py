@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transport.pooling import TIME_LIMIT, VEHICLE_CAPACITY, as_datetime, apply_pooling, pool_pending
+
+
+class Command(BaseCommand):
+    help = 'Group the pending transport requests into shared rides'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capacity', type=int, default=VEHICLE_CAPACITY, help='Seats per vehicle')
+        parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help='Seconds of local search')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--apply', action='store_true', help='Create the shared rides')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rides, pending = pool_pending(
+            capacity=options['capacity'], seed=options['seed'], time_limit=options['time_limit']
+        )
+        pooled = sum(len(ride.request_ids) for ride in rides)
+        for ride in rides:
+            stops = ' → '.join(place for place, _ in ride.stops)
+            self.stdout.write(
+                f"{timezone.localtime(as_datetime(ride.departure)):%d/%m %H:%M}  {stops} → {ride.destination}  "
+                f"{ride.seats} places, demandes {', '.join(map(str, ride.request_ids))}"
+            )
+        self.stdout.write(
+            f'{pending} demandes en attente, {pooled} regroupées en {len(rides)} trajets '
+            f'({time.perf_counter() - start:.2f}s)'
+        )
+        if options['apply'] and rides:
+            created = apply_pooling(rides, options['capacity'])
+            if len(created) < len(rides):
+                self.stdout.write(self.style.WARNING(
+                    f'{len(rides) - len(created)} trajets ignorés: demandes traitées entre-temps'
+                ))
+            self.stdout.write(self.style.SUCCESS(f'{len(created)} trajets partagés créés'))
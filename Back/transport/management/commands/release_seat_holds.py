@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transport.seats import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Give back the seats of expired seat holds'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'{released} réservations temporaires expirées libérées'))
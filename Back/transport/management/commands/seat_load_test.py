@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from datetime import datetime, time as clock, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.models import Student
+from transport.models import (
+    Route, RideParticipation, SeatHold, SeatInventory, SharedRide, TransportBooking, TransportProvider,
+    TransportRequest, TransportSchedule,
+)
+from transport.seats import ACTIVE_BOOKINGS, SeatsUnavailable, book_schedule, hold_seats, join_ride
+
+
+RETRIES = 200
+
+
+class Command(BaseCommand):
+    help = 'Book one departure and one shared ride from many threads at once, then check nothing was oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=400, help='Booking attempts, split between the threads')
+        parser.add_argument('--capacity', type=int, default=50, help='Seats of the departure')
+        parser.add_argument('--ride-seats', type=int, default=6, help='Seats of the shared ride')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        attempts = options['attempts']
+        day = timezone.localdate() + timedelta(days=1)
+        departure = timezone.make_aware(datetime.combine(day, clock(8, 0)))
+
+        provider = TransportProvider.objects.create(name='Test de charge', provider_type='BUS', phone_number='0')
+        route = Route.objects.create(
+            name='Test de charge', start_location='A', end_location='B', distance_km=10,
+            estimated_duration=timedelta(minutes=20),
+        )
+        schedule = TransportSchedule.objects.create(
+            provider=provider, route=route, departure_time=clock(8, 0), arrival_time=clock(8, 20),
+            days_of_week=[code for code, _ in TransportSchedule.DAYS_OF_WEEK], price=2, capacity=options['capacity'],
+        )
+        Student.objects.bulk_create([
+            Student(username=f'seat_load_{i}', student_id=f'SEATLOAD{i:06d}', level='L1', filiere='INFO')
+            for i in range(attempts)
+        ])
+        students = list(Student.objects.filter(username__startswith='seat_load_').order_by('pk'))
+        ride = SharedRide.objects.create(
+            organizer=students[0], start_location='A', end_location='B', departure_time=departure,
+            available_seats=options['ride_seats'], price_per_person=1, contact_info='0',
+        )
+        TransportRequest.objects.bulk_create([
+            TransportRequest(
+                student=student, start_location='A', end_location='B', preferred_departure_time=departure,
+                passenger_count=rng.choice([1, 1, 1, 2, 3]),
+            )
+            for student in students
+        ])
+        requests = list(TransportRequest.objects.filter(student__in=students).order_by('pk'))
+        # Each attempt: (request, book through a hold, also join the ride)
+        plan = [(request, rng.random() < 0.3, rng.random() < 0.2) for request in requests]
+
+        outcome = {'booked': 0, 'refused': 0, 'joined': 0, 'ride_refused': 0, 'retries': 0}
+        errors = []
+        lock = threading.Lock()
+
+        def attempt(action):
+            for retry in range(RETRIES):
+                try:
+                    return action()
+                except OperationalError:
+                    # SQLite answers concurrent writers with "database is locked"
+                    with lock:
+                        outcome['retries'] += 1
+                    time.sleep(random.random() * min(retry + 1, 10) / 100)
+            return action()
+
+        def worker(share):
+            try:
+                for request, through_hold, ride_too in share:
+                    try:
+                        if through_hold:
+                            hold = attempt(lambda: hold_seats(request.student, request.passenger_count, schedule, day))
+                            attempt(lambda: book_schedule(request, schedule, hold=hold))
+                        else:
+                            attempt(lambda: book_schedule(request, schedule))
+                        counter = 'booked'
+                    except SeatsUnavailable:
+                        counter = 'refused'
+                    with lock:
+                        outcome[counter] += 1
+                    if ride_too:
+                        try:
+                            attempt(lambda: join_ride(ride, request.student))
+                            counter = 'joined'
+                        except SeatsUnavailable:
+                            counter = 'ride_refused'
+                        with lock:
+                            outcome[counter] += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(plan[i::options['threads']],)) for i in range(options['threads'])]
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            if errors:
+                raise CommandError(f'{len(errors)} threads en erreur: {errors[0]!r}')
+
+            booked = TransportBooking.objects.filter(schedule=schedule, status__in=ACTIVE_BOOKINGS).aggregate(
+                seats=Sum('passenger_count')
+            )['seats'] or 0
+            inventory = SeatInventory.objects.get(schedule=schedule, travel_date=day)
+            held = SeatHold.objects.filter(inventory=inventory).aggregate(seats=Sum('seats'))['seats'] or 0
+            joined = RideParticipation.objects.filter(ride=ride).aggregate(seats=Sum('requested_seats'))['seats'] or 0
+            ride.refresh_from_db()
+
+            self.stdout.write(
+                f"{attempts} tentatives sur {options['threads']} threads en {elapsed:.2f}s "
+                f"({outcome['retries']} reprises sur verrou)"
+            )
+            self.stdout.write(
+                f"Départ: {outcome['booked']} réservations, {outcome['refused']} refusées, "
+                f"{booked}/{schedule.capacity} places vendues, {inventory.remaining} restantes"
+            )
+            self.stdout.write(
+                f"Trajet partagé: {outcome['joined']} participants, {outcome['ride_refused']} refusés, "
+                f"{joined}/{ride.available_seats} places, {ride.remaining_seats} restantes"
+            )
+            if booked > schedule.capacity or joined > ride.available_seats:
+                raise CommandError('Surréservation détectée')
+            if inventory.remaining != schedule.capacity - booked - held or ride.remaining_seats != ride.available_seats - joined:
+                raise CommandError('Les compteurs de places ne correspondent pas aux réservations')
+            self.check_failed_insert(schedule, inventory)
+            self.stdout.write(self.style.SUCCESS('Aucune surréservation'))
+        finally:
+            # Cascades to the requests, bookings, participations, holds and the ride
+            Student.objects.filter(pk__in=[student.pk for student in students]).delete()
+            provider.delete()
+            route.delete()
+
+    def check_failed_insert(self, schedule, inventory):
+        """A booking whose INSERT fails must not keep the seats it took"""
+        booking = TransportBooking.objects.filter(schedule=schedule, status__in=ACTIVE_BOOKINGS).first()
+        if booking is None:
+            return
+        inventory.refresh_from_db()
+        if inventory.remaining < booking.passenger_count:
+            # Room for the seats, so that the INSERT is what fails
+            schedule.capacity += booking.passenger_count
+            schedule.save()
+            inventory.refresh_from_db()
+        remaining = inventory.remaining
+        try:
+            # Second booking of the same request: the unique request_id refuses the row
+            TransportBooking.objects.create(
+                request=booking.request, schedule=schedule, passenger_count=booking.passenger_count, total_price=0,
+            )
+        except IntegrityError:
+            pass
+        else:
+            raise CommandError('Une deuxième réservation de la même demande a été acceptée')
+        inventory.refresh_from_db()
+        if inventory.remaining != remaining:
+            raise CommandError('Une réservation refusée par la base a gardé ses places')
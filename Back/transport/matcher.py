@@ -0,0 +1,202 @@
+"""
+Matching of transport requests against transport schedules.
+
+``RouteIndex`` is built from the active routes and schedules in two queries:
+
+- every stop (start, ``Route.waypoints``, end) maps to the routes serving it
+  and its position on them, so the routes going from A to B are those where
+  A comes before B;
+- every (route, weekday) holds the departure minutes of its schedules as a
+  sorted list, so the schedules leaving within a time window of a request are
+  one ``bisect`` away. Boarding at a waypoint is estimated from the route's
+  ``estimated_duration``, pro rata of the stop's position.
+
+Candidates are then filtered by ``max_price`` (per seat), the seats left on
+the travel date (``SeatInventory``, full capacity for departures nobody booked
+yet) and ranked by gap to the preferred time, then price.
+``match_pending`` matches every pending request in one pass over a single
+index and rewrites their ``matched_schedules`` in bulk.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Route, SeatInventory, TransportRequest, TransportSchedule
+
+
+FLEXIBLE_WINDOW = getattr(settings, 'TRANSPORT_FLEXIBLE_MINUTES', 60)
+STRICT_WINDOW = getattr(settings, 'TRANSPORT_STRICT_MINUTES', 15)
+MAX_MATCHES = getattr(settings, 'TRANSPORT_MAX_MATCHES', 5)
+CHUNK_SIZE = 2000
+WEEKDAYS = [code for code, _ in TransportSchedule.DAYS_OF_WEEK]
+
+
+def place_key(name):
+    """Comparable form of a place name"""
+    return re.sub(r'\s+', ' ', str(name)).strip().casefold()
+
+
+def _stop_name(waypoint):
+    # Waypoints are stored as names or as {'name': ...} objects
+    return waypoint.get('name', '') if isinstance(waypoint, dict) else waypoint
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+class RouteIndex:
+    """Stops and departure times of the active routes"""
+
+    def __init__(self):
+        self._stops = defaultdict(dict)  # place -> {route id: position}
+        self._hop = {}  # route id -> minutes between two consecutive stops
+        self._between = {}
+        for pk, start, end, waypoints, duration in Route.objects.filter(is_active=True).values_list(
+            'pk', 'start_location', 'end_location', 'waypoints', 'estimated_duration'
+        ):
+            stops = [start, *(_stop_name(waypoint) for waypoint in waypoints or []), end]
+            for position, stop in enumerate(stops):
+                # A route passing twice through a place is boarded at its first passage
+                self._stops[place_key(stop)].setdefault(pk, position)
+            self._hop[pk] = duration.total_seconds() / 60 / (len(stops) - 1)
+
+        departures = defaultdict(list)
+        for pk, route_id, departure, days, price, capacity in TransportSchedule.objects.filter(
+            route__is_active=True, provider__is_active=True
+        ).values_list('pk', 'route_id', 'departure_time', 'days_of_week', 'price', 'capacity'):
+            for day in days or []:
+                departures[route_id, str(day)[:3].upper()].append((_minutes(departure), pk, price, capacity))
+        self._departures = {}
+        for key, rows in departures.items():
+            rows.sort()
+            self._departures[key] = ([row[0] for row in rows], rows)
+
+    def routes_between(self, origin, destination):
+        """[(route id, minutes from departure to boarding)] of the routes going from origin to destination"""
+        key = (place_key(origin), place_key(destination))
+        if key not in self._between:
+            boarding, alighting = self._stops.get(key[0], {}), self._stops.get(key[1], {})
+            self._between[key] = [
+                (route_id, position * self._hop[route_id])
+                for route_id, position in boarding.items()
+                if alighting.get(route_id, -1) > position
+            ]
+        return self._between[key]
+
+    def pickup_offset(self, first, stop, destination):
+        """Minutes from ``first`` to ``stop`` along a route serving both, in that order, before ``destination``
+
+        Places are ``place_key``s; None when no active route does.
+        """
+        if first == stop:
+            return 0.0
+        at_stop, at_destination = self._stops.get(stop, {}), self._stops.get(destination, {})
+        offsets = [
+            (at_stop[route_id] - position) * self._hop[route_id]
+            for route_id, position in self._stops.get(first, {}).items()
+            if position < at_stop.get(route_id, -1) < at_destination.get(route_id, -1)
+        ]
+        return min(offsets, default=None)
+
+    def candidates(self, origin, destination, day, minute, window):
+        """(schedule id, boarding minute, price, capacity) of the departures within ``window`` of ``minute``"""
+        for route_id, offset in self.routes_between(origin, destination):
+            entry = self._departures.get((route_id, day))
+            if entry is None:
+                continue
+            times, rows = entry
+            low = bisect_left(times, minute - offset - window)
+            high = bisect_right(times, minute - offset + window)
+            for departure, pk, price, capacity in rows[low:high]:
+                yield pk, departure + offset, price, capacity
+
+
+def seats_left(dates):
+    """{(schedule id, travel date): seats left} of the departures with an inventory over the given dates"""
+    if not dates:
+        return {}
+    return {
+        (schedule_id, day): remaining
+        for schedule_id, day, remaining in SeatInventory.objects.filter(
+            travel_date__range=(min(dates), max(dates))
+        ).values_list('schedule_id', 'travel_date', 'remaining')
+    }
+
+
+def match(requests, index, remaining, limit=MAX_MATCHES):
+    """{request id: [schedule ids, best first]} of request tuples
+
+    ``requests``: (pk, start_location, end_location, preferred_departure_time,
+    flexible_time, max_price, passenger_count).
+    """
+    matches = {}
+    for pk, origin, destination, preferred, flexible, max_price, passengers in requests:
+        local = timezone.localtime(preferred)
+        minute = local.hour * 60 + local.minute
+        window = FLEXIBLE_WINDOW if flexible else STRICT_WINDOW
+        found = []
+        for schedule_id, boarding, price, capacity in index.candidates(
+            origin, destination, WEEKDAYS[local.weekday()], minute, window
+        ):
+            if max_price is not None and price > max_price:
+                continue
+            if remaining.get((schedule_id, local.date()), capacity) < passengers:
+                continue
+            found.append((abs(boarding - minute), price, schedule_id))
+        found.sort()
+        matches[pk] = [schedule_id for *_, schedule_id in found[:limit]]
+    return matches
+
+
+REQUEST_FIELDS = (
+    'pk', 'start_location', 'end_location', 'preferred_departure_time', 'flexible_time', 'max_price',
+    'passenger_count',
+)
+
+
+def _save(matches):
+    through = TransportRequest.matched_schedules.through
+    with transaction.atomic():
+        through.objects.filter(transportrequest_id__in=list(matches)).delete()
+        through.objects.bulk_create([
+            through(transportrequest_id=pk, transportschedule_id=schedule_id)
+            for pk, schedule_ids in matches.items()
+            for schedule_id in schedule_ids
+        ], batch_size=CHUNK_SIZE)
+
+
+def match_request(transport_request, index=None):
+    """Match one request and store its matched_schedules; returns the schedules' ids"""
+    index = index or RouteIndex()
+    row = tuple(getattr(transport_request, field) for field in REQUEST_FIELDS)
+    day = timezone.localtime(transport_request.preferred_departure_time).date()
+    matches = match([row], index, seats_left([day]))
+    _save(matches)
+    return matches[transport_request.pk]
+
+
+def match_pending(now=None, chunk_size=CHUNK_SIZE):
+    """Match every pending request not yet departed, building the index once"""
+    now = now or timezone.now()
+    index = RouteIndex()
+    report = {'requests': 0, 'matched': 0, 'unmatched': 0}
+    last_pk = 0
+    while True:
+        rows = list(TransportRequest.objects.filter(
+            status='PENDING', preferred_departure_time__gte=now, pk__gt=last_pk
+        ).order_by('pk').values_list(*REQUEST_FIELDS)[:chunk_size])
+        if not rows:
+            report['unmatched'] = report['requests'] - report['matched']
+            return report
+        last_pk = rows[-1][0]
+        days = {timezone.localtime(row[3]).date() for row in rows}
+        matches = match(rows, index, seats_left(days))
+        _save(matches)
+        report['requests'] += len(rows)
+        report['matched'] += sum(1 for schedule_ids in matches.values() if schedule_ids)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0001_initial'),
+    ]
+
+    operations = [
+        # Notifications that predate the dispatcher count as delivered
+        migrations.AddField(
+            model_name='transportnotification',
+            name='is_sent',
+            field=models.BooleanField(default=True),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='transportnotification',
+            name='is_sent',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='transportnotification',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['created_at'], name='transport_notification_due_idx'),
+        ),
+    ]
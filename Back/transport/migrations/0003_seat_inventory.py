@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def count_taken_seats(apps, schema_editor):
+    SharedRide = apps.get_model('transport', 'SharedRide')
+    SeatInventory = apps.get_model('transport', 'SeatInventory')
+    TransportBooking = apps.get_model('transport', 'TransportBooking')
+
+    rides = list(SharedRide.objects.annotate(
+        taken=Sum('rideparticipation__requested_seats', filter=~Q(rideparticipation__status='CANCELLED'))
+    ))
+    for ride in rides:
+        ride.remaining_seats = max(0, ride.available_seats - (ride.taken or 0))
+    SharedRide.objects.bulk_update(rides, ['remaining_seats'], batch_size=500)
+
+    # Upcoming departures already booked start from their bookings; the others from capacity, on first use
+    departures = TransportBooking.objects.filter(
+        status__in=('BOOKED', 'CONFIRMED', 'IN_PROGRESS'),
+        request__preferred_departure_time__date__gte=timezone.localdate(),
+    ).annotate(day=TruncDate('request__preferred_departure_time')).values(
+        'schedule_id', 'schedule__capacity', 'day'
+    ).annotate(taken=Sum('passenger_count'))
+    SeatInventory.objects.bulk_create([
+        SeatInventory(
+            schedule_id=row['schedule_id'], travel_date=row['day'], capacity=row['schedule__capacity'],
+            remaining=row['schedule__capacity'] - row['taken'],
+        )
+        for row in departures
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transport', '0002_notification_is_sent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedride',
+            name='remaining_seats',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SeatInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('travel_date', models.DateField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('remaining', models.IntegerField()),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventories', to='transport.transportschedule')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', models.PositiveSmallIntegerField(default=1)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('inventory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='transport.seatinventory')),
+                ('ride', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='transport.sharedride')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seatinventory',
+            constraint=models.UniqueConstraint(fields=('schedule', 'travel_date'), name='seat_inventory_unique_departure'),
+        ),
+        migrations.RunPython(count_taken_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:15
+
+from django.db import migrations, models
+import transport.references
+
+
+def create_booking_sequence(apps, schema_editor):
+    ReferenceSequence = apps.get_model('transport', 'ReferenceSequence')
+    ReferenceSequence.objects.get_or_create(name=transport.references.SEQUENCE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0003_seat_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceSequence',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='transportbooking',
+            name='booking_reference',
+            field=models.CharField(default=transport.references.next_reference, editable=False, max_length=20, unique=True),
+        ),
+        migrations.RunPython(create_booking_sequence, migrations.RunPython.noop),
+    ]
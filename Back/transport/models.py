@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
+from smartcampus.counters import fields_without_counters
+
+from .references import next_reference
+
 
 class TransportProvider(models.Model):
     """Transport service providers (taxis, buses, etc.)"""
@@ -106,7 +110,7 @@ class TransportBooking(models.Model):
     
     request = models.OneToOneField(TransportRequest, on_delete=models.CASCADE)
     schedule = models.ForeignKey(TransportSchedule, on_delete=models.CASCADE)
-    booking_reference = models.CharField(max_length=20, unique=True)
+    booking_reference = models.CharField(max_length=20, unique=True, default=next_reference, editable=False)
     passenger_count = models.IntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='BOOKED')
@@ -123,6 +127,11 @@ class TransportBooking(models.Model):
     
     def __str__(self):
         return f"Réservation {self.booking_reference} - {self.request.student.username}"
+    
+    def save(self, *args, **kwargs):
+        # transport.signals takes the seats before the write: a failed write must give them back
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 
 class SharedRide(models.Model):
@@ -142,13 +151,23 @@ class SharedRide(models.Model):
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Seats not taken nor held, kept by transport.seats with conditional UPDATEs
+    # (below zero when available_seats is lowered under the seats already taken)
+    remaining_seats = models.IntegerField(null=True, editable=False)
     
     def __str__(self):
         return f"Trajet partagé: {self.start_location} → {self.end_location}"
     
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.remaining_seats is None:
+            self.remaining_seats = self.available_seats
+        elif not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = fields_without_counters(self, ('remaining_seats',))
+        super().save(*args, **kwargs)
+    
     @property
     def available_spots(self):
-        return max(0, self.available_seats - self.participants.count())
+        return max(0, self.remaining_seats or 0)
 
 
 class RideParticipation(models.Model):
@@ -171,6 +190,11 @@ class RideParticipation(models.Model):
     
     def __str__(self):
         return f"{self.participant.username} in {self.ride}"
+    
+    def save(self, *args, **kwargs):
+        # Same as TransportBooking.save: the seats taken by transport.signals go with the write
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 
 class TransportNotification(models.Model):
@@ -194,6 +218,52 @@ class TransportNotification(models.Model):
     shared_ride = models.ForeignKey(SharedRide, on_delete=models.CASCADE, null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once dashboard.reminders has delivered the notification
+    is_sent = models.BooleanField(default=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], condition=models.Q(is_sent=False), name='transport_notification_due_idx'),
+        ]
     
     def __str__(self):
         return f"Notification: {self.title} pour {self.student.username}"
+
+
+class SeatInventory(models.Model):
+    """Seats left on one departure (schedule, date), kept by transport.seats"""
+    schedule = models.ForeignKey(TransportSchedule, on_delete=models.CASCADE, related_name='inventories')
+    travel_date = models.DateField()
+    capacity = models.PositiveIntegerField()
+    # Below zero when the schedule's capacity is lowered under the seats already taken
+    remaining = models.IntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'travel_date'], name='seat_inventory_unique_departure'),
+        ]
+    
+    def __str__(self):
+        return f"{self.schedule_id} le {self.travel_date}: {self.remaining}/{self.capacity}"
+
+
+class SeatHold(models.Model):
+    """Seats set aside for a student while they confirm, given back at expires_at"""
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seat_holds')
+    inventory = models.ForeignKey(SeatInventory, on_delete=models.CASCADE, null=True, blank=True)
+    ride = models.ForeignKey(SharedRide, on_delete=models.CASCADE, null=True, blank=True)
+    seats = models.PositiveSmallIntegerField(default=1)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.seats} place(s) pour {self.student_id} jusqu'à {self.expires_at}"
+
+
+class ReferenceSequence(models.Model):
+    """Next free number of a reference sequence, reserved by blocks (see transport.references)"""
+    name = models.CharField(max_length=30, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
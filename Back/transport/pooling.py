@@ -0,0 +1,386 @@
+"""
+Pooling of pending transport requests into shared rides.
+
+Requests going to the same destination are packed into vehicles of
+``TRANSPORT_POOL_CAPACITY`` seats (``passenger_count`` seats each). A vehicle
+leaves its first pickup at a time every passenger accepts: within
+``TRANSPORT_FLEXIBLE_MINUTES`` of their preferred departure when it is
+flexible, ``TRANSPORT_STRICT_MINUTES`` otherwise. Passengers of other origins
+are picked up on the way only when an active route passes through both
+pickups, in that order, before the destination (``RouteIndex.pickup_offset``);
+they board that many minutes after the departure.
+
+``RidePooler`` minimizes the vehicles used, then the detour: the minutes
+between each passenger's boarding and preferred times, plus
+``TRANSPORT_POOL_STOP_MINUTES`` for every later pickup they wait through.
+
+1. Each (origin, destination) is packed earliest deadline first: the request
+   that must leave first opens a vehicle, filled with the requests that can
+   leave by then, most urgent first.
+2. Vehicles with free seats are merged when their windows still meet after
+   the pickup offset, cheapest detour first, until no merge is left.
+3. A seeded local search empties vehicles by moving their passengers into
+   others with room, until the time limit.
+
+Rides of a single request are left to ``transport.matcher``.
+``python manage.py pool_transport_requests`` proposes (and with ``--apply``
+creates) the shared rides of the pending requests.
+"""
+
+import heapq
+import random
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .matcher import FLEXIBLE_WINDOW, STRICT_WINDOW, RouteIndex, place_key
+from .models import RideParticipation, SharedRide, TransportRequest
+
+
+VEHICLE_CAPACITY = getattr(settings, 'TRANSPORT_POOL_CAPACITY', 4)
+STOP_MINUTES = getattr(settings, 'TRANSPORT_POOL_STOP_MINUTES', 3)
+TIME_LIMIT = 2.0  # seconds of local search
+MOVES_PER_RIDE = 20
+STALL_FACTOR = 5  # the search stops after this many failed moves per vehicle with free seats
+
+# minute: preferred departure, in minutes since the epoch; window: minutes accepted either side
+PoolRequest = namedtuple('PoolRequest', 'pk origin destination minute window seats')
+# departure: at the first stop, in minutes since the epoch; stops: [(place, minutes after the departure)]
+PooledRide = namedtuple('PooledRide', 'destination departure stops request_ids seats detour')
+
+
+def pool_request(pk, origin, destination, preferred, flexible, passengers):
+    return PoolRequest(
+        pk, place_key(origin), place_key(destination), int(preferred.timestamp() // 60),
+        FLEXIBLE_WINDOW if flexible else STRICT_WINDOW, passengers,
+    )
+
+
+class _Ride:
+    """A vehicle: its passengers as (request, minutes from the first stop to theirs)"""
+    __slots__ = ('destination', 'first', 'members', 'seats', 'low', 'high')
+
+    def __init__(self, destination, first, members):
+        self.destination, self.first, self.members = destination, first, members
+        self.seats = sum(request.seats for request, _ in members)
+        self.low = max(request.minute - request.window - offset for request, offset in members)
+        self.high = min(request.minute + request.window - offset for request, offset in members)
+
+    def departure(self):
+        """Departure from the first stop minimizing the passengers' time gaps (weighted median)"""
+        targets = sorted((request.minute - offset, request.seats) for request, offset in self.members)
+        half, seen = self.seats / 2, 0
+        for target, seats in targets:
+            seen += seats
+            if seen >= half:
+                return min(max(target, self.low), self.high)
+
+    def detour(self):
+        departure = self.departure()
+        offsets = sorted({offset for _, offset in self.members})
+        return sum(
+            request.seats * (
+                abs(departure + offset - request.minute)
+                + STOP_MINUTES * (len(offsets) - 1 - offsets.index(offset))
+            )
+            for request, offset in self.members
+        )
+
+
+class RidePooler:
+    """Packs requests into as few vehicles as possible, then as little detour as possible
+
+    ``corridors`` answers ``pickup_offset(first, stop, destination)`` (a
+    ``RouteIndex``); without it only requests of the same origin are pooled.
+    """
+
+    def __init__(self, requests, capacity=VEHICLE_CAPACITY, corridors=None, seed=0):
+        self.capacity = capacity
+        self.corridors = corridors
+        self.rng = random.Random(seed)
+        self._offsets = {}
+        self._shifts = {}
+        self.requests = sorted(requests, key=lambda request: request.pk)
+        # Requests bigger than a vehicle cannot be pooled
+        self.oversized = [request for request in self.requests if request.seats > capacity]
+        self.rides = []
+
+    def offset(self, first, stop, destination):
+        if first == stop:
+            return 0
+        key = (first, stop, destination)
+        if key not in self._offsets:
+            self._offsets[key] = self.corridors.pickup_offset(*key) if self.corridors else None
+        return self._offsets[key]
+
+    def _combine(self, first, others, destination):
+        """A ride leaving from ``first`` with ``others`` (requests) on board, or None when infeasible"""
+        members = []
+        for request in others:
+            offset = self.offset(first, request.origin, destination)
+            if offset is None:
+                return None
+            members.append((request, offset))
+        ride = _Ride(destination, first, members)
+        return ride if ride.low <= ride.high else None
+
+    def merge(self, ride, other):
+        """The ride carrying both rides' passengers, or None when they do not fit together"""
+        if ride.seats + other.seats > self.capacity:
+            return None
+        passengers = [request for request, _ in ride.members + other.members]
+        for first in (ride.first, other.first):
+            merged = self._combine(first, passengers, ride.destination)
+            if merged is not None:
+                return merged
+        return None
+
+    # 1. Earliest deadline first, per (origin, destination)
+
+    def pack(self):
+        groups = defaultdict(list)
+        for request in self.requests:
+            if request.seats <= self.capacity:
+                groups[request.origin, request.destination].append(request)
+        self.rides = []
+        for (origin, destination), requests in groups.items():
+            requests.sort(key=lambda request: (request.minute - request.window, request.pk))
+            ready, following = [], 0
+            while following < len(requests) or ready:
+                if not ready:
+                    request = requests[following]
+                    heapq.heappush(ready, (request.minute + request.window, request.pk, request))
+                    following += 1
+                # Every request that can leave by the earliest deadline, which may move earlier as they come in
+                while (
+                    following < len(requests)
+                    and requests[following].minute - requests[following].window <= ready[0][0]
+                ):
+                    request = requests[following]
+                    heapq.heappush(ready, (request.minute + request.window, request.pk, request))
+                    following += 1
+                members, seats, skipped = [], 0, []
+                while ready and seats < self.capacity:
+                    entry = heapq.heappop(ready)
+                    if seats + entry[2].seats > self.capacity:
+                        skipped.append(entry)
+                        continue
+                    members.append((entry[2], 0))
+                    seats += entry[2].seats
+                for entry in skipped:
+                    heapq.heappush(ready, entry)
+                self.rides.append(_Ride(destination, origin, members))
+        return self.rides
+
+    # 2. Merges along the corridors
+
+    def _index(self):
+        """{destination: {first stop: (lows, rides)}} of the rides with free seats, sorted by window start"""
+        index = defaultdict(lambda: defaultdict(list))
+        for ride in self.rides:
+            if ride.seats < self.capacity:
+                index[ride.destination][ride.first].append(ride)
+        return {
+            destination: {
+                first: ([ride.low for ride in rides], rides)
+                for first, rides in sorted(stops.items())
+                for rides in [sorted(rides, key=lambda ride: (ride.low, ride.members[0][0].pk))]
+            }
+            for destination, stops in index.items()
+        }
+
+    def shifts(self, first, destination):
+        """[(stop, shift)]: leaving ``first`` at t, a vehicle passes ``stop`` at t + shift (or left it at t - shift)"""
+        key = (first, destination)
+        if key not in self._shifts:
+            shifts = []
+            for stop in sorted({request.origin for request in self.requests if request.destination == destination}):
+                after, before = self.offset(first, stop, destination), self.offset(stop, first, destination)
+                shifts.extend((stop, shift) for shift in {after, None if before is None else -before} - {None})
+            self._shifts[key] = shifts
+        return self._shifts[key]
+
+    def _nearby(self, index, destination, first, low, high):
+        """Rides of the index whose window can meet [low, high] at ``first``, once shifted by the pickup offset"""
+        width = 2 * FLEXIBLE_WINDOW
+        stops = index.get(destination, {})
+        for stop, shift in self.shifts(first, destination):
+            if stop in stops:
+                lows, rides = stops[stop]
+                position = bisect_right(lows, high + shift)
+                while position > 0:
+                    position -= 1
+                    ride = rides[position]
+                    if lows[position] < low + shift - width:
+                        break
+                    if ride.high >= low + shift:
+                        yield ride
+
+    def merge_rides(self):
+        alive = {id(ride) for ride in self.rides}
+        merged_any = True
+        while merged_any:
+            merged_any = False
+            index = self._index()
+            for ride in sorted(self.rides, key=lambda ride: (ride.seats, ride.low, ride.members[0][0].pk)):
+                if id(ride) not in alive or ride.seats >= self.capacity:
+                    continue
+                best = None
+                for other in self._nearby(index, ride.destination, ride.first, ride.low, ride.high):
+                    if other is ride or id(other) not in alive:
+                        continue
+                    merged = self.merge(ride, other)
+                    if merged is not None:
+                        cost = merged.detour() - ride.detour() - other.detour()
+                        if best is None or cost < best[0]:
+                            best = (cost, other, merged)
+                if best is None:
+                    continue
+                _, other, merged = best
+                alive -= {id(ride), id(other)}
+                alive.add(id(merged))
+                self.rides.append(merged)
+                merged_any = True
+            self.rides = [ride for ride in self.rides if id(ride) in alive]
+        return self.rides
+
+    # 3. Local search emptying vehicles
+
+    def _rehome(self, ride, index):
+        """Hosts taking every passenger of ``ride``: {host: new ride}, or None"""
+        moved = {}
+        for request, _ in sorted(ride.members, key=lambda member: (-member[0].seats, member[0].pk)):
+            hosts = [
+                host for host in self._nearby(
+                    index, ride.destination, request.origin,
+                    request.minute - request.window, request.minute + request.window,
+                )
+                if host is not ride
+            ]
+            self.rng.shuffle(hosts)
+            for host in hosts:
+                current = moved.get(id(host), (host, host))[1]
+                grown = self.merge(current, _Ride(ride.destination, request.origin, [(request, 0)]))
+                if grown is not None:
+                    moved[id(host)] = (host, grown)
+                    break
+            else:
+                return None
+        return moved
+
+    def improve(self, time_limit=TIME_LIMIT, max_moves=None):
+        deadline = time.perf_counter() + time_limit
+        max_moves = max_moves if max_moves is not None else MOVES_PER_RIDE * len(self.rides)
+        index, partial, stalled = None, None, 0
+        for _ in range(max_moves):
+            if time.perf_counter() > deadline:
+                break
+            if index is None:
+                index = self._index()
+                partial = [ride for ride in self.rides if ride.seats < self.capacity]
+            if len(partial) < 2 or stalled > STALL_FACTOR * len(partial):
+                break
+            ride = self.rng.choice(partial)
+            moved = self._rehome(ride, index)
+            if moved is None:
+                stalled += 1
+                continue
+            replaced = {id(host): grown for host, grown in moved.values()}
+            self.rides = [replaced.get(id(other), other) for other in self.rides if other is not ride]
+            index, stalled = None, 0
+        return self.rides
+
+    def pool(self, time_limit=TIME_LIMIT, max_moves=None):
+        """PooledRides of two requests or more, by departure"""
+        self.pack()
+        self.merge_rides()
+        self.improve(time_limit, max_moves)
+        return sorted(
+            (self.proposal(ride) for ride in self.rides if len(ride.members) > 1),
+            key=lambda ride: (ride.departure, ride.request_ids),
+        )
+
+    def proposal(self, ride):
+        stops = sorted({(offset, request.origin) for request, offset in ride.members})
+        return PooledRide(
+            ride.destination, ride.departure(), [(place, offset) for offset, place in stops],
+            sorted(request.pk for request, _ in ride.members), ride.seats, ride.detour(),
+        )
+
+
+REQUEST_FIELDS = (
+    'pk', 'start_location', 'end_location', 'preferred_departure_time', 'flexible_time', 'passenger_count',
+)
+
+
+def pool_pending(now=None, capacity=VEHICLE_CAPACITY, seed=0, time_limit=TIME_LIMIT):
+    """(PooledRides, pending request count) of the pending requests not yet departed"""
+    now = now or timezone.now()
+    requests = [
+        pool_request(*row)
+        for row in TransportRequest.objects.filter(
+            status='PENDING', preferred_departure_time__gte=now
+        ).values_list(*REQUEST_FIELDS).iterator(2000)
+    ]
+    return RidePooler(requests, capacity, RouteIndex(), seed).pool(time_limit), len(requests)
+
+
+def as_datetime(minute):
+    """Aware datetime of a minute since the epoch"""
+    return datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc)
+
+
+def apply_pooling(rides, capacity=VEHICLE_CAPACITY):
+    """Create the SharedRides of proposals, the first requester organizing; returns the rides created
+
+    Proposals are computed outside of the transaction: a ride is dropped when
+    any of its requests is no longer pending (booked or cancelled meanwhile).
+    """
+    shared, participations = [], []
+    with transaction.atomic():
+        requests = TransportRequest.objects.select_for_update(of=('self',)).select_related('student').filter(
+            status='PENDING'
+        ).in_bulk([pk for ride in rides for pk in ride.request_ids])
+        rides = [ride for ride in rides if all(pk in requests for pk in ride.request_ids)]
+        request_ids = [pk for ride in rides for pk in ride.request_ids]
+        for ride in rides:
+            members = [requests[pk] for pk in ride.request_ids]
+            by_place = {place_key(member.start_location): member.start_location.strip() for member in members}
+            stops = ', '.join(
+                f'{by_place[place]} (+{offset:.0f} min)' if offset else by_place[place] for place, offset in ride.stops
+            )
+            organizer = members[0].student
+            shared.append(SharedRide(
+                organizer=organizer,
+                start_location=by_place[ride.stops[0][0]],
+                end_location=members[0].end_location,
+                departure_time=as_datetime(ride.departure),
+                available_seats=capacity,
+                remaining_seats=capacity - ride.seats,
+                price_per_person=Decimal('0'),
+                description=f'Trajet groupé. Arrêts: {stops}',
+                contact_info=organizer.phone_number or organizer.email,
+            ))
+        SharedRide.objects.bulk_create(shared)
+        for ride, shared_ride in zip(rides, shared):
+            offsets = dict(ride.stops)
+            for pk in ride.request_ids:
+                member = requests[pk]
+                boarding = timezone.localtime(as_datetime(ride.departure + offsets[place_key(member.start_location)]))
+                participations.append(RideParticipation(
+                    ride=shared_ride, participant=member.student, requested_seats=member.passenger_count,
+                    pickup_point=member.start_location.strip(), notes=f'Départ prévu à {boarding:%H:%M}',
+                ))
+        # Seats are counted in remaining_seats above, so the seat signals are not needed
+        RideParticipation.objects.bulk_create(participations, batch_size=1000)
+        TransportRequest.objects.filter(pk__in=request_ids, status='PENDING').update(
+            status='CONFIRMED', updated_at=timezone.now()
+        )
+    return shared
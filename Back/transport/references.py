@@ -0,0 +1,147 @@
+"""
+Booking references.
+
+A reference is the next number of a database sequence, scrambled and
+written in Crockford base32 with a check character: ``7K2Q-M9XD``. Numbers
+are reserved ``BOOKING_REFERENCE_BLOCK`` at a time by one UPDATE
+of the ``ReferenceSequence`` row, then handed out from memory, so creating a
+booking (or a thousand with ``bulk_create``) is a single INSERT almost every
+time and two references can never collide. Blocks are reserved on a
+connection of their own, committed at once whatever happens to the booking's
+transaction (except on SQLite, see ``_Allocator.take``). Unused numbers of a
+block are lost when the process ends; references are unique, not
+consecutive.
+
+The scrambling is a bijection of the 35-bit range, so consecutive bookings
+get unrelated references; it hides the booking count, it is not a secret.
+The last character is a Luhn mod 32 check over the others: anyone holding a
+reference, a driver offline included, can tell a mistyped one with
+``is_valid_reference``. It catches every single wrong character and most
+swaps of two neighbouring ones.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# Crockford base32 reads the letters it leaves out as the digits they look like
+VALUES.update({'O': 0, 'I': 1, 'L': 1})
+LENGTH = 7  # characters before the check character
+BITS = 5 * LENGTH
+MASK = (1 << BITS) - 1
+BLOCK_SIZE = getattr(settings, 'BOOKING_REFERENCE_BLOCK', 100)
+SEQUENCE = 'booking'
+
+
+def _scramble(number):
+    # Odd multipliers and xorshifts are invertible modulo 2**BITS
+    number = (number * 0x5DEECE66D) & MASK
+    number ^= number >> 17
+    return (number * 0x2545F491) & MASK
+
+
+def _check_character(payload):
+    """Luhn mod 32 check character of base32 ``payload``"""
+    total, factor = 0, 2
+    for char in reversed(payload):
+        addend = factor * VALUES[char]
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return ALPHABET[-total % 32]
+
+
+def encode_reference(number):
+    """Reference of a sequence number"""
+    if not 0 <= number <= MASK:
+        raise ValueError('Numéro de réservation hors limites')
+    scrambled, payload = _scramble(number), []
+    for _ in range(LENGTH):
+        scrambled, digit = divmod(scrambled, 32)
+        payload.append(ALPHABET[digit])
+    payload = ''.join(reversed(payload))
+    reference = payload + _check_character(payload)
+    return f'{reference[:4]}-{reference[4:]}'
+
+
+def normalize_reference(text):
+    """Canonical form of a typed reference (case, separators and look-alike letters ignored)"""
+    chars = [char for char in str(text).upper() if char not in '- ']
+    if len(chars) != LENGTH + 1 or any(char not in VALUES for char in chars):
+        return None
+    reference = ''.join(ALPHABET[VALUES[char]] for char in chars)
+    return f'{reference[:4]}-{reference[4:]}'
+
+
+def is_valid_reference(text):
+    """Whether a reference is well formed and its check character matches, without any lookup"""
+    reference = normalize_reference(text)
+    if reference is None:
+        return False
+    chars = reference.replace('-', '')
+    return _check_character(chars[:-1]) == chars[-1]
+
+
+class _Allocator:
+    """Numbers of the current block, refilled from the ReferenceSequence row"""
+
+    def __init__(self, name, size):
+        self.name, self.size = name, size
+        self.lock = threading.Lock()
+        self.next = self.end = 0
+        self.pid = None
+
+    def _reserve(self, cursor, size):
+        from .models import ReferenceSequence
+
+        table = connection.ops.quote_name(ReferenceSequence._meta.db_table)
+        cursor.execute(f'UPDATE {table} SET next_value = next_value + %s WHERE name = %s', [size, self.name])
+        if cursor.rowcount != 1:
+            raise ImproperlyConfigured(f'Séquence de références introuvable: {self.name}')
+        cursor.execute(f'SELECT next_value FROM {table} WHERE name = %s', [self.name])
+        return cursor.fetchone()[0] - size
+
+    def _reserve_apart(self):
+        # On its own connection and transaction: a rollback of the caller's
+        # transaction must not give the block back while this process uses it
+        apart = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            apart.set_autocommit(False)
+            with apart.cursor() as cursor:
+                start = self._reserve(cursor, self.size)
+            apart.commit()
+        finally:
+            apart.close()
+        return start
+
+    def take(self):
+        with self.lock:
+            # A forked worker must not hand out its parent's block
+            if self.next < self.end and self.pid == os.getpid():
+                number, self.next = self.next, self.next + 1
+                return number
+            if connection.vendor != 'sqlite':
+                start = self._reserve_apart()
+            elif not connection.in_atomic_block:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    start = self._reserve(cursor, self.size)
+            else:
+                # SQLite has one writer, which may be the caller's transaction: reserve
+                # within it, and only the number needed, since it may yet roll back
+                with transaction.atomic(), connection.cursor() as cursor:
+                    return self._reserve(cursor, 1)
+            self.next, self.end, self.pid = start + 1, start + self.size, os.getpid()
+            return start
+
+
+_allocator = _Allocator(SEQUENCE, BLOCK_SIZE)
+
+
+def next_reference():
+    """A new booking reference (default of ``TransportBooking.booking_reference``)"""
+    return encode_reference(_allocator.take())
@@ -0,0 +1,11 @@
+from dashboard.reminders import ReminderSource, register
+
+from .models import TransportNotification
+
+
+@register
+class TransportNotificationReminder(ReminderSource):
+    """Transport notifications, delivered as soon as they are created"""
+    name = 'transport_notification'
+    model = TransportNotification
+    due_field = 'created_at'
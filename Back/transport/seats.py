@@ -0,0 +1,194 @@
+"""
+Seat inventory of transport departures and shared rides.
+
+Every departure of a TransportSchedule on a given date has a ``SeatInventory``
+row, created on first use with the seats its active bookings already took;
+a SharedRide keeps its own ``remaining_seats``. Seats are taken with a single
+conditional UPDATE (``remaining = remaining - n WHERE remaining >= n``), so
+concurrent bookings can never oversell and none of them counts rows.
+
+A student can hold seats for ``SEAT_HOLD_MINUTES`` while confirming. Whether
+a hold ends in a booking or expires is decided by whoever deletes the
+``SeatHold`` row: the confirmation (if still valid) or ``release_expired``,
+which gives the seats back.
+
+``transport.signals`` keeps the counters right whichever way bookings and
+participations are saved: an active one created without going through
+``book_schedule`` or ``join_ride`` takes its seats before the INSERT (raising
+``SeatsUnavailable`` if there are none), a cancelled or deleted one gives
+them back (once, even when cancelled twice concurrently), and capacity
+changes move the remaining seats by the difference.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import RideParticipation, SeatHold, SeatInventory, SharedRide, TransportBooking, TransportSchedule
+
+
+HOLD_TTL = timedelta(minutes=getattr(settings, 'SEAT_HOLD_MINUTES', 10))
+ACTIVE_BOOKINGS = ('BOOKED', 'CONFIRMED', 'IN_PROGRESS')
+ACTIVE_PARTICIPATIONS = ('REQUESTED', 'CONFIRMED')
+WEEKDAYS = [code for code, _ in TransportSchedule.DAYS_OF_WEEK]
+
+
+class SeatsUnavailable(Exception):
+    """Not enough seats left (or the hold expired)"""
+
+
+def travel_date(transport_request):
+    return timezone.localtime(transport_request.preferred_departure_time).date()
+
+
+def runs_on(schedule, day):
+    return WEEKDAYS[day.weekday()] in {str(code)[:3].upper() for code in schedule.days_of_week or []}
+
+
+def inventory_id(schedule, day):
+    """Inventory of a departure, created from the schedule's capacity and existing bookings"""
+    pk = SeatInventory.objects.filter(schedule=schedule, travel_date=day).values_list('pk', flat=True).first()
+    if pk is not None:
+        return pk
+    if not runs_on(schedule, day):
+        raise SeatsUnavailable(f'Pas de départ le {day:%d/%m/%Y}')
+    booked = TransportBooking.objects.filter(
+        schedule=schedule, status__in=ACTIVE_BOOKINGS, request__preferred_departure_time__date=day
+    ).aggregate(seats=Sum('passenger_count'))['seats'] or 0
+    SeatInventory.objects.bulk_create(
+        [SeatInventory(
+            schedule=schedule, travel_date=day, capacity=schedule.capacity,
+            remaining=schedule.capacity - booked,
+        )],
+        ignore_conflicts=True,
+    )
+    return SeatInventory.objects.filter(schedule=schedule, travel_date=day).values_list('pk', flat=True).get()
+
+
+def _take(queryset, field, seats):
+    if seats < 1 or not queryset.filter(**{f'{field}__gte': seats}).update(**{field: F(field) - seats}):
+        raise SeatsUnavailable('Plus assez de places disponibles')
+
+
+def reserve(inventory_pk, seats):
+    _take(SeatInventory.objects.filter(pk=inventory_pk), 'remaining', seats)
+
+
+def release(inventory_pk, seats):
+    SeatInventory.objects.filter(pk=inventory_pk).update(remaining=Least(F('remaining') + seats, F('capacity')))
+
+
+def release_departure(schedule_id, day, seats):
+    # Without an inventory yet there is nothing to give back: it will count the bookings left
+    SeatInventory.objects.filter(schedule=schedule_id, travel_date=day).update(
+        remaining=Least(F('remaining') + seats, F('capacity'))
+    )
+
+
+def resize_departures(schedule_id, delta):
+    """Follow a change of a schedule's capacity by ``delta``"""
+    SeatInventory.objects.filter(schedule=schedule_id).update(
+        capacity=F('capacity') + delta, remaining=F('remaining') + delta
+    )
+
+
+def reserve_ride(ride_pk, seats):
+    _take(SharedRide.objects.filter(pk=ride_pk, is_active=True), 'remaining_seats', seats)
+
+
+def release_ride(ride_pk, seats):
+    SharedRide.objects.filter(pk=ride_pk).update(
+        remaining_seats=Least(F('remaining_seats') + seats, F('available_seats'))
+    )
+
+
+# Holds
+
+def hold_seats(student, seats, schedule=None, day=None, ride=None):
+    """Set seats aside on a departure (schedule and day) or a shared ride"""
+    with transaction.atomic():
+        if ride is not None:
+            reserve_ride(ride.pk, seats)
+            return SeatHold.objects.create(student=student, ride=ride, seats=seats, expires_at=timezone.now() + HOLD_TTL)
+        inventory = inventory_id(schedule, day)
+        reserve(inventory, seats)
+        return SeatHold.objects.create(
+            student=student, inventory_id=inventory, seats=seats, expires_at=timezone.now() + HOLD_TTL
+        )
+
+
+def _claim(hold):
+    """Consume a hold still valid; its seats now belong to the caller"""
+    if not SeatHold.objects.filter(pk=hold.pk, expires_at__gt=timezone.now()).delete()[0]:
+        raise SeatsUnavailable('La réservation temporaire a expiré')
+
+
+def release_expired(now=None):
+    """Give back the seats of expired holds; returns the number of holds released"""
+    now = now or timezone.now()
+    released = 0
+    for pk, inventory, ride, seats in SeatHold.objects.filter(expires_at__lte=now).values_list(
+        'pk', 'inventory_id', 'ride_id', 'seats'
+    ):
+        with transaction.atomic():
+            # A concurrent confirmation or release may have taken the row first
+            if not SeatHold.objects.filter(pk=pk).delete()[0]:
+                continue
+            if inventory is not None:
+                release(inventory, seats)
+            if ride is not None:
+                release_ride(ride, seats)
+            released += 1
+    return released
+
+
+# Bookings
+
+def _booking(transport_request, schedule, seats, fields):
+    booking = TransportBooking(
+        request=transport_request, schedule=schedule, passenger_count=seats,
+        total_price=schedule.price * seats, **fields,
+    )
+    # Tells transport.signals the seats are already taken
+    booking._seats_taken = True
+    booking.save(force_insert=True)
+    return booking
+
+
+def book_schedule(transport_request, schedule, hold=None, **fields):
+    """Book the request's seats on a departure, from a hold or straight from the inventory"""
+    seats = transport_request.passenger_count
+    with transaction.atomic():
+        inventory = inventory_id(schedule, travel_date(transport_request))
+        if hold is not None:
+            if (hold.inventory_id, hold.seats) != (inventory, seats):
+                raise SeatsUnavailable('La réservation temporaire ne couvre pas ce départ')
+            _claim(hold)
+        else:
+            reserve(inventory, seats)
+        return _booking(transport_request, schedule, seats, fields)
+
+
+def join_ride(ride, student, seats=1, hold=None, **fields):
+    """Add a participant to a shared ride, from a hold or straight from its remaining seats"""
+    with transaction.atomic():
+        if hold is not None:
+            if hold.ride_id != ride.pk:
+                raise SeatsUnavailable('La réservation temporaire ne couvre pas ce trajet')
+            seats = hold.seats
+            _claim(hold)
+        else:
+            reserve_ride(ride.pk, seats)
+        participation = RideParticipation(ride=ride, participant=student, requested_seats=seats, **fields)
+        participation._seats_taken = True
+        participation.save(force_insert=True)
+        return participation
+
+
+def resize_ride(ride_pk, delta):
+    """Follow a change of available_seats by ``delta``"""
+    SharedRide.objects.filter(pk=ride_pk).update(remaining_seats=F('remaining_seats') + delta)
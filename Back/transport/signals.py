@@ -0,0 +1,148 @@
+"""
+Keep the seat counters of transport.seats in step with bookings, ride
+participations and capacity changes made outside of it, and the journey
+planner's graph in step with the network.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .journeys import invalidate_network
+from .models import (
+    RideParticipation, Route, SharedRide, TransportBooking, TransportProvider, TransportRequest, TransportSchedule,
+)
+from .seats import (
+    ACTIVE_BOOKINGS, ACTIVE_PARTICIPATIONS, inventory_id, release_departure, release_ride, reserve, reserve_ride,
+    resize_departures, resize_ride, travel_date,
+)
+
+
+# Fields deciding which seats a booking or participation holds
+BOOKING_SEAT_FIELDS = ('schedule_id', 'request_id', 'passenger_count', 'status')
+PARTICIPATION_SEAT_FIELDS = ('ride_id', 'requested_seats', 'status')
+
+
+def _claim_change(instance, fields, row):
+    """Move the row off the seats it held, if it still holds them
+
+    The UPDATE only matches while the row has the ``row`` values read before
+    the save, so of two concurrent saves (e.g. two cancellations) only one
+    gets a row count of 1 and gives the previous seats back.
+    """
+    values = {field: getattr(instance, field) for field in fields}
+    return type(instance).objects.filter(pk=instance.pk, **dict(zip(fields, row))).update(**values) == 1
+
+
+def _booking_key(schedule_id, request_id, passengers, status):
+    return (schedule_id, request_id, passengers) if status in ACTIVE_BOOKINGS else None
+
+
+def _departure_seats(key):
+    """(schedule id, travel date, seats) of a booking key"""
+    schedule_id, request_id, passengers = key
+    return schedule_id, travel_date(TransportRequest.objects.only('preferred_departure_time').get(pk=request_id)), passengers
+
+
+@receiver(pre_save, sender=TransportBooking)
+def take_booking_seats(sender, instance, **kwargs):
+    # Seats are taken before the write, so a full departure stops the save
+    instance._seats_to_release = None
+    previous = row = None
+    if not instance._state.adding:
+        row = TransportBooking.objects.filter(pk=instance.pk).values_list(*BOOKING_SEAT_FIELDS).first()
+        previous = _booking_key(*row) if row else None
+    elif getattr(instance, '_seats_taken', False):
+        return
+    current = _booking_key(instance.schedule_id, instance.request_id, instance.passenger_count, instance.status)
+    if previous == current:
+        return
+    if current is not None:
+        schedule_id, day, seats = _departure_seats(current)
+        reserve(inventory_id(TransportSchedule.objects.get(pk=schedule_id), day), seats)
+    if previous is not None and _claim_change(instance, BOOKING_SEAT_FIELDS, row):
+        instance._seats_to_release = _departure_seats(previous)
+
+
+@receiver(post_save, sender=TransportBooking)
+def release_booking_seats(sender, instance, **kwargs):
+    previous = getattr(instance, '_seats_to_release', None)
+    if previous is not None:
+        release_departure(*previous)
+    instance._seats_taken, instance._seats_to_release = True, None
+
+
+@receiver(post_delete, sender=TransportBooking)
+def booking_deleted(sender, instance, **kwargs):
+    current = _booking_key(instance.schedule_id, instance.request_id, instance.passenger_count, instance.status)
+    if current is not None:
+        release_departure(*_departure_seats(current))
+
+
+def _ride_seats(ride_id, seats, status):
+    return (ride_id, seats) if status in ACTIVE_PARTICIPATIONS else None
+
+
+@receiver(pre_save, sender=RideParticipation)
+def take_ride_seats(sender, instance, **kwargs):
+    instance._seats_to_release = None
+    previous = row = None
+    if not instance._state.adding:
+        row = RideParticipation.objects.filter(pk=instance.pk).values_list(*PARTICIPATION_SEAT_FIELDS).first()
+        previous = _ride_seats(*row) if row else None
+    elif getattr(instance, '_seats_taken', False):
+        return
+    current = _ride_seats(instance.ride_id, instance.requested_seats, instance.status)
+    if previous == current:
+        return
+    if current is not None:
+        reserve_ride(*current)
+    if previous is not None and _claim_change(instance, PARTICIPATION_SEAT_FIELDS, row):
+        instance._seats_to_release = previous
+
+
+@receiver(post_save, sender=RideParticipation)
+def release_ride_seats(sender, instance, **kwargs):
+    previous = getattr(instance, '_seats_to_release', None)
+    if previous is not None:
+        release_ride(*previous)
+    instance._seats_taken, instance._seats_to_release = True, None
+
+
+@receiver(post_delete, sender=RideParticipation)
+def participation_deleted(sender, instance, **kwargs):
+    current = _ride_seats(instance.ride_id, instance.requested_seats, instance.status)
+    if current is not None:
+        release_ride(*current)
+
+
+@receiver(pre_save, sender=TransportSchedule)
+@receiver(pre_save, sender=SharedRide)
+def remember_capacity(sender, instance, **kwargs):
+    field = 'capacity' if sender is TransportSchedule else 'available_seats'
+    instance._previous_capacity = None
+    if not instance._state.adding:
+        instance._previous_capacity = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=TransportSchedule)
+def schedule_capacity_changed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_capacity', None)
+    if previous is not None and previous != instance.capacity:
+        resize_departures(instance.pk, instance.capacity - previous)
+
+
+@receiver(post_save, sender=SharedRide)
+def ride_capacity_changed(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_capacity', None)
+    if previous is not None and previous != instance.available_seats:
+        resize_ride(instance.pk, instance.available_seats - previous)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=TransportSchedule)
+@receiver(post_delete, sender=TransportSchedule)
+@receiver(post_save, sender=TransportProvider)
+@receiver(post_delete, sender=TransportProvider)
+def network_changed(sender, **kwargs):
+    invalidate_network()
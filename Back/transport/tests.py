@@ -0,0 +1,311 @@
+import itertools
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import Student
+
+from . import signals
+from .journeys import DAY, TRANSFER_MINUTES, JourneyGraph
+from .matcher import place_key
+from .models import (
+    Route, RideParticipation, SeatHold, SeatInventory, SharedRide, TransportBooking, TransportProvider,
+    TransportRequest, TransportSchedule,
+)
+from .pooling import PooledRide, apply_pooling
+from .references import ALPHABET, encode_reference, is_valid_reference, normalize_reference
+from .seats import ACTIVE_BOOKINGS, SeatsUnavailable, book_schedule, hold_seats, join_ride, release_expired
+
+
+EVERY_DAY = [code for code, _ in TransportSchedule.DAYS_OF_WEEK]
+
+
+class ReferenceTests(SimpleTestCase):
+    numbers = [0, 1, 2, 41, 1000, 123456, 2 ** 35 - 1]
+
+    def test_format(self):
+        references = [encode_reference(number) for number in self.numbers]
+        self.assertEqual(len(set(references)), len(references))
+        for reference in references:
+            self.assertRegex(reference, r'^[0-9A-HJKMNP-TV-Z]{4}-[0-9A-HJKMNP-TV-Z]{4}$')
+            self.assertTrue(is_valid_reference(reference))
+
+    def test_out_of_range(self):
+        for number in (-1, 2 ** 35):
+            with self.assertRaises(ValueError):
+                encode_reference(number)
+
+    def test_normalize(self):
+        reference = encode_reference(1000)
+        typed = reference.lower().replace('-', ' ').replace('0', 'o').replace('1', 'l')
+        self.assertEqual(normalize_reference(typed), reference)
+        self.assertIsNone(normalize_reference(reference[:-1]))
+        self.assertIsNone(normalize_reference(reference.replace('-', 'U')))
+
+    def test_check_character_catches_every_substitution(self):
+        for number in self.numbers:
+            chars = encode_reference(number).replace('-', '')
+            for position, char in itertools.product(range(len(chars)), ALPHABET):
+                if char != chars[position]:
+                    typo = chars[:position] + char + chars[position + 1:]
+                    self.assertFalse(is_valid_reference(typo), typo)
+
+    def test_check_character_catches_most_swaps(self):
+        caught = total = 0
+        for number in range(500):
+            chars = encode_reference(number * 7919).replace('-', '')
+            for position in range(len(chars) - 1):
+                if chars[position] != chars[position + 1]:
+                    swapped = chars[:position] + chars[position + 1] + chars[position] + chars[position + 2:]
+                    caught += not is_valid_reference(swapped)
+                    total += 1
+        self.assertGreater(caught / total, 0.9)
+
+
+class TransportTestCase(TestCase):
+    capacity = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = timezone.localdate() + timedelta(days=1)
+        cls.departure = timezone.make_aware(datetime.combine(cls.day, time(8, 0)))
+        cls.provider = TransportProvider.objects.create(name='Bus', provider_type='BUS', phone_number='0')
+        cls.route = Route.objects.create(
+            name='Campus', start_location='Gare', end_location='Campus', distance_km=5,
+            estimated_duration=timedelta(minutes=20),
+        )
+        cls.schedule = TransportSchedule.objects.create(
+            provider=cls.provider, route=cls.route, departure_time=time(8, 0), arrival_time=time(8, 20),
+            days_of_week=EVERY_DAY, price=2, capacity=cls.capacity,
+        )
+        cls.students = [
+            Student.objects.create(username=f'rider{i}', student_id=f'R{i:03d}', level='L1', filiere='INFO')
+            for i in range(8)
+        ]
+
+    def request(self, student, passengers=1, **fields):
+        fields.setdefault('start_location', 'Gare')
+        fields.setdefault('end_location', 'Campus')
+        fields.setdefault('preferred_departure_time', self.departure)
+        return TransportRequest.objects.create(student=student, passenger_count=passengers, **fields)
+
+
+class SeatInventoryTests(TransportTestCase):
+    def inventory(self):
+        return SeatInventory.objects.get(schedule=self.schedule, travel_date=self.day)
+
+    def assertSeatsAddUp(self):
+        booked = TransportBooking.objects.filter(schedule=self.schedule, status__in=ACTIVE_BOOKINGS).aggregate(
+            seats=Sum('passenger_count')
+        )['seats'] or 0
+        held = SeatHold.objects.filter(inventory__schedule=self.schedule).aggregate(seats=Sum('seats'))['seats'] or 0
+        inventory = self.inventory()
+        self.assertLessEqual(booked, inventory.capacity)
+        self.assertEqual(inventory.remaining, inventory.capacity - booked - held)
+
+    def test_never_oversold(self):
+        booked = 0
+        for student, passengers in zip(self.students, [3, 3, 2, 3, 1, 1]):
+            try:
+                book_schedule(self.request(student, passengers), self.schedule)
+                booked += passengers
+            except SeatsUnavailable:
+                pass
+            self.assertSeatsAddUp()
+        self.assertEqual(booked, self.capacity)
+        self.assertEqual(self.inventory().remaining, 0)
+
+    def test_hold_then_book_or_expire(self):
+        held = hold_seats(self.students[0], 4, self.schedule, self.day)
+        expired = hold_seats(self.students[1], 5, self.schedule, self.day)
+        self.assertSeatsAddUp()
+        with self.assertRaises(SeatsUnavailable):
+            book_schedule(self.request(self.students[2], 2), self.schedule)
+
+        book_schedule(self.request(self.students[0], 4), self.schedule, hold=held)
+        SeatHold.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired(), 1)
+        self.assertSeatsAddUp()
+        self.assertEqual(self.inventory().remaining, self.capacity - 4)
+        with self.assertRaises(SeatsUnavailable):
+            book_schedule(self.request(self.students[1], 5), self.schedule, hold=expired)
+
+    def test_bookings_saved_directly(self):
+        booking = TransportBooking.objects.create(
+            request=self.request(self.students[0], 6), schedule=self.schedule, passenger_count=6, total_price=12,
+        )
+        self.assertSeatsAddUp()
+        with self.assertRaises(SeatsUnavailable):
+            TransportBooking.objects.create(
+                request=self.request(self.students[1], 5), schedule=self.schedule, passenger_count=5, total_price=10,
+            )
+        booking.passenger_count = 3
+        booking.save()
+        self.assertSeatsAddUp()
+        booking.status = 'CANCELLED'
+        booking.save()
+        self.assertSeatsAddUp()
+        booking.delete()
+        self.assertSeatsAddUp()
+
+    def test_concurrent_cancellations_release_once(self):
+        booking = book_schedule(self.request(self.students[0], 3), self.schedule)
+        book_schedule(self.request(self.students[1], 4), self.schedule)
+        first, second = TransportBooking.objects.get(pk=booking.pk), TransportBooking.objects.get(pk=booking.pk)
+        first.status = second.status = 'CANCELLED'
+        claim = signals._claim_change
+
+        def interleaved(instance, fields, row):
+            # The second cancellation runs entirely between the first one's read and its write
+            if instance is first:
+                second.save()
+            return claim(instance, fields, row)
+
+        with mock.patch.object(signals, '_claim_change', interleaved):
+            first.save()
+        self.assertEqual(self.inventory().remaining, self.capacity - 4)
+        self.assertSeatsAddUp()
+
+    def test_shared_ride(self):
+        ride = SharedRide.objects.create(
+            organizer=self.students[0], start_location='Gare', end_location='Campus', departure_time=self.departure,
+            available_seats=3, price_per_person=1, contact_info='0',
+        )
+        join_ride(ride, self.students[1], seats=2)
+        with self.assertRaises(SeatsUnavailable):
+            join_ride(ride, self.students[2], seats=2)
+        participation = join_ride(ride, self.students[2])
+        participation.status = 'CANCELLED'
+        participation.save()
+        ride.refresh_from_db()
+        joined = RideParticipation.objects.filter(ride=ride, status__in=('REQUESTED', 'CONFIRMED')).aggregate(
+            seats=Sum('requested_seats')
+        )['seats']
+        self.assertEqual(ride.remaining_seats, ride.available_seats - joined)
+
+
+class JourneyPlannerTests(SimpleTestCase):
+    stops = ['Gare', 'Centre', 'Campus', 'Cité U', 'Hôpital']
+    # A Monday, in the project's time zone
+    when = timezone.make_aware(datetime(2026, 10, 19, 7, 0))
+
+    def network(self, seed, routes=8, schedules=30):
+        rng = random.Random(seed)
+        route_rows = []
+        for pk in range(1, routes + 1):
+            stops = rng.sample(self.stops, rng.randint(2, 4))
+            route_rows.append((pk, stops[0], stops[-1], stops[1:-1], timedelta(minutes=rng.randint(10, 60))))
+        schedule_rows = []
+        for pk in range(1, schedules + 1):
+            start = rng.randrange(6 * 60, 12 * 60, 5)
+            length = rng.randint(10, 90)
+            schedule_rows.append((
+                pk, rng.randint(1, routes), time(start // 60, start % 60),
+                time((start + length) // 60, (start + length) % 60),
+                rng.sample(EVERY_DAY, rng.randint(1, 7)), Decimal(rng.randint(1, 12)) / 2,
+            ))
+        return JourneyGraph(route_rows, schedule_rows)
+
+    def journeys(self, graph, origin, destination, start, limit):
+        """(arrival, fare) of every journey over the graph's departures, by exhaustive search"""
+        connections = {}
+        for stop, edges in graph.edges.items():
+            connections[stop] = [
+                (edge.target, edge.times[index], edge.arrivals[index], edge.price)
+                for edge in edges
+                for index in range(len(edge.times))
+                if edge.times[index] >= start and edge.arrivals[index] <= limit
+            ]
+        found = []
+
+        def walk(stop, ready, arrival, fare, seen):
+            if stop == destination:
+                found.append((arrival, fare))
+                return
+            for target, departure, reached, price in connections.get(stop, ()):
+                if target not in seen and departure >= ready:
+                    walk(target, reached + TRANSFER_MINUTES, reached, fare + price, seen | {target})
+
+        walk(origin, start, start, 0, {origin})
+        return found
+
+    def test_simple_network(self):
+        graph = JourneyGraph(
+            [(1, 'Gare', 'Campus', ['Centre'], timedelta(minutes=30)), (2, 'Centre', 'Campus', [], timedelta(minutes=10))],
+            [
+                (1, 1, time(8, 0), time(8, 30), EVERY_DAY, Decimal('3.00')),
+                (2, 2, time(8, 10), time(8, 20), EVERY_DAY, Decimal('1.00')),
+                (3, 2, time(8, 25), time(8, 35), EVERY_DAY, Decimal('1.00')),
+            ],
+        )
+        plan = graph.plan('gare', 'CAMPUS', self.when)
+        # Through Centre at 08:15, too late (with the transfer) for the 08:10
+        self.assertEqual([leg.schedule_id for leg in plan['earliest'].legs], [1])
+        self.assertEqual(timezone.localtime(plan['earliest'].arrival).time(), time(8, 30))
+        self.assertEqual(plan['cheapest'].price, Decimal('3.00'))
+        self.assertIsNone(graph.earliest('Campus', 'Gare', self.when))
+
+    def test_matches_exhaustive_search(self):
+        horizon = timedelta(hours=6)
+        for seed in range(5):
+            graph = self.network(seed)
+            monday, start = graph.week_position(self.when)
+            limit = start + horizon.total_seconds() / 60
+            for origin, destination in itertools.permutations(self.stops, 2):
+                source, target = place_key(origin), place_key(destination)
+                found = self.journeys(graph, source, target, start, limit)
+                earliest = graph.earliest(origin, destination, self.when, horizon)
+                cheapest = graph.cheapest(origin, destination, self.when, horizon)
+                if not found:
+                    self.assertIsNone(earliest)
+                    self.assertIsNone(cheapest)
+                    continue
+                arrival = min(found)[0]
+                fare, cheapest_arrival = min((fare, arrival) for arrival, fare in found)
+                self.assertEqual(earliest.arrival, timezone.make_aware(monday + timedelta(minutes=arrival)))
+                self.assertEqual(cheapest.price, Decimal(fare).scaleb(-2))
+                self.assertEqual(
+                    cheapest.arrival, timezone.make_aware(monday + timedelta(minutes=cheapest_arrival))
+                )
+                for journey in (earliest, cheapest):
+                    self.assertGreaterEqual(journey.departure, self.when)
+                    for leg, following in zip(journey.legs, journey.legs[1:]):
+                        self.assertGreaterEqual(following.departure, leg.arrival + timedelta(minutes=TRANSFER_MINUTES))
+
+    def test_week_wraps(self):
+        graph = JourneyGraph(
+            [(1, 'Gare', 'Campus', [], timedelta(minutes=30))],
+            [(1, 1, time(7, 0), time(7, 30), ['MON'], Decimal('2.00'))],
+        )
+        sunday = timezone.make_aware(datetime(2026, 10, 25, 23, 0))
+        journey = graph.earliest('Gare', 'Campus', sunday, timedelta(hours=DAY // 60))
+        self.assertEqual(timezone.localtime(journey.departure), timezone.make_aware(datetime(2026, 10, 26, 7, 0)))
+
+
+class ApplyPoolingTests(TransportTestCase):
+    def proposal(self, *requests):
+        return PooledRide(
+            place_key('Campus'), int(self.departure.timestamp() // 60), [(place_key('Gare'), 0)],
+            [request.pk for request in requests], sum(request.passenger_count for request in requests), 0,
+        )
+
+    def test_rides_of_requests_no_longer_pending_are_dropped(self):
+        requests = [self.request(student) for student in self.students[:4]]
+        proposals = [self.proposal(*requests[:2]), self.proposal(*requests[2:])]
+        TransportRequest.objects.filter(pk=requests[0].pk).update(status='CANCELLED')
+
+        created = apply_pooling(proposals)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(
+            set(RideParticipation.objects.values_list('participant_id', flat=True)),
+            {request.student_id for request in requests[2:]},
+        )
+        statuses = dict(TransportRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[request.pk] for request in requests], ['CANCELLED', 'PENDING', 'CONFIRMED', 'CONFIRMED']
+        )
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from . import views
+
 urlpatterns = [
-    # URLs will be added as we implement views
+    path('journeys/', views.journeys, name='journeys'),
 ]
@@ -1,3 +1,41 @@
-from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from .journeys import plan_journey
+
+
+def _journey_data(journey):
+    if journey is None:
+        return None
+    return {
+        'departure': journey.departure,
+        'arrival': journey.arrival,
+        'price': journey.price,
+        'legs': [leg._asdict() for leg in journey.legs],
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def journeys(request):
+    """Earliest and cheapest journeys from ``origin`` to ``destination``, leaving at ``when`` (default now)"""
+    origin, destination = request.query_params.get('origin'), request.query_params.get('destination')
+    if not origin or not destination:
+        return Response({'error': 'Départ et destination requis'}, status=status.HTTP_400_BAD_REQUEST)
+    when = timezone.now()
+    if request.query_params.get('when'):
+        try:
+            when = parse_datetime(request.query_params['when'])
+        except ValueError:
+            # Well formed but impossible, e.g. 2026-02-30
+            when = None
+        if when is None:
+            return Response({'error': 'Date invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+    plan = plan_journey(origin, destination, when)
+    return Response({kind: _journey_data(journey) for kind, journey in plan.items()})